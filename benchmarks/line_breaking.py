@@ -0,0 +1,120 @@
+"""Benchmark the pixel based line breaking against the character based one.
+
+Run it from the project root with the font of the catalog:
+
+    PYTHONPATH=src python benchmarks/line_breaking.py data/01_raw/fonts/font.ttf
+
+Besides the time per text it reports how many lines overflow the usable width of
+the canvas, which the character based breaking cannot guarantee.
+"""
+
+import argparse
+import random
+import timeit
+
+from common.utilities.text_tools import (
+    break_lines_by_width,
+    calculate_max_line_length,
+    get_text_measurer,
+    introduce_line_breaks,
+)
+from PIL import ImageFont
+
+_WORDS = (
+    "love life is a journey WHAT MAKES Wonderful moments illuminate little "
+    "mountains whisper million minds wander while wise women welcome tomorrow"
+).split()
+
+
+def _sample_texts(n_texts: int, seed: int) -> list[str]:
+    """Create random texts with a length between 40 and 200 characters.
+
+    Args:
+    ----
+        n_texts (int): Number of texts.
+        seed (int): Seed of the random generator.
+
+    Returns:
+    -------
+        list[str]: The texts.
+
+    """
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_texts):
+        target_length = rng.randint(40, 200)
+        words = []
+        while sum(len(word) + 1 for word in words) < target_length:
+            words.append(rng.choice(_WORDS))
+        texts.append(" ".join(words))
+    return texts
+
+
+def _count_overflows(
+    lines_per_text: list[list[str]], font: ImageFont.FreeTypeFont, max_width: float
+) -> tuple[int, int]:
+    """Count the lines which are wider than the usable width.
+
+    Args:
+    ----
+        lines_per_text (list[list[str]]): Lines of every text.
+        font (ImageFont.FreeTypeFont): Font used for the text.
+        max_width (float): Usable width in pixels.
+
+    Returns:
+    -------
+        tuple[int, int]: Number of overflowing lines and number of lines.
+
+    """
+    measurer = get_text_measurer(font)
+    lines = [line.rstrip() for text_lines in lines_per_text for line in text_lines]
+    overflows = sum(measurer.bbox(line)[0] > max_width for line in lines)
+    return overflows, len(lines)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("font", help="Path to a TrueType font.")
+    parser.add_argument("--fontsize", type=int, default=60)
+    parser.add_argument("--image-width", type=int, default=1080)
+    parser.add_argument("--margin-percentage", type=float, default=0.1)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    font = ImageFont.truetype(args.font, args.fontsize)
+    texts = _sample_texts(n_texts=args.texts, seed=args.seed)
+    max_width = args.image_width * (1 - args.margin_percentage * 2)
+
+    def character_based() -> list[list[str]]:
+        max_line_length = calculate_max_line_length(
+            font=font,
+            image_width=args.image_width,
+            margin_percentage=args.margin_percentage,
+        )
+        return [introduce_line_breaks(text, max_line_length) for text in texts]
+
+    def width_based(balanced: bool) -> list[list[str]]:
+        return [
+            break_lines_by_width(text, font, max_width, balanced=balanced)
+            for text in texts
+        ]
+
+    candidates = {
+        "character based": character_based,
+        "width based, greedy": lambda: width_based(balanced=False),
+        "width based, balanced": lambda: width_based(balanced=True),
+    }
+    for name, func in candidates.items():
+        func()  # Warm up the measurement caches.
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        overflows, n_lines = _count_overflows(func(), font=font, max_width=max_width)
+        print(
+            f"{name:>22}: {1e6 * seconds / len(texts):8.1f} us per text, "
+            f"{overflows} of {n_lines} lines overflow"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark the batch renderer.
+
+Run it from the project root with the font of the catalog:
+
+    PYTHONPATH=src python benchmarks/rendering.py data/01_raw/fonts/font.ttf
+
+It reports the images per second of ``render_images`` and ``render_images_to_files``
+for the given number of worker processes.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from common.utilities.rendering import render_images, render_images_to_files
+from common.utilities.text_tools import break_lines_by_width
+from PIL import ImageFont
+
+_TEXT = "Love is patient, love is kind. It does not envy, it does not boast."
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("font", help="Path to a TrueType font.")
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--compress-level", type=int, default=1)
+    args = parser.parse_args()
+
+    font = ImageFont.truetype(args.font, 60)
+    lines = [*break_lines_by_width(_TEXT, font=font, max_width=864), " "]
+    # Number the posts so that no measurement is served from a previous post.
+    text_dictionaries = [
+        {
+            (f"{i} {line}" if position == 0 else line): font
+            for position, line in enumerate(lines)
+        }
+        for i in range(args.images)
+    ]
+    canvas_settings = {
+        "image_width": 1080,
+        "image_length": 1080,
+        "background_color": 255,
+    }
+
+    start = time.perf_counter()
+    for _ in render_images(
+        text_dictionaries,
+        canvas_settings=canvas_settings,
+        font_color=(0, 0, 0),
+        max_workers=args.workers,
+    ):
+        pass
+    seconds = time.perf_counter() - start
+    print(f"render_images:          {args.images / seconds:8.1f} images per second")
+
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths = [str(Path(directory) / f"{i}.png") for i in range(args.images)]
+        start = time.perf_counter()
+        for _ in render_images_to_files(
+            text_dictionaries,
+            filepaths=filepaths,
+            canvas_settings=canvas_settings,
+            font_color=(0, 0, 0),
+            save_kwargs={"compress_level": args.compress_level},
+            max_workers=args.workers,
+        ):
+            pass
+        seconds = time.perf_counter() - start
+    print(f"render_images_to_files: {args.images / seconds:8.1f} images per second")
+
+
+if __name__ == "__main__":
+    main()
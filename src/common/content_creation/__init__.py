@@ -1,3 +1,7 @@
 """Image creation and text creation pipelines."""
 
-from common.content_creation.pipeline import create_content_pipeline
+from common.content_creation.pipeline import (
+    create_batched_text_pipeline,
+    create_content_pipeline,
+    create_text_buffer_pipeline,
+)
@@ -1,26 +1,44 @@
 """Functions for content creation."""
 
 import ast
+import asyncio
+import logging
+from typing import Any, Generator, Optional
 
-import numpy as np
 import pandas as pd
-from common.llm.prompt_engineering.functions import prompt_wrapper
-from common.utilities.text_tools import (
-    calc_total_text_width_height,
-    calculate_max_line_length,
-    introduce_line_breaks,
+from common.deduplication import (
+    NearDuplicateDetector,
+    find_near_duplicates,
+    select_past_texts,
 )
+from common.hashtags import HASHTAG_POOL
+from common.llm.prompt_engineering.functions import (
+    MAX_TEXT_LENGTH,
+    PYDANTIC_OUTPUT_PARSER,
+    aprompt_wrapper,
+    prompt_wrapper,
+)
+from common.text_buffer import TEXT_BUFFER
+from common.utilities.canvas import get_canvas
+from common.utilities.rendering import draw_text
+from common.utilities.text_tools import break_lines_by_width, fit_text_to_box
 from common.utilities.text_tools.text_tools import _adjust_output_parser_key
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageFont
+
+logger = logging.getLogger(__name__)
 
 
 def save_pasts_text(
     namespace: str,
     text_dictionary: dict[str, str],
-    past_texts: pd.DataFrame,
+    past_texts: pd.DataFrame,  # noqa: ARG001
 ) -> pd.DataFrame:
     """Save the past texts.
 
+    Only the new text is returned, the history dataset appends it to the texts
+    that are already stored. ``past_texts`` is kept as input so that the text is
+    only saved after the history was read.
+
     Args:
     ----
         namespace (str): Namespace of the text.
@@ -33,28 +51,45 @@ def save_pasts_text(
 
     """
     entire_text = "".join(text_dictionary.keys())
-    data = pd.DataFrame(
+    return pd.DataFrame(
         {
             "topic": [namespace],
             "text": [entire_text],
             "timestamp": [pd.Timestamp.now()],
         }
     )
-    return pd.concat([past_texts, data])
 
 
-def create_text_for_image(
+def create_text_for_image(  # noqa: PLR0913
     template: str,
     output_parser_key: str,
     past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
 ) -> str:
     """Create the text that will be placed on the image.
 
+    The oldest pre-generated text of the buffer is used if there is one. Otherwise
+    the text is generated, and texts which are near duplicates of a past text are
+    rejected and regenerated, with the rejected text added to the texts the LLM is
+    told to avoid.
+
     Args:
     ----
         template (str): Template for the text.
         output_parser_key (str): Key to the right output parser for the llm.
         past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): Settings for the selection of past texts
+            that are passed into the prompt.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` from which
+            a text counts as duplicate and the number of ``max_regenerations``.
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace
+            with the settings of the model. Defaults to None.
+
+    Raises:
+    ------
+        ValueError: If every regeneration was a near duplicate.
 
     Returns:
     -------
@@ -62,36 +97,376 @@ def create_text_for_image(
             attributes.
 
     """
-    list_of_past_texts = past_texts.loc[:, "text"].tolist()
-    parser_key, topic = _adjust_output_parser_key(output_parser_key=output_parser_key)
-    return prompt_wrapper(
-        inputs={"topic": topic, "past_texts": list_of_past_texts},
+    generation = _generate_text(
         template=template,
-        output_parser_key=parser_key,
+        output_parser_key=output_parser_key,
+        past_texts=past_texts,
+        context_params=context_params,
+        deduplication_params=deduplication_params,
+        llm_params=llm_params,
     )
+    try:
+        prompt = next(generation)
+        while True:
+            prompt = generation.send(prompt_wrapper(**prompt))
+    except StopIteration as stop:
+        return stop.value
 
 
-def create_white_image(params: dict[str]) -> Image:
-    """Create a white canvas.
+async def acreate_text_for_image(  # noqa: PLR0913
+    template: str,
+    output_parser_key: str,
+    past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
+) -> str:
+    """Asynchronous version of ``create_text_for_image``.
 
     Args:
     ----
-        params (dict[str]): Contains the information about background color, image
-            length and width.
+        template (str): Template for the text.
+        output_parser_key (str): Key to the right output parser for the llm.
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): Settings for the selection of past texts
+            that are passed into the prompt.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` from which
+            a text counts as duplicate and the number of ``max_regenerations``.
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace
+            with the settings of the model. Defaults to None.
+
+    Raises:
+    ------
+        ValueError: If every regeneration was a near duplicate.
 
     Returns:
     -------
-        Image: Background image.
+        str: The output of the pipeline. This oftentimes is a class which has different
+            attributes.
+
+    """
+    generation = _generate_text(
+        template=template,
+        output_parser_key=output_parser_key,
+        past_texts=past_texts,
+        context_params=context_params,
+        deduplication_params=deduplication_params,
+        llm_params=llm_params,
+    )
+    try:
+        prompt = next(generation)
+        while True:
+            prompt = generation.send(await aprompt_wrapper(**prompt))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def acreate_texts_for_variants(  # noqa: PLR0913
+    past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    max_concurrency: int,
+    llm_params: Optional[dict[str, Any]],
+    *templates: str,
+    output_parser_key: str,
+    variants: list[str],
+) -> dict[str, object]:
+    """Create the texts of all variants with concurrent prompts.
+
+    Every variant keeps its own prompt, but all of them are in flight at the same
+    time on the shared event loop instead of occupying one thread each.
+
+    Args:
+    ----
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): Settings for the selection of past texts
+            that are passed into the prompt.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` from which
+            a text counts as duplicate and the number of ``max_regenerations``.
+        max_concurrency (int): Maximum number of prompts in flight.
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace
+            with the settings of the model.
+        *templates (str): Template of every variant, in the order of ``variants``.
+        output_parser_key (str): Top level namespace, e.g. ``quote``.
+        variants (list[str]): Variants for which a text is created.
+
+    Returns:
+    -------
+        dict[str, object]: Mapping from variant to the object of its text.
 
     """
-    image_width = params["image_width"]
-    image_length = params["image_length"]
-    background_color = params["background_color"]
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def create_text(template: str, variant: str) -> object:
+        async with semaphore:
+            return await acreate_text_for_image(
+                template=template,
+                output_parser_key=f"{output_parser_key}.{variant}",
+                past_texts=past_texts,
+                context_params=context_params,
+                deduplication_params=deduplication_params,
+                llm_params=llm_params,
+            )
+
+    texts = await asyncio.gather(
+        *(
+            create_text(template=template, variant=variant)
+            for template, variant in zip(templates, variants)
+        )
+    )
+    return dict(zip(variants, texts))
+
+
+def create_texts_for_images(  # noqa: PLR0913
+    template: str,
+    output_parser_key: str,
+    variants: list[str],
+    past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
+) -> dict[str, object]:
+    """Create the texts for all variants of a namespace with a single prompt.
+
+    The past texts are only sent and tokenised once instead of once per variant.
+    Variants with a pre-generated text in their buffer are not prompted for at all,
+    and only the variants whose text is missing from the response or is a near
+    duplicate of a past text are prompted for again.
 
-    white_array = np.full(
-        (image_width, image_length, 3), background_color, dtype=np.uint8
+    Args:
+    ----
+        template (str): Template for the batch of texts.
+        output_parser_key (str): Top level namespace, e.g. ``quote``. Used to find the
+            output parser of the individual texts.
+        variants (list[str]): Variants for which a text is created.
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): Settings for the selection of past texts
+            that are passed into the prompt.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` from which
+            a text counts as duplicate and the number of ``max_regenerations``.
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace
+            with the settings of the model. Defaults to None.
+
+    Raises:
+    ------
+        ValueError: If no text or only near duplicates were generated for a variant
+            within ``max_regenerations`` retries.
+
+    Returns:
+    -------
+        dict[str, object]: Mapping from variant to the object of its text.
+
+    """
+    texts = {}
+    for variant in variants:
+        text_object = _take_buffered_text(
+            topic=f"{output_parser_key}.{variant}",
+            parser_key=output_parser_key,
+            past_texts=past_texts,
+            deduplication_params=deduplication_params,
+        )
+        if text_object is not None:
+            texts[variant] = text_object
+    remaining_variants = [variant for variant in variants if variant not in texts]
+    if not remaining_variants:
+        return texts
+
+    list_of_past_texts = select_past_texts(
+        past_texts=past_texts,
+        topic=output_parser_key,
+        query=" ".join(remaining_variants),
+        params=context_params,
     )
-    return Image.fromarray(white_array, "RGB")
+    text_class = PYDANTIC_OUTPUT_PARSER[output_parser_key]
+
+    for attempt in range(deduplication_params["max_regenerations"] + 1):
+        text_batch = prompt_wrapper(
+            inputs={
+                "topics": ", ".join(remaining_variants),
+                "past_texts": list_of_past_texts,
+            },
+            template=template,
+            output_parser_key="batch",
+            llm_settings=llm_params,
+            refresh_cache=attempt > 0,
+        )
+        batch_texts = {}
+        for item in text_batch.texts:
+            variant = item.variant.lower()
+            if variant in remaining_variants:
+                batch_texts.setdefault(variant, text_class(text=item.text))
+
+        duplicates = find_near_duplicates(
+            texts={variant: text.text for variant, text in batch_texts.items()},
+            past_texts=past_texts,
+            threshold=deduplication_params["threshold"],
+            detector_filepath=deduplication_params.get("detector_filepath"),
+        )
+        texts.update(
+            {
+                variant: text
+                for variant, text in batch_texts.items()
+                if variant not in duplicates
+            }
+        )
+        remaining_variants = [v for v in remaining_variants if v not in texts]
+        if not remaining_variants:
+            return {variant: texts[variant] for variant in variants}
+
+        missing_variants = [v for v in remaining_variants if v not in batch_texts]
+        if missing_variants:
+            logger.info(
+                "No text was generated for %s, prompting again.", missing_variants
+            )
+        if duplicates:
+            logger.info(
+                "Rejected near duplicates for %s, regenerating.", list(duplicates)
+            )
+        list_of_past_texts = [
+            *list_of_past_texts,
+            *(batch_texts[variant].text for variant in duplicates),
+        ]
+
+    raise ValueError(f"No new text was generated for {remaining_variants}.")
+
+
+def refill_text_buffers(  # noqa: PLR0913
+    template: str,
+    output_parser_key: str,
+    variants: list[str],
+    past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    buffer_params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
+) -> None:
+    """Fill the text buffers of all variants of a namespace with batched prompts.
+
+    Every prompt asks for up to ``per_batch`` texts of each variant whose buffer is
+    not full yet. Texts which exceed the length limit or are near duplicates of a
+    past or buffered text are discarded.
+
+    Args:
+    ----
+        template (str): Template for the batch of texts.
+        output_parser_key (str): Top level namespace, e.g. ``quote``.
+        variants (list[str]): Variants whose buffers are filled.
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): Settings for the selection of past texts
+            that are passed into the prompt.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` from which
+            a text counts as duplicate.
+        buffer_params (dict[str, Any]): Contains the number of texts per buffer
+            (``size``), the texts per variant and prompt (``per_batch``) and the
+            maximum number of prompts (``max_batches``).
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace
+            with the settings of the model. Defaults to None.
+
+    """
+    max_length = MAX_TEXT_LENGTH.get(output_parser_key)
+    for _ in range(buffer_params["max_batches"]):
+        counts = TEXT_BUFFER.counts(output_parser_key)
+        missing = {
+            variant: buffer_params["size"]
+            - counts.get(f"{output_parser_key}.{variant}", 0)
+            for variant in variants
+        }
+        topics = [
+            variant
+            for variant, count in missing.items()
+            for _ in range(min(count, buffer_params["per_batch"]))
+        ]
+        if not topics:
+            break
+
+        buffered_texts = TEXT_BUFFER.texts(output_parser_key)
+        list_of_past_texts = select_past_texts(
+            past_texts=past_texts,
+            topic=output_parser_key,
+            query=" ".join(sorted(set(topics))),
+            params=context_params,
+        )
+        text_batch = prompt_wrapper(
+            inputs={
+                "topics": ", ".join(topics),
+                "past_texts": [*list_of_past_texts, *buffered_texts],
+            },
+            template=template,
+            output_parser_key="batch",
+            use_cache=False,
+            llm_settings=llm_params,
+        )
+
+        candidates = {}
+        for item in text_batch.texts:
+            variant = item.variant.lower()
+            too_long = max_length is not None and len(item.text) > max_length
+            if variant in missing and not too_long:
+                candidates.setdefault(item.text, variant)
+        duplicates = find_near_duplicates(
+            texts={text: text for text in candidates},
+            past_texts=past_texts,
+            threshold=deduplication_params["threshold"],
+            detector_filepath=deduplication_params.get("detector_filepath"),
+        )
+        # The buffered texts change with every batch, they get a detector of their
+        # own instead of invalidating the one of the history.
+        buffer_detector = NearDuplicateDetector.from_texts(buffered_texts)
+        new_texts = {}
+        for text, variant in candidates.items():
+            variant_texts = new_texts.setdefault(variant, [])
+            if (
+                text in duplicates
+                or len(variant_texts) >= missing[variant]
+                or buffer_detector.find_duplicate(
+                    text=text, threshold=deduplication_params["threshold"]
+                )
+            ):
+                continue
+            variant_texts.append(text)
+            buffer_detector.add(text)
+        for variant, variant_texts in new_texts.items():
+            TEXT_BUFFER.push(
+                topic=f"{output_parser_key}.{variant}", texts=variant_texts
+            )
+
+    logger.info("Buffered texts: %s.", TEXT_BUFFER.counts(output_parser_key))
+
+
+def select_text_for_variant(
+    texts_for_images: dict[str, object], variant: str
+) -> object:
+    """Select the text of a single variant out of a batch.
+
+    Args:
+    ----
+        texts_for_images (dict[str, object]): Mapping from variant to text object.
+        variant (str): Variant whose text is selected.
+
+    Returns:
+    -------
+        object: The text object of the variant.
+
+    """
+    return texts_for_images[variant]
+
+
+def create_canvas(params: dict[str]) -> Image:
+    """Create the canvas the text is placed on.
+
+    The base canvas is built once per settings, every call returns a copy of it.
+
+    Args:
+    ----
+        params (dict[str]): Contains the information about background color, image
+            length and width, and optionally a background image or gradient.
+
+    Returns:
+    -------
+        Image: Background image.
+
+    """
+    return get_canvas(params)
 
 
 def apply_text_on_image(
@@ -117,63 +492,94 @@ def apply_text_on_image(
 
     """
     font_color = ast.literal_eval(params["font_color"])
-    draw = ImageDraw.Draw(image)
+    return draw_text(
+        image=image, text_dictionary=text_dictionary, font_color=font_color
+    )
 
-    # Calculate the total height of the text.
-    _, total_height = calc_total_text_width_height(text_dictionary=text_dictionary)
 
-    # # Calculate the starting y-coordinate to center the text vertically.
-    y_start = (image.height - total_height) // 2
+def create_hashtags(
+    template: str,
+    output_parser_key: str,
+    params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
+) -> list[str]:
+    """Create hashtags for an Instagram post.
 
-    # # Draw each line of text.
-    for text, font in text_dictionary.items():
-        _, _, text_width, text_height = draw.textbbox((0, 0), text=text, font=font)
-        x = (image.width - text_width) // 2
-        draw.text((x, y_start), text, font=font, fill=font_color)
-        y_start += text_height  # Move down for the next line
+    The hashtags are sampled from the hashtag pool of the subtopic. The LLM is only
+    asked for new hashtags once the pool is stale, or while it is too small for at
+    most ``max_refreshes`` times per ``refresh_days``.
 
-    return image
+    Args:
+    ----
+        template (str): Template for the hashtags.
+        output_parser_key (str): Namespace of the post, e.g. ``quote.love``. The
+            subtopic is used as topic of the hashtags.
+        params (dict[str, Any]): Contains the number of hashtags per post
+            (``count``), the ``refresh_days`` after which the pool is stale, its
+            ``min_pool_size`` and the ``max_refreshes`` to reach it.
+        llm_params (dict[str, Any], optional): The ``llm`` block of the namespace,
+            whose ``hashtag_model`` is used if set. Defaults to None.
 
+    Returns:
+    -------
+        list[str]: The hashtags to be included in the Instagram post.
 
-def create_hashtags(
-    system_message: str,
-    instruction_message: str,
+    """
+    topic, scores = _get_hashtag_pool(output_parser_key, params)
+    if scores is None:
+        hashtags = prompt_wrapper(**_hashtag_prompt(topic, template, llm_params))
+        scores = _update_hashtag_pool(topic, hashtags.hashtag, params)
+    return HASHTAG_POOL.sample(scores, k=params["count"])
+
+
+async def acreate_hashtags(
+    template: str,
     output_parser_key: str,
+    params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]] = None,
 ) -> list[str]:
-    """Create hashtags for an Instagram post.
+    """Asynchronous version of ``create_hashtags``.
 
     Args:
     ----
-        system_message (str): System message which tells AI how to behave.
-        instruction_message (str): Instruction message which tells AI what to do.
-        output_parser_key (str): The key to the output parser.
+        template (str): Template for the hashtags.
+        output_parser_key (str): Namespace of the post, e.g. ``quote.love``. The
+            subtopic is used as topic of the hashtags.
+        params (dict[str, Any]): See ``create_hashtags``.
+        llm_params (dict[str, Any], optional): See ``create_hashtags``.
 
     Returns:
     -------
         list[str]: The hashtags to be included in the Instagram post.
 
     """
-    adjusted_instruction_message = instruction_message.format(
-        topic="love", format_instructions="{format_instructions}"
-    )
-
-    return prompt_wrapper(
-        system_message=system_message,
-        instruction_message=adjusted_instruction_message,
-        output_parser_key=output_parser_key,
-    ).hashtag
+    topic, scores = _get_hashtag_pool(output_parser_key, params)
+    if scores is None:
+        hashtags = await aprompt_wrapper(**_hashtag_prompt(topic, template, llm_params))
+        scores = _update_hashtag_pool(topic, hashtags.hashtag, params)
+    return HASHTAG_POOL.sample(scores, k=params["count"])
 
 
 def create_text_dictionary(
     text_for_image: str,
     font: ImageFont.FreeTypeFont,
+    canvas_settings: dict[str, Any],
+    layout_params: dict[str, Any],
 ) -> dict[str, str]:
     """Create a dictionary from the text for the image.
 
+    With ``autofit`` the font size is the largest one between ``min_fontsize`` and
+    ``max_fontsize`` for which the wrapped text fits within the margins of the
+    canvas. Otherwise the size of the loaded font is used.
+
     Args:
     ----
         text_for_image: Text for the image.
         font: Font used for the text.
+        canvas_settings: Contains the width and length of the image.
+        layout_params: Contains the ``margin_percentage`` on either side of the text,
+            whether lines are ``balanced`` instead of filled greedily and the
+            ``autofit`` settings.
 
     Returns:
     -------
@@ -181,14 +587,220 @@ def create_text_dictionary(
 
     """
     text = text_for_image.text
+    margin_factor = 1 - layout_params["margin_percentage"] * 2
 
-    # Calculate the maximum line length.
-    max_line_length = calculate_max_line_length(
-        font=font,
-    )
+    # Calculate the usable width of the canvas.
+    max_width = canvas_settings["image_width"] * margin_factor
 
     # Introduce line breaks in the quote text.
-    adjusted_text = introduce_line_breaks(text=text, max_line_length=max_line_length)
+    if layout_params.get("autofit", False):
+        adjusted_text, font = fit_text_to_box(
+            text=text,
+            font=font,
+            max_width=max_width,
+            max_height=canvas_settings["image_length"] * margin_factor,
+            min_fontsize=layout_params["min_fontsize"],
+            max_fontsize=layout_params["max_fontsize"],
+            balanced=layout_params["balanced"],
+        )
+    else:
+        adjusted_text = break_lines_by_width(
+            text=text,
+            font=font,
+            max_width=max_width,
+            balanced=layout_params["balanced"],
+        )
     adjusted_text += [" "]
 
     return {i: font for i in adjusted_text}
+
+
+def _generate_text(  # noqa: PLR0913
+    template: str,
+    output_parser_key: str,
+    past_texts: pd.DataFrame,
+    context_params: dict[str, Any],
+    deduplication_params: dict[str, Any],
+    llm_params: Optional[dict[str, Any]],
+) -> Generator[dict[str, Any], object, object]:
+    """Select and deduplicate the text of ``create_text_for_image``.
+
+    The generator yields the keyword arguments of every prompt and is sent the text
+    object the LLM answered with, so that the synchronous and the asynchronous
+    version only differ in how they prompt.
+
+    Args:
+    ----
+        template (str): Template for the text.
+        output_parser_key (str): Key to the right output parser for the llm.
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        context_params (dict[str, Any]): See ``create_text_for_image``.
+        deduplication_params (dict[str, Any]): See ``create_text_for_image``.
+        llm_params (dict[str, Any], optional): See ``create_text_for_image``.
+
+    Raises:
+    ------
+        ValueError: If every regeneration was a near duplicate.
+
+    Yields:
+    ------
+        dict[str, Any]: Keyword arguments of ``prompt_wrapper`` and
+            ``aprompt_wrapper``.
+
+    Returns:
+    -------
+        object: The buffered text object or the first generated one which is not a
+            near duplicate.
+
+    """
+    parser_key, topic = _adjust_output_parser_key(output_parser_key=output_parser_key)
+    text_object = _take_buffered_text(
+        topic=output_parser_key,
+        parser_key=parser_key,
+        past_texts=past_texts,
+        deduplication_params=deduplication_params,
+    )
+    if text_object is not None:
+        return text_object
+
+    list_of_past_texts = select_past_texts(
+        past_texts=past_texts,
+        topic=output_parser_key,
+        query=topic,
+        params=context_params,
+    )
+
+    for attempt in range(deduplication_params["max_regenerations"] + 1):
+        text_object = yield {
+            "inputs": {"topic": topic, "past_texts": list_of_past_texts},
+            "template": template,
+            "output_parser_key": parser_key,
+            "llm_settings": llm_params,
+            "refresh_cache": attempt > 0,
+        }
+        duplicates = find_near_duplicates(
+            texts={topic: text_object.text},
+            past_texts=past_texts,
+            threshold=deduplication_params["threshold"],
+            detector_filepath=deduplication_params.get("detector_filepath"),
+        )
+        if not duplicates:
+            return text_object
+
+        logger.info("Rejected near duplicate %r, regenerating.", text_object.text)
+        list_of_past_texts = [*list_of_past_texts, text_object.text]
+
+    raise ValueError(f"Only near duplicates were generated for {output_parser_key}.")
+
+
+def _take_buffered_text(
+    topic: str,
+    parser_key: str,
+    past_texts: pd.DataFrame,
+    deduplication_params: dict[str, Any],
+) -> Optional[object]:
+    """Take the oldest buffered text of a topic which is not a near duplicate.
+
+    Buffered texts which became near duplicates of a past text since they were
+    generated are discarded. The taken texts stay leased in the buffer until the run
+    ends, see ``TextBufferHooks``.
+
+    Args:
+    ----
+        topic (str): Namespace of the text, e.g. ``quote.love``.
+        parser_key (str): Key of the class of the text, e.g. ``quote``.
+        past_texts (pd.DataFrame): DataFrame containing author and text.
+        deduplication_params (dict[str, Any]): Contains the ``threshold`` and
+            optionally the ``detector_filepath``.
+
+    Returns:
+    -------
+        Optional[object]: The text object, None if the buffer is empty.
+
+    """
+    text = TEXT_BUFFER.take(topic)
+    while text is not None:
+        if not find_near_duplicates(
+            texts={topic: text},
+            past_texts=past_texts,
+            threshold=deduplication_params["threshold"],
+            detector_filepath=deduplication_params.get("detector_filepath"),
+        ):
+            logger.info("Took the text of %s from the buffer.", topic)
+            return PYDANTIC_OUTPUT_PARSER[parser_key](text=text)
+        logger.info("Discarded buffered near duplicate %r.", text)
+        text = TEXT_BUFFER.take(topic)
+    return None
+
+
+def _get_hashtag_pool(
+    output_parser_key: str, params: dict[str, Any]
+) -> tuple[str, Optional[dict[str, float]]]:
+    """Return the topic of a post and its hashtag pool, unless that is due.
+
+    Args:
+    ----
+        output_parser_key (str): Namespace of the post, e.g. ``quote.love``.
+        params (dict[str, Any]): See ``create_hashtags``.
+
+    Returns:
+    -------
+        tuple[str, Optional[dict[str, float]]]: The subtopic and the score per
+            hashtag, None if the LLM has to refresh the pool.
+
+    """
+    _, topic = _adjust_output_parser_key(output_parser_key=output_parser_key)
+    scores = HASHTAG_POOL.get(
+        topic,
+        max_age_seconds=params["refresh_days"] * 86400,
+        min_size=params["min_pool_size"],
+        max_refreshes=params["max_refreshes"],
+    )
+    return topic, scores
+
+
+def _hashtag_prompt(
+    topic: str, template: str, llm_params: Optional[dict[str, Any]]
+) -> dict[str, Any]:
+    """Return the arguments of the prompt for new hashtags of a topic.
+
+    Args:
+    ----
+        topic (str): Topic of the hashtags.
+        template (str): Template for the hashtags.
+        llm_params (dict[str, Any], optional): See ``create_hashtags``.
+
+    Returns:
+    -------
+        dict[str, Any]: Keyword arguments of ``prompt_wrapper`` and
+            ``aprompt_wrapper``.
+
+    """
+    return {
+        "inputs": {"topic": topic},
+        "template": template,
+        "output_parser_key": "hashtag",
+        "use_cache": False,
+        "llm_settings": llm_params,
+    }
+
+
+def _update_hashtag_pool(
+    topic: str, hashtags: list[str], params: dict[str, Any]
+) -> dict[str, float]:
+    """Add the hashtags suggested by the LLM to the pool of a topic.
+
+    Args:
+    ----
+        topic (str): Topic of the hashtags.
+        hashtags (list[str]): Hashtags suggested by the LLM.
+        params (dict[str, Any]): See ``create_hashtags``.
+
+    Returns:
+    -------
+        dict[str, float]: The refreshed pool.
+
+    """
+    return HASHTAG_POOL.update(
+        topic, hashtags, max_age_seconds=params["refresh_days"] * 86400
+    )
@@ -3,44 +3,177 @@
 from functools import partial
 
 from common.content_creation.functions import (
+    acreate_texts_for_variants,
     apply_text_on_image,
+    create_canvas,
     create_hashtags,
     create_text_dictionary,
     create_text_for_image,
-    create_white_image,
+    create_texts_for_images,
+    refill_text_buffers,
     save_pasts_text,
+    select_text_for_variant,
 )
+from common.llm.event_loop import as_sync
 from kedro.pipeline import Pipeline, node, pipeline
 
 
-def create_text_object_pipeline(namespace: str = None, inputs: str = None) -> Pipeline:
-    """Pipeline for creating text objects.
+def create_batched_text_pipeline(
+    namespace: str, variants: list[str], concurrent: bool = False
+) -> Pipeline:
+    """Pipeline creating the texts of all variants in a single node.
+
+    By default a single prompt returns the texts of all variants. With
+    ``concurrent=True`` every variant keeps its own prompt, but all prompts are sent
+    concurrently from the shared event loop. Either way the result is split back
+    into one ``text_for_image`` per variant, which is picked up by the content
+    pipelines created with ``batched=True``.
 
     Args:
     ----
-        namespace (str, optional): Namespace for input/ output. Defaults to None.
-        inputs (str, optional): Input to use default. Defaults to None.
+        namespace (str): Top level namespace, e.g. ``quote``.
+        variants (list[str]): Variants of the namespace.
+        concurrent (bool, optional): Whether to send one prompt per variant
+            concurrently instead of a single prompt. Defaults to False.
 
     Returns:
     -------
-        Pipeline: Pipeline for creating text objects.
+        Pipeline: Pipeline for creating the texts of all variants.
+
+    """
+    if concurrent:
+        text_node = node(
+            func=as_sync(
+                partial(
+                    acreate_texts_for_variants,
+                    output_parser_key=namespace,
+                    variants=variants,
+                )
+            ),
+            inputs=[
+                "past_texts",
+                "params:past_text_context",
+                "params:deduplication",
+                "params:max_concurrency",
+                "params:llm",
+                *(f"params:{variant}.template" for variant in variants),
+            ],
+            outputs="texts_for_images",
+            name="create_texts_for_images",
+            tags=["llm"],
+        )
+    else:
+        text_node = node(
+            func=partial(
+                create_texts_for_images,
+                output_parser_key=namespace,
+                variants=variants,
+            ),
+            inputs={
+                "template": "params:batch_template",
+                "past_texts": "past_texts",
+                "context_params": "params:past_text_context",
+                "deduplication_params": "params:deduplication",
+                "llm_params": "params:llm",
+            },
+            outputs="texts_for_images",
+            name="create_texts_for_images",
+            tags=["llm"],
+        )
+
+    nodes = [text_node] + [
+        node(
+            func=partial(select_text_for_variant, variant=variant),
+            inputs={"texts_for_images": "texts_for_images"},
+            outputs=f"{variant}.text_for_image",
+            name=f"{variant}.select_text_for_variant",
+        )
+        for variant in variants
+    ]
+    return pipeline(pipe=Pipeline(nodes), namespace=namespace, inputs={"past_texts"})
+
+
+def create_text_buffer_pipeline(namespace: str, variants: list[str]) -> Pipeline:
+    """Pipeline filling the text buffers of all variants with batched prompts.
+
+    The pipeline is meant to run in idle time, so that the content pipelines take
+    their texts from the buffers instead of waiting for the LLM.
+
+    Args:
+    ----
+        namespace (str): Top level namespace, e.g. ``quote``.
+        variants (list[str]): Variants of the namespace.
+
+    Returns:
+    -------
+        Pipeline: Pipeline for filling the text buffers.
 
     """
     nodes = [
         node(
-            func=partial(create_text_for_image, output_parser_key=namespace),
+            func=partial(
+                refill_text_buffers, output_parser_key=namespace, variants=variants
+            ),
             inputs={
-                "template": "params:template",
+                "template": "params:batch_template",
                 "past_texts": "past_texts",
+                "context_params": "params:past_text_context",
+                "deduplication_params": "params:deduplication",
+                "buffer_params": "params:text_buffer",
+                "llm_params": "params:llm",
             },
-            outputs="text_for_image",
-            name="create_text_for_image",
+            outputs=None,
+            name="refill_text_buffers",
+            tags=["llm"],
         ),
+    ]
+    return pipeline(pipe=Pipeline(nodes), namespace=namespace, inputs={"past_texts"})
+
+
+def create_text_object_pipeline(
+    namespace: str = None, inputs: str = None, batched: bool = False
+) -> Pipeline:
+    """Pipeline for creating text objects.
+
+    Args:
+    ----
+        namespace (str, optional): Namespace for input/ output. Defaults to None.
+        inputs (str, optional): Input to use default. Defaults to None.
+        batched (bool, optional): Whether the text is created by the batched text
+            pipeline instead of a dedicated LLM call. Defaults to False.
+
+    Returns:
+    -------
+        Pipeline: Pipeline for creating text objects.
+
+    """
+    text_nodes = (
+        []
+        if batched
+        else [
+            node(
+                func=partial(create_text_for_image, output_parser_key=namespace),
+                inputs={
+                    "template": "params:template",
+                    "past_texts": "past_texts",
+                    "context_params": "params:past_text_context",
+                    "deduplication_params": "params:deduplication",
+                    "llm_params": "params:llm",
+                },
+                outputs="text_for_image",
+                name="create_text_for_image",
+                tags=["llm"],
+            ),
+        ]
+    )
+    nodes = text_nodes + [
         node(
             func=create_text_dictionary,
             inputs={
                 "text_for_image": "text_for_image",
                 "font": "font",
+                "canvas_settings": "params:canvas_settings",
+                "layout_params": "params:text_layout",
             },
             outputs="text_dictionary",
             name="create_text_dictionary",
@@ -53,6 +186,7 @@ def create_text_object_pipeline(namespace: str = None, inputs: str = None) -> Pi
             },
             outputs="adjusted_past_texts",
             name="save_pasts_text",
+            tags=["history"],
         ),
     ]
     return pipeline(pipe=Pipeline(nodes), namespace=namespace, inputs=inputs)
@@ -75,20 +209,22 @@ def create_image_creation_pipeline(
     """
     nodes = [
         node(
-            func=create_white_image,
+            func=create_canvas,
             inputs="params:canvas_settings",
-            outputs="white_canvas",
-            name="create_white_canvas",
+            outputs="canvas",
+            name="create_canvas",
+            tags=["render"],
         ),
         node(
             func=apply_text_on_image,
             inputs={
-                "image": "white_canvas",
+                "image": "canvas",
                 "text_dictionary": "text_dictionary",
                 "params": "params:final_image",
             },
             outputs="final_image",
             name="create_final_image",
+            tags=["render"],
         ),
     ]
     return pipeline(pipe=Pipeline(nodes), namespace=namespace, inputs=inputs)
@@ -109,30 +245,38 @@ def create_hashtags_pipeline(inputs: str = None, namespace: str = None) -> Pipel
     """
     nodes = [
         node(
-            func=partial(create_hashtags, output_parser_key="hashtag"),
+            func=partial(create_hashtags, output_parser_key=namespace),
             inputs={
-                "system_message": "params:hashtag_system_message",
-                "instruction_message": "params:hashtag_instruction_message",
+                "template": "params:hashtag_template",
+                "params": "params:hashtags",
+                "llm_params": "params:llm",
             },
             outputs="hashtags",
             name="create_hashtags",
+            tags=["llm"],
         ),
     ]
     return pipeline(pipe=Pipeline(nodes), namespace=namespace, inputs=inputs)
 
 
-def create_content_pipeline(namespace: str = None) -> Pipeline:
+def create_content_pipeline(namespace: str = None, batched: bool = False) -> Pipeline:
     """Pipeline for creating content.
 
     Args:
     ----
         namespace (str, optional): Namespace for input/ output. Defaults to None.
+        batched (bool, optional): Whether the text is created by the batched text
+            pipeline. Defaults to False.
 
     Returns:
     -------
         Pipeline: Pipeline for creating content.
 
     """
-    return create_text_object_pipeline(
-        namespace=namespace, inputs={"past_texts", "font"}
-    ) + create_image_creation_pipeline(namespace=namespace)
+    return (
+        create_text_object_pipeline(
+            namespace=namespace, inputs={"past_texts", "font"}, batched=batched
+        )
+        + create_image_creation_pipeline(namespace=namespace)
+        + create_hashtags_pipeline(namespace=namespace)
+    )
@@ -0,0 +1,5 @@
+"""Deduplication against the texts that were already published."""
+
+from common.deduplication.functions import find_near_duplicates, select_past_texts
+from common.deduplication.near_duplicates import NearDuplicateDetector
+from common.deduplication.past_text_index import PastTextIndex
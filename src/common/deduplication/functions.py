@@ -0,0 +1,114 @@
+"""Functions selecting the past texts that are sent to the LLM."""
+
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from common.deduplication.near_duplicates import get_near_duplicate_detector
+from common.deduplication.past_text_index import PastTextIndex
+from common.utilities.tokens import estimate_tokens
+
+
+def select_past_texts(
+    past_texts: pd.DataFrame,
+    topic: str,
+    query: str,
+    params: dict[str, Any],
+) -> list[str]:
+    """Select a bounded number of past texts of a topic for the prompt.
+
+    Only the most recent texts and the texts most similar to the query are kept, and
+    the selection is cut off once the token budget is used up. The prompt size
+    therefore stays constant no matter how long the history gets.
+
+    Args:
+    ----
+        past_texts (pd.DataFrame): DataFrame containing topic, text and timestamp.
+        topic (str): Namespace of the texts, e.g. ``quote.love`` or ``quote``.
+        query (str): Text used to find similar past texts, e.g. the subtopic.
+        params (dict[str, Any]): Contains ``recent_k``, ``top_k``, ``token_budget``
+            and optionally the ``index_dir`` in which the index is kept on disk.
+
+    Returns:
+    -------
+        list[str]: The selected past texts.
+
+    """
+    topics = past_texts.loc[:, "topic"].astype(str)
+    is_topic = (topics == topic) | topics.str.startswith(f"{topic}.")
+    topic_texts = past_texts.loc[is_topic].sort_values("timestamp", kind="stable")
+    texts = topic_texts.loc[:, "text"].astype(str).tolist()
+
+    index = _load_index(topic=topic, texts=texts, index_dir=params.get("index_dir"))
+
+    recent_texts = texts[::-1][: params["recent_k"]]
+    similar_texts = index.most_similar(query=query, k=params["top_k"])
+
+    selected_texts = []
+    used_tokens = 0
+    for text in dict.fromkeys(recent_texts + similar_texts):
+        used_tokens += estimate_tokens(text)
+        if used_tokens > params["token_budget"]:
+            break
+        selected_texts.append(text)
+    return selected_texts
+
+
+def find_near_duplicates(
+    texts: dict[str, str],
+    past_texts: pd.DataFrame,
+    threshold: float,
+    detector_filepath: str = None,
+) -> dict[str, str]:
+    """Find the generated texts which are near duplicates of past texts.
+
+    Args:
+    ----
+        texts (dict[str, str]): Generated texts keyed by variant.
+        past_texts (pd.DataFrame): DataFrame containing topic, text and timestamp.
+        threshold (float): Estimated Jaccard similarity from which a text counts as
+            duplicate.
+        detector_filepath (str, optional): Location in which the signatures of the
+            past texts are kept. They are kept in memory only if not given.
+            Defaults to None.
+
+    Returns:
+    -------
+        dict[str, str]: The past text each duplicate resembles, keyed by variant.
+
+    """
+    detector = get_near_duplicate_detector(
+        texts=past_texts.loc[:, "text"], filepath=detector_filepath
+    )
+    duplicates = {
+        key: detector.find_duplicate(text=text, threshold=threshold)
+        for key, text in texts.items()
+    }
+    return {key: past_text for key, past_text in duplicates.items() if past_text}
+
+
+def _load_index(topic: str, texts: list[str], index_dir: str = None) -> PastTextIndex:
+    """Load the index of a topic and add the texts that are not indexed yet.
+
+    Args:
+    ----
+        topic (str): Namespace of the texts.
+        texts (list[str]): All past texts of the topic, oldest first.
+        index_dir (str, optional): Directory in which the index is kept. The index
+            is kept in memory only if not given. Defaults to None.
+
+    Returns:
+    -------
+        PastTextIndex: Index containing all past texts of the topic.
+
+    """
+    if index_dir is None:
+        index = PastTextIndex()
+        index.update(texts)
+        return index
+
+    filepath = Path(index_dir) / f"{topic}.npz"
+    index = PastTextIndex.load(filepath)
+    if index.update(texts):
+        index.save(filepath)
+    return index
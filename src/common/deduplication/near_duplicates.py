@@ -0,0 +1,352 @@
+"""MinHash LSH detector for near-duplicate texts."""
+
+import logging
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+from common.utilities.files import open_atomically
+
+logger = logging.getLogger(__name__)
+
+_PRIME = np.uint64((1 << 32) + 15)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class NearDuplicateDetector:
+    """Detect texts which are near duplicates of already stored texts.
+
+    Every text is reduced to a MinHash signature over its word shingles. The
+    signatures are split into bands which are stored in hash tables, so a candidate
+    is only compared with the texts that share at least one band with it. Checking
+    a candidate therefore costs a signature and a handful of dictionary lookups, no
+    matter how many texts are stored.
+
+    Example:
+    -------
+    ::
+
+        >>> detector = NearDuplicateDetector.load("data/04_feature/near_duplicates.npz")
+        >>> detector.update(past_texts.loc[:, "text"])
+        >>> detector.find_duplicate("Love is patient, love is kind.")
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 3,
+        threshold: float = 0.7,
+        seed: int = 1,
+        texts: Optional[list[str]] = None,
+        signatures: Optional[np.ndarray] = None,
+        last_id: int = -1,
+    ):
+        """Create a new detector.
+
+        Args:
+        ----
+            num_perm (int, optional): Number of hash functions of the signature.
+                Defaults to 128.
+            bands (int, optional): Number of LSH bands, has to divide ``num_perm``.
+                Defaults to 32.
+            shingle_size (int, optional): Number of words per shingle. Defaults to 3.
+            threshold (float, optional): Estimated Jaccard similarity from which a
+                text counts as duplicate. Defaults to 0.7.
+            seed (int, optional): Seed of the hash functions. Defaults to 1.
+            texts (list[str], optional): Texts already contained in the detector.
+                Defaults to None.
+            signatures (np.ndarray, optional): Signatures of ``texts``. Defaults to
+                None.
+            last_id (int, optional): Row id of the last text in the history.
+                Defaults to -1.
+
+        """
+        if num_perm % bands:
+            raise ValueError("The number of bands has to divide num_perm.")
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._num_perm = num_perm
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._shingle_size = shingle_size
+        self._threshold = threshold
+        self._seed = seed
+        self._clear()
+        if texts:
+            self._texts = list(texts)
+            self._signatures = list(signatures)
+            self._index_bands(signatures)
+            self._last_id = last_id
+
+    @classmethod
+    def from_texts(cls, texts: list[str], **kwargs: float) -> "NearDuplicateDetector":
+        """Create a detector containing the given texts.
+
+        Args:
+        ----
+            texts (list[str]): Texts to store.
+            **kwargs (float): Arguments passed to the constructor.
+
+        Returns:
+        -------
+            NearDuplicateDetector: Detector containing the texts.
+
+        """
+        detector = cls(**kwargs)
+        for text in texts:
+            detector.add(text)
+        return detector
+
+    @classmethod
+    def load(
+        cls, filepath: Union[str, Path], **kwargs: float
+    ) -> "NearDuplicateDetector":
+        """Load the detector from disk, or create an empty one if it does not exist.
+
+        Args:
+        ----
+            filepath (Union[str, Path]): Location of the ``.npz`` file.
+            **kwargs (float): Arguments used when a new detector is created.
+
+        Returns:
+        -------
+            NearDuplicateDetector: The loaded detector.
+
+        """
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return cls(**kwargs)
+
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(
+                num_perm=int(data["num_perm"]),
+                bands=int(data["bands"]),
+                shingle_size=int(data["shingle_size"]),
+                threshold=float(data["threshold"]),
+                seed=int(data["seed"]),
+                texts=data["texts"].tolist(),
+                signatures=data["signatures"],
+                last_id=int(data["last_id"]),
+            )
+
+    def save(self, filepath: Union[str, Path]) -> None:
+        """Save the signatures atomically, so that they are not rebuilt per process.
+
+        Args:
+        ----
+            filepath (Union[str, Path]): Location of the ``.npz`` file.
+
+        """
+        signatures = (
+            np.stack(self._signatures)
+            if self._signatures
+            else np.zeros((0, self._num_perm), dtype=np.uint32)
+        )
+        with open_atomically(Path(filepath), mode="wb") as file:
+            np.savez(
+                file,
+                texts=np.array(self._texts, dtype=str),
+                signatures=signatures,
+                last_id=self._last_id,
+                num_perm=self._num_perm,
+                bands=self._bands,
+                shingle_size=self._shingle_size,
+                threshold=self._threshold,
+                seed=self._seed,
+            )
+
+    @property
+    def texts(self) -> list[str]:
+        """Texts stored in the detector."""
+        return self._texts
+
+    def update(self, texts: pd.Series) -> bool:
+        """Add the texts that were appended to the history since the last update.
+
+        ``texts`` has to be indexed by ascending row ids, as loaded by the
+        ``HistoryDataset``. The texts up to the last seen id are located by a binary
+        search, so only the new rows are touched. If the stored texts do not match
+        these rows anymore, the detector is rebuilt.
+
+        Args:
+        ----
+            texts (pd.Series): All past texts, indexed by their row id.
+
+        Returns:
+        -------
+            bool: Whether the detector changed.
+
+        """
+        n_known = int(texts.index.searchsorted(self._last_id, side="right"))
+        if n_known != len(self._texts) or (
+            n_known and str(texts.iloc[n_known - 1]) != self._texts[-1]
+        ):
+            logger.info("Past texts changed, rebuilding the near duplicate detector.")
+            self._clear()
+            n_known = 0
+
+        new_texts = texts.iloc[n_known:]
+        if new_texts.empty:
+            return False
+
+        for text in new_texts.astype(str):
+            self.add(text)
+        self._last_id = int(new_texts.index[-1])
+        return True
+
+    def add(self, text: str) -> None:
+        """Store a text.
+
+        Args:
+        ----
+            text (str): Text to store.
+
+        """
+        signature = self._signature(text)
+        self._texts.append(text)
+        self._signatures.append(signature)
+        self._index_bands(signature[np.newaxis], start=len(self._texts) - 1)
+
+    def find_duplicate(
+        self, text: str, threshold: Optional[float] = None
+    ) -> Optional[str]:
+        """Find a stored text of which the given text is a near duplicate.
+
+        Args:
+        ----
+            text (str): Candidate text.
+            threshold (float, optional): Overrides the threshold of the detector.
+                Defaults to None.
+
+        Returns:
+        -------
+            Optional[str]: The most similar stored text, or None if there is no
+                near duplicate.
+
+        """
+        threshold = self._threshold if threshold is None else threshold
+        signature = self._signature(text)
+
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_position, best_similarity = None, threshold
+        for position in candidates:
+            similarity = float(np.mean(self._signatures[position] == signature))
+            if similarity >= best_similarity:
+                best_position, best_similarity = position, similarity
+        return None if best_position is None else self._texts[best_position]
+
+    def _clear(self) -> None:
+        """Remove all stored texts."""
+        self._texts: list[str] = []
+        self._signatures: list[np.ndarray] = []
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self._bands)]
+        self._last_id = -1
+
+    def _index_bands(self, signatures: np.ndarray, start: int = 0) -> None:
+        """Add the bands of stored signatures to the hash tables.
+
+        Args:
+        ----
+            signatures (np.ndarray): Signatures of shape ``(n_texts, num_perm)``.
+            start (int, optional): Position of the first of these texts. Defaults
+                to 0.
+
+        """
+        # Viewing every band as one opaque value turns it into its bytes key.
+        keys = np.ascontiguousarray(
+            signatures.astype(np.uint32, copy=False)
+            .reshape(len(signatures), self._bands, self._rows)
+            .transpose(1, 0, 2)
+        ).view(f"V{self._rows * 4}")
+        for buckets, band_keys in zip(self._buckets, keys.reshape(self._bands, -1)):
+            for position, key in enumerate(band_keys.tolist(), start=start):
+                buckets.setdefault(key, []).append(position)
+
+    def _signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text.
+
+        Args:
+        ----
+            text (str): Text whose signature is computed.
+
+        Returns:
+        -------
+            np.ndarray: Signature of ``num_perm`` 32 bit hashes.
+
+        """
+        words = "".join(
+            character if character.isalnum() else " " for character in text.lower()
+        ).split()
+        shingles = {
+            " ".join(words[i : i + self._shingle_size])
+            for i in range(max(len(words) - self._shingle_size + 1, 1))
+        }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        """Split a signature into the keys of its bands.
+
+        Args:
+        ----
+            signature (np.ndarray): MinHash signature.
+
+        Returns:
+        -------
+            list[bytes]: One key per band.
+
+        """
+        return [band.tobytes() for band in signature.reshape(self._bands, self._rows)]
+
+
+_DETECTOR: Optional[NearDuplicateDetector] = None
+_DETECTOR_LOCK = threading.Lock()
+
+
+def get_near_duplicate_detector(
+    texts: pd.Series, filepath: Optional[str] = None
+) -> NearDuplicateDetector:
+    """Return the process-wide detector, brought in line with the given texts.
+
+    The detector is loaded from ``filepath`` once per process and only extended by
+    the rows appended since, so checking a candidate does not depend on the size of
+    the history.
+
+    Args:
+    ----
+        texts (pd.Series): All past texts, indexed by their row id.
+        filepath (str, optional): Location in which the signatures are kept. They
+            are kept in memory only if not given. Defaults to None.
+
+    Returns:
+    -------
+        NearDuplicateDetector: Detector containing the texts.
+
+    """
+    global _DETECTOR  # noqa: PLW0603
+
+    with _DETECTOR_LOCK:
+        if _DETECTOR is None:
+            _DETECTOR = (
+                NearDuplicateDetector()
+                if filepath is None
+                else NearDuplicateDetector.load(filepath)
+            )
+        if _DETECTOR.update(texts) and filepath is not None:
+            _DETECTOR.save(filepath)
+        return _DETECTOR
@@ -0,0 +1,221 @@
+"""TF-IDF index over past texts based on hashed character n-grams."""
+
+import logging
+import zlib
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+from common.utilities.files import open_atomically
+
+logger = logging.getLogger(__name__)
+
+
+class PastTextIndex:
+    """Index of past texts which finds the texts most similar to a query.
+
+    Texts are represented by hashed character n-gram counts, so the index needs no
+    vocabulary and new texts can be appended without rebuilding it. Only the buckets
+    a text contains are stored, in the row layout of a sparse CSR matrix, which takes
+    a few hundred bytes per text instead of a dense row of all buckets. The document
+    frequencies are updated on every append and the TF-IDF weights are only computed
+    at query time.
+
+    Example:
+    -------
+    ::
+
+        >>> index = PastTextIndex.load("data/04_feature/past_text_index/quote.npz")
+        >>> index.update(texts)
+        >>> index.most_similar("love", k=10)
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        n_features: int = 2**11,
+        ngram_size: int = 4,
+        texts: Optional[list[str]] = None,
+        buckets: Optional[np.ndarray] = None,
+        counts: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+    ):
+        """Create a new index.
+
+        Args:
+        ----
+            n_features (int, optional): Number of hash buckets. Defaults to 2048.
+            ngram_size (int, optional): Length of the character n-grams. Defaults
+                to 4.
+            texts (list[str], optional): Texts already contained in the index.
+                Defaults to None.
+            buckets (np.ndarray, optional): Buckets of the n-grams of ``texts``, one
+                row after the other. Defaults to None.
+            counts (np.ndarray, optional): Number of n-grams per entry of
+                ``buckets``. Defaults to None.
+            offsets (np.ndarray, optional): Start of every row in ``buckets`` and
+                ``counts``, followed by their length. Defaults to None.
+
+        """
+        self._n_features = n_features
+        self._ngram_size = ngram_size
+        self._texts = texts or []
+        self._buckets = np.zeros(0, dtype=np.uint32) if buckets is None else buckets
+        self._counts = np.zeros(0, dtype=np.float32) if counts is None else counts
+        self._offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self._document_frequency = np.bincount(
+            self._buckets, minlength=n_features
+        ).astype(np.float32)
+
+    @property
+    def texts(self) -> list[str]:
+        """Texts contained in the index."""
+        return self._texts
+
+    @classmethod
+    def load(cls, filepath: Union[str, Path], **kwargs: int) -> "PastTextIndex":
+        """Load the index from disk, or create an empty one if it does not exist.
+
+        Args:
+        ----
+            filepath (Union[str, Path]): Location of the ``.npz`` file.
+            **kwargs (int): Arguments used when a new index is created.
+
+        Returns:
+        -------
+            PastTextIndex: The loaded index.
+
+        """
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return cls(**kwargs)
+
+        with np.load(filepath, allow_pickle=False) as data:
+            if "offsets" not in data.files:
+                logger.info("Rebuilding the index %s in the sparse format.", filepath)
+                return cls(**kwargs)
+            return cls(
+                n_features=int(data["n_features"]),
+                ngram_size=int(data["ngram_size"]),
+                texts=data["texts"].tolist(),
+                buckets=data["buckets"],
+                counts=data["counts"],
+                offsets=data["offsets"],
+            )
+
+    def save(self, filepath: Union[str, Path]) -> None:
+        """Save the index atomically, so that a crash never leaves a partial file.
+
+        Args:
+        ----
+            filepath (Union[str, Path]): Location of the ``.npz`` file.
+
+        """
+        with open_atomically(Path(filepath), mode="wb") as file:
+            np.savez(
+                file,
+                texts=np.array(self._texts, dtype=str),
+                buckets=self._buckets,
+                counts=self._counts,
+                offsets=self._offsets,
+                n_features=self._n_features,
+                ngram_size=self._ngram_size,
+            )
+
+    def update(self, texts: list[str]) -> bool:
+        """Bring the index in line with the given texts.
+
+        If the indexed texts are a prefix of ``texts`` only the new texts are added,
+        otherwise the index is rebuilt.
+
+        Args:
+        ----
+            texts (list[str]): All texts that should be contained in the index.
+
+        Returns:
+        -------
+            bool: Whether the index changed.
+
+        """
+        n_indexed = len(self._texts)
+        if texts[:n_indexed] != self._texts:
+            logger.info("Past texts changed, rebuilding the index.")
+            self._texts = []
+            self._buckets = self._buckets[:0]
+            self._counts = self._counts[:0]
+            self._offsets = self._offsets[:1]
+            self._document_frequency[:] = 0
+            n_indexed = 0
+
+        new_texts = texts[n_indexed:]
+        if not new_texts:
+            return False
+
+        rows = [self._vectorize(text) for text in new_texts]
+        new_buckets = np.concatenate([buckets for buckets, _ in rows])
+        lengths = np.array([len(buckets) for buckets, _ in rows], dtype=np.int64)
+        self._texts.extend(new_texts)
+        self._buckets = np.concatenate([self._buckets, new_buckets])
+        self._counts = np.concatenate([self._counts, *(counts for _, counts in rows)])
+        self._offsets = np.concatenate(
+            [self._offsets, self._offsets[-1] + np.cumsum(lengths)]
+        )
+        self._document_frequency += np.bincount(new_buckets, minlength=self._n_features)
+        return True
+
+    def most_similar(self, query: str, k: int) -> list[str]:
+        """Return the ``k`` texts most similar to the query.
+
+        Args:
+        ----
+            query (str): Text the past texts are compared to.
+            k (int): Number of texts to return.
+
+        Returns:
+        -------
+            list[str]: The most similar texts, most similar first.
+
+        """
+        if not self._texts or k <= 0:
+            return []
+
+        idf = np.log((1 + len(self._texts)) / (1 + self._document_frequency)) + 1
+        query_buckets, query_counts = self._vectorize(query)
+        query_weights = np.zeros(self._n_features, dtype=np.float32)
+        query_weights[query_buckets] = query_counts * idf[query_buckets]
+        query_weights /= np.linalg.norm(query_weights) + 1e-12
+
+        # Every text has at least one n-gram, so no row of the index is empty.
+        weights = self._counts * idf[self._buckets]
+        starts = self._offsets[:-1]
+        norms = np.sqrt(np.add.reduceat(weights**2, starts))
+        scores = np.add.reduceat(weights * query_weights[self._buckets], starts)
+        scores /= norms + 1e-12
+
+        k = min(k, len(scores))
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        return [self._texts[i] for i in top_k[np.argsort(-scores[top_k])]]
+
+    def _vectorize(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Count the hashed character n-grams of a text.
+
+        Args:
+        ----
+            text (str): Text to vectorize.
+
+        Returns:
+        -------
+            tuple[np.ndarray, np.ndarray]: The buckets the n-grams fall into, at
+                least one, and the number of n-grams per bucket.
+
+        """
+        normalized = f" {' '.join(text.lower().split())} "
+        ngrams = [
+            normalized[i : i + self._ngram_size]
+            for i in range(max(len(normalized) - self._ngram_size + 1, 1))
+        ]
+        buckets, counts = np.unique(
+            [zlib.crc32(ngram.encode()) % self._n_features for ngram in ngrams],
+            return_counts=True,
+        )
+        return buckets.astype(np.uint32), counts.astype(np.float32)
@@ -0,0 +1,3 @@
+"""Cached pools of hashtags per topic."""
+
+from common.hashtags.hashtag_pool import HASHTAG_POOL, HashtagPool
@@ -0,0 +1,245 @@
+"""Topic-keyed pools of scored hashtags.
+
+The hashtags of a topic change slowly, so asking the LLM for new ones on every post
+is wasted. Every topic keeps a pool of the hashtags the LLM suggested, scored by how
+often they were suggested, and posts sample from the pool. The LLM is only asked
+again once the pool is older than its refresh interval, or while it is too small
+for a limited number of times per interval.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from common.utilities.files import write_atomically
+
+logger = logging.getLogger(__name__)
+
+
+class HashtagPool:
+    """On-disk pools of scored hashtags, one file per topic.
+
+    Example:
+    -------
+    ::
+
+        >>> pool = HashtagPool(directory="data/02_intermediate/hashtag_pools")
+        >>> scores = pool.get("love", max_age_seconds=7 * 24 * 3600, min_size=20)
+        >>> if scores is None:
+        ...     scores = pool.update("love", ["#love", "#romance"], 7 * 24 * 3600)
+        >>> pool.sample(scores, k=10)
+
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/02_intermediate/hashtag_pools",
+        decay: float = 0.5,
+        min_score: float = 0.1,
+    ):
+        """Create new pools.
+
+        Args:
+        ----
+            directory (str, optional): Directory holding a file per topic. Defaults
+                to "data/02_intermediate/hashtag_pools".
+            decay (float, optional): Factor the scores are multiplied with on every
+                refresh, so that hashtags the LLM stops suggesting fade out.
+                Defaults to 0.5.
+            min_score (float, optional): Hashtags with a lower score are dropped.
+                Defaults to 0.1.
+
+        """
+        self._directory = Path(directory)
+        self._decay = decay
+        self._min_score = min_score
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        topic: str,
+        max_age_seconds: float,
+        min_size: int = 0,
+        max_refreshes: int = 3,
+    ) -> Optional[dict[str, float]]:
+        """Return the pool of a topic, unless it is due for a refresh.
+
+        A pool is due once it is stale. A pool smaller than ``min_size`` is also due,
+        but only until it was refreshed ``max_refreshes`` times in the current
+        interval. A topic for which the LLM suggests few hashtags therefore settles
+        with a small pool instead of asking the LLM on every post.
+
+        Args:
+        ----
+            topic (str): Topic of the hashtags.
+            max_age_seconds (float): Age after which the pool is stale.
+            min_size (int, optional): Size below which the pool is grown. Defaults
+                to 0.
+            max_refreshes (int, optional): Refreshes per interval after which a small
+                pool is used as is. Defaults to 3.
+
+        Returns:
+        -------
+            Optional[dict[str, float]]: Score per hashtag, None if the pool is due for
+                a refresh.
+
+        """
+        started_at, refreshes, scores = self._read(topic)
+        if _is_stale(started_at, max_age_seconds):
+            return None
+        if len(scores) < min_size and refreshes < max_refreshes:
+            return None
+        return scores
+
+    def update(
+        self, topic: str, hashtags: list[str], max_age_seconds: float
+    ) -> dict[str, float]:
+        """Add freshly generated hashtags to the pool of a topic.
+
+        The refresh of a stale pool starts a new interval, every other refresh is
+        counted towards the refreshes of the current one.
+
+        Args:
+        ----
+            topic (str): Topic of the hashtags.
+            hashtags (list[str]): Hashtags suggested by the LLM.
+            max_age_seconds (float): Age after which the pool is stale.
+
+        Returns:
+        -------
+            dict[str, float]: The refreshed pool.
+
+        """
+        with self._lock:
+            started_at, refreshes, scores = self._read(topic)
+            if _is_stale(started_at, max_age_seconds):
+                started_at, refreshes = time.time(), 0
+            scores = {hashtag: score * self._decay for hashtag, score in scores.items()}
+            for hashtag in {_normalize(hashtag) for hashtag in hashtags} - {"#"}:
+                scores[hashtag] = scores.get(hashtag, 0.0) + 1.0
+            scores = {
+                hashtag: score
+                for hashtag, score in scores.items()
+                if score >= self._min_score
+            }
+            self._write(topic, started_at, refreshes + 1, scores)
+        logger.info("Refreshed the hashtags of %s, %d in the pool.", topic, len(scores))
+        return scores
+
+    @staticmethod
+    def sample(
+        scores: dict[str, float], k: int, rng: Optional[random.Random] = None
+    ) -> list[str]:
+        """Draw hashtags from a pool without replacement, weighted by their score.
+
+        Args:
+        ----
+            scores (dict[str, float]): Score per hashtag.
+            k (int): Number of hashtags.
+            rng (random.Random, optional): Random generator. Defaults to the one of
+                the ``random`` module.
+
+        Returns:
+        -------
+            list[str]: The hashtags, at most ``k``.
+
+        """
+        rng = rng or random
+        # Weighted sampling without replacement by Efraimidis and Spirakis.
+        keys = {
+            hashtag: rng.random() ** (1 / score) for hashtag, score in scores.items()
+        }
+        return sorted(keys, key=keys.get, reverse=True)[:k]
+
+    def _read(self, topic: str) -> tuple[Optional[float], int, dict[str, float]]:
+        """Read the pool of a topic.
+
+        Args:
+        ----
+            topic (str): Topic of the hashtags.
+
+        Returns:
+        -------
+            tuple[Optional[float], int, dict[str, float]]: Start of the current
+                refresh interval, None if there is no pool, the number of refreshes
+                in it and the score per hashtag.
+
+        """
+        filepath = self._filepath(topic)
+        if not filepath.exists():
+            return None, 0, {}
+        try:
+            data = json.loads(filepath.read_text())
+        except ValueError:
+            logger.warning("Ignoring corrupt hashtag pool %s.", filepath)
+            return None, 0, {}
+        return data["refreshed_at"], data.get("refreshes", 1), data["scores"]
+
+    def _write(
+        self, topic: str, started_at: float, refreshes: int, scores: dict[str, float]
+    ) -> None:
+        """Write the pool of a topic atomically.
+
+        Args:
+        ----
+            topic (str): Topic of the hashtags.
+            started_at (float): Start of the current refresh interval.
+            refreshes (int): Number of refreshes in the current interval.
+            scores (dict[str, float]): Score per hashtag.
+
+        """
+        data = {"refreshed_at": started_at, "refreshes": refreshes, "scores": scores}
+        write_atomically(self._filepath(topic), json.dumps(data, indent=2))
+
+    def _filepath(self, topic: str) -> Path:
+        """Return the file of the pool of a topic.
+
+        Args:
+        ----
+            topic (str): Topic of the hashtags.
+
+        Returns:
+        -------
+            Path: Path of the pool.
+
+        """
+        return self._directory / f"{topic}.json"
+
+
+def _is_stale(started_at: Optional[float], max_age_seconds: float) -> bool:
+    """Return whether the refresh interval of a pool is over.
+
+    Args:
+    ----
+        started_at (Optional[float]): Start of the refresh interval, None if there is
+            no pool.
+        max_age_seconds (float): Length of the refresh interval.
+
+    Returns:
+    -------
+        bool: Whether the pool is stale.
+
+    """
+    return started_at is None or time.time() - started_at > max_age_seconds
+
+
+def _normalize(hashtag: str) -> str:
+    """Write a hashtag as a lower case word with a leading "#".
+
+    Args:
+    ----
+        hashtag (str): The hashtag as suggested by the LLM.
+
+    Returns:
+    -------
+        str: The normalised hashtag.
+
+    """
+    return "#" + "".join(hashtag.lower().lstrip("#").split())
+
+
+HASHTAG_POOL = HashtagPool()
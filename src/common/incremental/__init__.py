@@ -0,0 +1,3 @@
+"""Reuse of node outputs whose inputs and code did not change."""
+
+from common.incremental.incremental import IncrementalFunction, NodeOutputStore
@@ -0,0 +1,251 @@
+"""Fingerprint-based reuse of node outputs.
+
+A node wrapped in ``IncrementalFunction`` fingerprints its code and inputs on every
+call. If the fingerprint equals the one of the previous call, the persisted outputs
+are returned instead of running the node. Only the wrapped nodes are skipped, so that
+restyling the posts re-renders them with the texts that were already generated.
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import pickle
+from functools import partial, update_wrapper
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import pandas as pd
+from common.utilities.files import open_atomically
+from kedro.pipeline.node import Node
+
+logger = logging.getLogger(__name__)
+
+OUTPUTS_DIRECTORY = "data/02_intermediate/node_outputs"
+
+
+class NodeOutputStore:
+    """Outputs of the last run of every node together with their fingerprint.
+
+    Example:
+    -------
+    ::
+
+        >>> store = NodeOutputStore()
+        >>> store.save("quote.love.create_text_for_image", "ab12", text)
+        >>> store.load("quote.love.create_text_for_image", "ab12")
+        (True, text)
+
+    """
+
+    def __init__(self, directory: str = OUTPUTS_DIRECTORY):
+        """Create a store.
+
+        Args:
+        ----
+            directory (str, optional): Directory holding a file per node. Defaults
+                to OUTPUTS_DIRECTORY.
+
+        """
+        self._directory = Path(directory)
+
+    def load(self, name: str, fingerprint: str) -> tuple[bool, Any]:
+        """Load the outputs of a node if they were created with the fingerprint.
+
+        Args:
+        ----
+            name (str): Name of the node.
+            fingerprint (str): Fingerprint of the code and inputs of the node.
+
+        Returns:
+        -------
+            tuple[bool, Any]: Whether the outputs were found and the outputs.
+
+        """
+        filepath = self._filepath(name)
+        if not filepath.exists():
+            return False, None
+        try:
+            with filepath.open("rb") as file:
+                stored = pickle.load(file)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            logger.warning("Ignoring corrupt node outputs %s.", filepath)
+            return False, None
+        if stored["fingerprint"] != fingerprint:
+            return False, None
+        return True, stored["outputs"]
+
+    def save(self, name: str, fingerprint: str, outputs: Any) -> None:
+        """Persist the outputs of a node atomically.
+
+        Args:
+        ----
+            name (str): Name of the node.
+            fingerprint (str): Fingerprint of the code and inputs of the node.
+            outputs (Any): Return value of the node.
+
+        """
+        with open_atomically(self._filepath(name), mode="wb") as file:
+            pickle.dump({"fingerprint": fingerprint, "outputs": outputs}, file)
+
+    def _filepath(self, name: str) -> Path:
+        """Return the file of the outputs of a node.
+
+        Args:
+        ----
+            name (str): Name of the node.
+
+        Returns:
+        -------
+            Path: Path of the outputs.
+
+        """
+        return self._directory / f"{name}.pkl"
+
+
+class IncrementalFunction:
+    """Node function which reuses its outputs while its code and inputs are unchanged.
+
+    Example:
+    -------
+    ::
+
+        >>> node.func = IncrementalFunction(node, store=NodeOutputStore())
+
+    """
+
+    def __init__(
+        self,
+        node: Node,
+        store: NodeOutputStore,
+        excluded_inputs: tuple[str, ...] = (),
+    ):
+        """Wrap the function of a node.
+
+        Args:
+        ----
+            node (Node): The node.
+            store (NodeOutputStore): Store of the outputs.
+            excluded_inputs (tuple[str, ...], optional): Inputs which are not part of
+                the fingerprint, for example the history of texts, which changes with
+                every run. Defaults to ().
+
+        """
+        update_wrapper(self, node.func)
+        self.func = node.func
+        self._name = node.name
+        self._inputs = node.inputs
+        self._store = store
+        self._excluded_inputs = excluded_inputs
+        self._code_version = _code_version(node.func)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        """Return the persisted outputs or run the node.
+
+        Kedro passes the inputs positionally or as keywords in the order of
+        ``node.inputs``, which maps them back to the names of their datasets.
+
+        Args:
+        ----
+            args (Any): Positional inputs of the node.
+            kwargs (Any): Keyword inputs of the node.
+
+        Returns:
+        -------
+            Any: The outputs of the node.
+
+        """
+        inputs = dict(zip(self._inputs, [*args, *kwargs.values()]))
+        fingerprint = self._fingerprint(inputs)
+        if fingerprint is not None:
+            found, outputs = self._store.load(self._name, fingerprint)
+            if found:
+                logger.info("Reusing the outputs of %s, nothing changed.", self._name)
+                return outputs
+
+        outputs = self.func(*args, **kwargs)
+        if fingerprint is not None:
+            self._store.save(self._name, fingerprint, outputs)
+        return outputs
+
+    def __repr__(self) -> str:
+        """Describe the node function like the wrapped function."""
+        return repr(self.func)
+
+    def _fingerprint(self, inputs: dict[str, Any]) -> Optional[str]:
+        """Fingerprint the code and inputs of the node.
+
+        Args:
+        ----
+            inputs (dict[str, Any]): Inputs keyed by the names of their datasets.
+
+        Returns:
+        -------
+            Optional[str]: The fingerprint, None if an input cannot be hashed.
+
+        """
+        digest = hashlib.sha256(self._code_version.encode())
+        for name in sorted(inputs):
+            if name in self._excluded_inputs:
+                continue
+            try:
+                value_digest = _digest(inputs[name])
+            except (TypeError, pickle.PicklingError, AttributeError):
+                logger.warning("Cannot fingerprint %s, running %s.", name, self._name)
+                return None
+            digest.update(f"{name}={value_digest};".encode())
+        return digest.hexdigest()
+
+
+def _code_version(func: Callable) -> str:
+    """Describe the code of a node function, including its bound arguments.
+
+    Only the source of the node function itself is part of the version, so that
+    changing other functions of its module does not invalidate its outputs.
+
+    Args:
+    ----
+        func (Callable): The node function.
+
+    Returns:
+    -------
+        str: Description of the code.
+
+    """
+    parts = []
+    while True:
+        if isinstance(func, partial):
+            parts.append(repr((func.args, sorted(func.keywords.items()))))
+            func = func.func
+        elif hasattr(func, "__wrapped__"):
+            func = func.__wrapped__
+        else:
+            break
+    try:
+        parts.append(inspect.getsource(func))
+    except (OSError, TypeError):
+        parts.append(getattr(func, "__qualname__", repr(func)))
+    return "\n".join(parts)
+
+
+def _digest(value: Any) -> str:
+    """Hash the content of a node input.
+
+    Args:
+    ----
+        value (Any): The input.
+
+    Returns:
+    -------
+        str: Hash of the input.
+
+    """
+    if isinstance(value, pd.DataFrame):
+        data = pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes()
+        data += repr(list(value.columns)).encode()
+    else:
+        try:
+            data = json.dumps(value, sort_keys=True).encode()
+        except TypeError:
+            data = pickle.dumps(value)
+    return hashlib.sha256(data).hexdigest()
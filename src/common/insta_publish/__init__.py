@@ -1,3 +1,5 @@
 """Init for insta_publish module."""
 
 from common.insta_publish.pipeline import create_insta_publish_pipeline
+from common.insta_publish.publish_queue import PublishQueue, QueuedPost
+from common.insta_publish.publisher import InstagramPublisher, get_publisher
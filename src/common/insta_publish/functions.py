@@ -1,23 +1,28 @@
 """Functions for the insta_publish pipeline."""
 
-import os
+import logging
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator
 
-from instagrapi import Client
-from kedro.config import OmegaConfigLoader
+from common.insta_publish.publish_queue import PublishQueue
+from common.insta_publish.publisher import get_publisher
+from common.utilities.files import temporary_file
 from PIL import Image
-from instagrapi import Client
-from instagrapi.exceptions import LoginRequired
-import logging
 
-logger = logging.getLogger()
+logger = logging.getLogger(__name__)
+
+# File extensions instagrapi accepts for photo uploads.
+_UPLOAD_FORMATS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
 
 
 def post_image(namespace: str, image: Image, hashtags: list[str]) -> None:
     """Post an image to Instagram.
 
-    This function posts an image to instagram using the instagrapi library. Before
-    posting the image, the function logs into the Instagram account using the
-    provided username and password. The image is then uploaded to the account.
+    This function posts an image to instagram using the instagrapi library. The
+    account of the namespace is logged in once per run through the shared
+    ``InstagramPublisher``, which also resumes persisted sessions.
 
     Args:
     ----
@@ -26,27 +31,79 @@ def post_image(namespace: str, image: Image, hashtags: list[str]) -> None:
         hashtags (list[str]): The hashtags to be included in the Instagram post.
 
     """
-    top_level_namespace, variant = namespace.split(".")
-    conf_loader = OmegaConfigLoader(conf_source="./conf")
-    insta_params = conf_loader["credentials"][top_level_namespace][variant]
-
-    # Extract the Instagram credentials.
-    username = insta_params["username"]
-    password = insta_params["password"]
-
-    # Login to the Instagram account.
-    cl = Client()
-    cl.login(username, password)
-
-    # Delete the temporary image file if it exists.
-    temp_image_path = "temp_image.png"
-    if os.path.exists(temp_image_path):
-        try:
-            os.remove(temp_image_path)
-        except Exception as e:
-            raise NewException("An error occurred") from err
-
-    # Save the image to a temporary file and upload it to Instagram.
-    image.save(temp_image_path)
-    cl.photo_upload(path=temp_image_path, caption=" ".join(hashtags))
-    os.remove(temp_image_path)
+    with _upload_path(image) as path:
+        get_publisher().upload_photo(
+            account=namespace, path=path, caption=" ".join(hashtags)
+        )
+
+
+def enqueue_post(namespace: str, image: Image, hashtags: list[str]) -> None:
+    """Append the post to the publish queue instead of uploading it right away.
+
+    The queue is drained by ``PublishWorker``, so that uploads neither slow down nor
+    fail the generation run.
+
+    Args:
+    ----
+        namespace (str): The namespace for the pipeline, used as the account.
+        image (Image): The image to be posted.
+        hashtags (list[str]): The hashtags to be included in the Instagram post.
+
+    """
+    encoded_bytes, suffix = _encode_image(image)
+    idempotency_key = PublishQueue().enqueue(
+        account=namespace,
+        image=encoded_bytes,
+        suffix=suffix,
+        caption=" ".join(hashtags),
+    )
+    logger.info("Queued post %s for %s.", idempotency_key[:12], namespace)
+
+
+@contextmanager
+def _upload_path(image: Image) -> Iterator[Path]:
+    """Provide a file of the image for the upload, encoding it at most once.
+
+    instagrapi only uploads from a path. An image loaded by ``ImageDataset`` from a
+    local file is uploaded from that file. Otherwise the image is written to a
+    unique temporary file, so that variants published in parallel never share a
+    file.
+
+    Args:
+    ----
+        image (Image): The image to be posted.
+
+    Yields:
+    ------
+        Path: Path of a file holding the encoded image.
+
+    """
+    filepath = image.info.get("filepath")
+    if filepath and Path(filepath).suffix.lower() in _UPLOAD_FORMATS.values():
+        yield Path(filepath)
+        return
+
+    encoded_bytes, suffix = _encode_image(image)
+    with temporary_file(encoded_bytes, suffix=suffix) as path:
+        yield path
+
+
+def _encode_image(image: Image) -> tuple[bytes, str]:
+    """Return the encoded image, reusing the bytes it was loaded from.
+
+    Args:
+    ----
+        image (Image): The image.
+
+    Returns:
+    -------
+        tuple[bytes, str]: The encoded image and the file extension of its format.
+
+    """
+    encoded_bytes = image.info.get("encoded_bytes")
+    suffix = _UPLOAD_FORMATS.get(image.format)
+    if encoded_bytes is None or suffix is None:
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        encoded_bytes, suffix = buffer.getvalue(), ".png"
+    return encoded_bytes, suffix
@@ -2,21 +2,38 @@
 
 from functools import partial
 
-from common.insta_publish.functions import post_image
+from common.insta_publish.functions import enqueue_post, post_image
 from kedro.pipeline import Pipeline, node, pipeline
 
 
 def create_insta_publish_pipeline(
-    namespace: str = None, publish: bool = True
+    namespace: str = None, publish: bool = True, queued: bool = True
 ) -> Pipeline:
-    """Create a pipeline for publishing images to Instagram."""
+    """Create a pipeline for publishing images to Instagram.
+
+    Args:
+    ----
+        namespace (str, optional): Namespace for input/ output. Defaults to None.
+        publish (bool, optional): Whether the images are published at all. Defaults
+            to True.
+        queued (bool, optional): Whether the images are appended to the publish
+            queue, which ``PublishWorker`` drains, instead of being uploaded within
+            the run. Defaults to True.
+
+    Returns:
+    -------
+        Pipeline: Pipeline for publishing images.
+
+    """
     nodes = (
         [
             node(
-                func=partial(post_image, namespace=namespace),
+                func=partial(
+                    enqueue_post if queued else post_image, namespace=namespace
+                ),
                 inputs={"image": "final_image", "hashtags": "hashtags"},
                 outputs=None,
-                name="post_image",
+                name="enqueue_post" if queued else "post_image",
             ),
         ]
         if publish
@@ -0,0 +1,315 @@
+"""Durable queue of the posts waiting to be published.
+
+Generation only appends the rendered image and its caption to a SQLite queue, and
+``PublishWorker`` uploads them later. Every post is identified by an idempotency key
+derived from its account, image and caption, so that enqueueing the same post twice
+stores it once, and its state is kept in the database, so that a worker which
+crashed resumes where it stopped. A claimed post is leased to its worker, so that
+recovering the posts of a crashed worker never takes over the posts of a worker that
+is still uploading.
+"""
+
+import hashlib
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ContextManager, Optional
+
+from common.utilities.sqlite import sqlite_transaction
+
+QUEUE_FILEPATH = "data/07_model_output/publish_queue.db"
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+PUBLISHED = "published"
+FAILED = "failed"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS posts ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "idempotency_key TEXT NOT NULL UNIQUE, "
+    "account TEXT NOT NULL, "
+    "image BLOB NOT NULL, "
+    "suffix TEXT NOT NULL, "
+    "caption TEXT NOT NULL, "
+    "status TEXT NOT NULL, "
+    "attempts INTEGER NOT NULL, "
+    "media_id TEXT, "
+    "error TEXT, "
+    "claimed_by TEXT, "
+    "claimed_at REAL, "
+    "available_at REAL NOT NULL, "
+    "created_at REAL NOT NULL, "
+    "updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS posts_due ON posts (account, status, available_at)",
+)
+
+
+@dataclass(frozen=True)
+class QueuedPost:
+    """A post claimed from the queue."""
+
+    id: int
+    idempotency_key: str
+    account: str
+    image: bytes
+    suffix: str
+    caption: str
+    attempts: int
+
+
+class PublishQueue:
+    """Queue of posts backed by a SQLite database in WAL mode.
+
+    Example:
+    -------
+    ::
+
+        >>> queue = PublishQueue()
+        >>> queue.enqueue("quote.love", image_bytes, ".png", caption="#love")
+        >>> post = queue.claim("quote.love", worker_id="worker-1")
+        >>> queue.mark_published(post, worker_id="worker-1", media_id="123")
+
+    """
+
+    def __init__(
+        self,
+        filepath: str = QUEUE_FILEPATH,
+        timeout: float = 30.0,
+        lease: float = 900.0,
+    ):
+        """Create a queue stored at the given path.
+
+        Args:
+        ----
+            filepath (str, optional): The location of the SQLite database. Defaults
+                to QUEUE_FILEPATH.
+            timeout (float, optional): Seconds to wait for the lock of a concurrent
+                writer. Defaults to 30.
+            lease (float, optional): Seconds a claimed post belongs to its worker,
+                has to exceed the longest upload. Defaults to 15 minutes.
+
+        """
+        self._filepath = Path(filepath)
+        self._timeout = timeout
+        self._lease = lease
+
+    def enqueue(self, account: str, image: bytes, suffix: str, caption: str) -> str:
+        """Append a post unless the same post is queued already.
+
+        Args:
+        ----
+            account (str): Account to post with, for example "quote.love".
+            image (bytes): The encoded image.
+            suffix (str): File extension of the encoding, for example ".png".
+            caption (str): Caption of the post.
+
+        Returns:
+        -------
+            str: Idempotency key of the post.
+
+        """
+        digest = hashlib.sha256()
+        for part in (account.encode(), image, caption.encode()):
+            digest.update(hashlib.sha256(part).digest())
+        idempotency_key = digest.hexdigest()
+
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO posts (idempotency_key, account, image, suffix, "
+                "caption, status, attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (
+                    idempotency_key,
+                    account,
+                    image,
+                    suffix,
+                    caption,
+                    PENDING,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+        return idempotency_key
+
+    def claim(self, account: str, worker_id: str) -> Optional[QueuedPost]:
+        """Take the oldest due post of an account and lease it to a worker.
+
+        Args:
+        ----
+            account (str): Name of the account.
+            worker_id (str): Identifier of the claiming worker.
+
+        Returns:
+        -------
+            Optional[QueuedPost]: The post, None if no post of the account is due.
+
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, idempotency_key, account, image, suffix, caption, attempts "
+                "FROM posts WHERE account = ? AND status = ? AND available_at <= ? "
+                "ORDER BY id LIMIT 1",
+                (account, PENDING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE posts SET status = ?, attempts = attempts + 1, claimed_by = ?, "
+                "claimed_at = ?, updated_at = ? WHERE id = ?",
+                (IN_PROGRESS, worker_id, now, now, row[0]),
+            )
+        return QueuedPost(*row[:-1], attempts=row[-1] + 1)
+
+    def mark_published(self, post: QueuedPost, worker_id: str, media_id: str) -> bool:
+        """Record that the post was published.
+
+        Args:
+        ----
+            post (QueuedPost): The claimed post.
+            worker_id (str): Identifier of the worker that claimed the post.
+            media_id (str): Identifier of the published media.
+
+        Returns:
+        -------
+            bool: Whether the post was still leased to the worker. A post whose lease
+                expired may have been recovered and claimed by another worker, and is
+                left to that worker.
+
+        """
+        with self._transaction() as connection:
+            return (
+                connection.execute(
+                    "UPDATE posts SET status = ?, media_id = ?, error = NULL, "
+                    "updated_at = ? WHERE id = ? AND claimed_by = ?",
+                    (PUBLISHED, media_id, time.time(), post.id, worker_id),
+                ).rowcount
+                == 1
+            )
+
+    def mark_failed(
+        self,
+        post: QueuedPost,
+        worker_id: str,
+        error: str,
+        retry_in: Optional[float],
+    ) -> bool:
+        """Record a failed upload and schedule the next attempt.
+
+        Args:
+        ----
+            post (QueuedPost): The claimed post.
+            worker_id (str): Identifier of the worker that claimed the post.
+            error (str): Description of the error.
+            retry_in (float, optional): Seconds until the post is due again. None
+                gives up on the post.
+
+        Returns:
+        -------
+            bool: Whether the post was still leased to the worker.
+
+        """
+        now = time.time()
+        status = FAILED if retry_in is None else PENDING
+        with self._transaction() as connection:
+            return (
+                connection.execute(
+                    "UPDATE posts SET status = ?, error = ?, available_at = ?, "
+                    "updated_at = ? WHERE id = ? AND claimed_by = ?",
+                    (status, error, now + (retry_in or 0.0), now, post.id, worker_id),
+                ).rowcount
+                == 1
+            )
+
+    def recover(self, accounts: Optional[list[str]] = None) -> int:
+        """Make the posts of crashed workers due again.
+
+        Only posts whose lease expired are recovered. Such a post may or may not
+        have been uploaded, it is retried, so publishing is at least once.
+
+        Args:
+        ----
+            accounts (list[str], optional): Accounts whose posts are recovered.
+                Defaults to all accounts.
+
+        Returns:
+        -------
+            int: Number of recovered posts.
+
+        """
+        now = time.time()
+        query = (
+            "UPDATE posts SET status = ?, claimed_by = NULL, claimed_at = NULL, "
+            "updated_at = ? WHERE status = ? AND claimed_at <= ?"
+        )
+        params = [PENDING, now, IN_PROGRESS, now - self._lease]
+        if accounts is not None:
+            query += f" AND account IN ({', '.join('?' * len(accounts))})"
+            params += accounts
+        with self._transaction() as connection:
+            return connection.execute(query, params).rowcount
+
+    def pending_accounts(self) -> list[str]:
+        """Return the accounts with posts that are not published yet.
+
+        Returns
+        -------
+            list[str]: Names of the accounts.
+
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT account FROM posts WHERE status IN (?, ?) "
+                "ORDER BY account",
+                (PENDING, IN_PROGRESS),
+            ).fetchall()
+        return [account for (account,) in rows]
+
+    def next_due(self, account: str) -> Optional[float]:
+        """Return when the next post of an account is due.
+
+        Args:
+        ----
+            account (str): Name of the account.
+
+        Returns:
+        -------
+            Optional[float]: Unix time of the next due post, None if there is none.
+
+        """
+        with self._transaction() as connection:
+            (available_at,) = connection.execute(
+                "SELECT MIN(available_at) FROM posts WHERE account = ? AND status = ?",
+                (account, PENDING),
+            ).fetchone()
+        return available_at
+
+    def counts(self) -> dict[str, int]:
+        """Count the posts per status.
+
+        Returns
+        -------
+            dict[str, int]: Number of posts per status.
+
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM posts GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def _transaction(self) -> ContextManager[sqlite3.Connection]:
+        """Run statements in a transaction holding the write lock from its start.
+
+        Returns
+        -------
+            ContextManager[sqlite3.Connection]: Transaction on the database.
+
+        """
+        return sqlite_transaction(
+            filepath=self._filepath, schema=_SCHEMA, timeout=self._timeout
+        )
@@ -0,0 +1,195 @@
+"""Instagram publisher reusing logged-in sessions.
+
+A full login costs several requests and repeated logins invite challenges and rate
+limits. The publisher logs every account in once per run and persists the session
+settings of instagrapi, so that later runs resume the session instead of logging in
+again.
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from instagrapi import Client
+from instagrapi.exceptions import LoginRequired
+from kedro.config import OmegaConfigLoader
+
+logger = logging.getLogger(__name__)
+
+SESSION_DIR = "data/02_intermediate/instagram_sessions"
+
+
+class InstagramPublisher:
+    """Upload photos with one cached, logged-in client per account.
+
+    Accounts are named like the namespaces of the pipelines, for example
+    "quote.love", and their credentials are looked up as
+    ``credentials[topic][variant]``.
+
+    Example:
+    -------
+    ::
+
+        >>> publisher = InstagramPublisher(credentials=credentials)
+        >>> publisher.upload_photo("quote.love", path, caption="#love")
+
+    """
+
+    def __init__(
+        self,
+        credentials: dict[str, dict[str, dict[str, str]]],
+        session_dir: Optional[str] = SESSION_DIR,
+        client_factory: Callable[[], Any] = Client,
+    ):
+        """Create a publisher.
+
+        Args:
+        ----
+            credentials (dict[str, dict[str, dict[str, str]]]): Username and password
+                per topic and variant.
+            session_dir (str, optional): Directory the session settings are persisted
+                in. None keeps sessions in memory only. Defaults to SESSION_DIR.
+            client_factory (Callable[[], Any], optional): Creates the clients,
+                replaceable by a local stand-in for the Instagram client. Defaults
+                to ``instagrapi.Client``.
+
+        """
+        self._credentials = credentials
+        self._session_dir = Path(session_dir) if session_dir else None
+        self._client_factory = client_factory
+        self._clients: dict[str, Any] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def upload_photo(self, account: str, path: Path, caption: str) -> Any:
+        """Upload a photo, logging in again once if the session has expired.
+
+        Args:
+        ----
+            account (str): Account to post with, for example "quote.love".
+            path (Path): Path of the photo.
+            caption (str): Caption of the post.
+
+        Returns:
+        -------
+            Any: The media returned by the client.
+
+        """
+        with self._lock(account):
+            client = self._get_client(account)
+            try:
+                return client.photo_upload(path=path, caption=caption)
+            except LoginRequired:
+                logger.info("Session of %s expired, logging in again.", account)
+                client = self._login(account, resume=False)
+                return client.photo_upload(path=path, caption=caption)
+
+    def _get_client(self, account: str) -> Any:
+        """Return the logged-in client of the account, logging in on first use.
+
+        Args:
+        ----
+            account (str): Name of the account.
+
+        Returns:
+        -------
+            Any: Logged-in client.
+
+        """
+        client = self._clients.get(account)
+        if client is None:
+            client = self._login(account, resume=True)
+        return client
+
+    def _login(self, account: str, resume: bool) -> Any:
+        """Log the account in and persist its session settings.
+
+        With ``resume`` the persisted settings are loaded first, so that instagrapi
+        reuses the stored session and device instead of starting a new one.
+
+        Args:
+        ----
+            account (str): Name of the account.
+            resume (bool): Whether to resume the persisted session.
+
+        Returns:
+        -------
+            Any: Logged-in client.
+
+        """
+        topic, variant = account.split(".")
+        account_credentials = self._credentials[topic][variant]
+        settings_path = self._settings_path(account)
+
+        client = self._client_factory()
+        if resume and settings_path is not None and settings_path.exists():
+            client.load_settings(settings_path)
+        elif account in self._clients:
+            # Keep the device of the expired session, only the login is renewed.
+            client.set_uuids(self._clients[account].get_settings()["uuids"])
+
+        client.login(account_credentials["username"], account_credentials["password"])
+        if settings_path is not None:
+            settings_path.parent.mkdir(parents=True, exist_ok=True)
+            client.dump_settings(settings_path)
+
+        self._clients[account] = client
+        return client
+
+    def _settings_path(self, account: str) -> Optional[Path]:
+        """Return the path of the persisted session settings of the account.
+
+        Args:
+        ----
+            account (str): Name of the account.
+
+        Returns:
+        -------
+            Optional[Path]: Path of the settings, None if they are not persisted.
+
+        """
+        if self._session_dir is None:
+            return None
+        return self._session_dir / f"{account}.json"
+
+    def _lock(self, account: str) -> threading.Lock:
+        """Return the lock serialising the requests of an account.
+
+        Args:
+        ----
+            account (str): Name of the account.
+
+        Returns:
+        -------
+            threading.Lock: Lock of the account.
+
+        """
+        with self._locks_lock:
+            return self._locks.setdefault(account, threading.Lock())
+
+
+_PUBLISHER: Optional[InstagramPublisher] = None
+_PUBLISHER_LOCK = threading.Lock()
+
+
+def get_publisher(conf_source: str = "./conf") -> InstagramPublisher:
+    """Return the publisher of the process, loading the credentials on first use.
+
+    Args:
+    ----
+        conf_source (str, optional): Directory of the configuration. Defaults to
+            "./conf".
+
+    Returns:
+    -------
+        InstagramPublisher: Shared publisher.
+
+    """
+    global _PUBLISHER  # noqa: PLW0603
+
+    with _PUBLISHER_LOCK:
+        if _PUBLISHER is None:
+            conf_loader = OmegaConfigLoader(conf_source=conf_source)
+            _PUBLISHER = InstagramPublisher(credentials=conf_loader["credentials"])
+        return _PUBLISHER
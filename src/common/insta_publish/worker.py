@@ -0,0 +1,231 @@
+"""Worker draining the publish queue.
+
+Every account is drained by its own thread, so that uploads to different accounts
+run concurrently while the posts of one account are paced. Run it next to or after
+the generation runs with:
+
+    PYTHONPATH=src python -m common.insta_publish.worker
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from common.insta_publish.publish_queue import (
+    QUEUE_FILEPATH,
+    PublishQueue,
+    QueuedPost,
+)
+from common.insta_publish.publisher import InstagramPublisher, get_publisher
+from common.utilities.files import temporary_file
+
+logger = logging.getLogger(__name__)
+
+
+class PublishWorker:
+    """Upload the queued posts with pacing per account.
+
+    Example:
+    -------
+    ::
+
+        >>> PublishWorker(PublishQueue(), get_publisher()).run()
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        queue: PublishQueue,
+        publisher: InstagramPublisher,
+        min_interval_seconds: float = 600.0,
+        jitter_seconds: float = 120.0,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 60.0,
+        poll_seconds: float = 30.0,
+    ):
+        """Create a worker.
+
+        Args:
+        ----
+            queue (PublishQueue): Queue of the posts.
+            publisher (InstagramPublisher): Publisher uploading the posts.
+            min_interval_seconds (float, optional): Minimum time between two posts
+                of an account. Defaults to 600.
+            jitter_seconds (float, optional): Random time added to the interval.
+                Defaults to 120.
+            max_attempts (int, optional): Uploads of a post before it is marked as
+                failed. Defaults to 5.
+            retry_base_seconds (float, optional): Delay after the first failed
+                upload, doubled for every further one. Defaults to 60.
+            poll_seconds (float, optional): Longest wait for new posts when the
+                worker keeps running. Defaults to 30.
+
+        """
+        self._queue = queue
+        self._publisher = publisher
+        self._min_interval_seconds = min_interval_seconds
+        self._jitter_seconds = jitter_seconds
+        self._max_attempts = max_attempts
+        self._retry_base_seconds = retry_base_seconds
+        self._poll_seconds = poll_seconds
+        self._worker_id = uuid.uuid4().hex
+        self._stop = threading.Event()
+
+    def run(self, accounts: Optional[list[str]] = None, keep_running: bool = False):
+        """Drain the queue, resuming the posts of crashed workers.
+
+        Args:
+        ----
+            accounts (list[str], optional): Accounts to drain. Defaults to all
+                accounts with posts that are not published yet.
+            keep_running (bool, optional): Whether to wait for new posts instead of
+                returning once the queue of every account is empty. Defaults to
+                False.
+
+        """
+        accounts = accounts or self._queue.pending_accounts()
+        if not accounts:
+            logger.info("No posts to publish.")
+            return
+
+        recovered = self._queue.recover(accounts)
+        if recovered:
+            logger.info("Resuming %d posts of a crashed worker.", recovered)
+
+        with ThreadPoolExecutor(
+            max_workers=len(accounts), thread_name_prefix="publish"
+        ) as executor:
+            futures = [
+                executor.submit(self._drain, account, keep_running)
+                for account in accounts
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Let the other accounts finish their upload in progress and stop.
+                self.stop()
+                raise
+        logger.info("Publish queue: %s.", self._queue.counts())
+
+    def stop(self) -> None:
+        """Stop the worker after the uploads in progress."""
+        self._stop.set()
+
+    def _drain(self, account: str, keep_running: bool) -> None:
+        """Upload the posts of an account until its queue is empty.
+
+        Args:
+        ----
+            account (str): Name of the account.
+            keep_running (bool): Whether to wait for new posts.
+
+        """
+        while not self._stop.is_set():
+            post = self._queue.claim(account, worker_id=self._worker_id)
+            if post is None and keep_running and self._queue.recover([account]):
+                logger.info("Resuming the posts of a crashed worker for %s.", account)
+                continue
+            if post is None:
+                next_due = self._queue.next_due(account)
+                if next_due is None and not keep_running:
+                    return
+                wait = self._poll_seconds
+                if next_due is not None:
+                    wait = min(max(next_due - time.time(), 0.0), self._poll_seconds)
+                self._stop.wait(wait)
+                continue
+
+            if self._publish(post):
+                self._stop.wait(
+                    self._min_interval_seconds + random.uniform(0, self._jitter_seconds)
+                )
+
+    def _publish(self, post: QueuedPost) -> bool:
+        """Upload a claimed post and record the outcome in the queue.
+
+        Args:
+        ----
+            post (QueuedPost): The claimed post.
+
+        Returns:
+        -------
+            bool: Whether the post was published.
+
+        """
+        try:
+            with temporary_file(post.image, suffix=post.suffix) as path:
+                media = self._publisher.upload_photo(
+                    account=post.account, path=path, caption=post.caption
+                )
+        except Exception as error:
+            retry_in = (
+                None
+                if post.attempts >= self._max_attempts
+                else self._retry_base_seconds * 2 ** (post.attempts - 1)
+            )
+            logger.warning(
+                "Upload %d of post %s for %s failed: %r.",
+                post.attempts,
+                post.idempotency_key[:12],
+                post.account,
+                error,
+            )
+            if not self._queue.mark_failed(
+                post, worker_id=self._worker_id, error=repr(error), retry_in=retry_in
+            ):
+                logger.warning(
+                    "The lease of post %s for %s expired during the upload.",
+                    post.idempotency_key[:12],
+                    post.account,
+                )
+            return False
+
+        if not self._queue.mark_published(
+            post, worker_id=self._worker_id, media_id=str(getattr(media, "pk", media))
+        ):
+            logger.warning(
+                "The lease of post %s for %s expired during the upload, it may be "
+                "published twice.",
+                post.idempotency_key[:12],
+                post.account,
+            )
+            return True
+        logger.info(
+            "Published post %s for %s.", post.idempotency_key[:12], post.account
+        )
+        return True
+
+
+def main() -> None:
+    """Run the worker from the command line."""
+    parser = argparse.ArgumentParser(description="Publish the queued posts.")
+    parser.add_argument("--queue", default=QUEUE_FILEPATH)
+    parser.add_argument("--accounts", nargs="*", default=None)
+    parser.add_argument("--min-interval-seconds", type=float, default=600.0)
+    parser.add_argument("--jitter-seconds", type=float, default=120.0)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--keep-running", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    worker = PublishWorker(
+        queue=PublishQueue(filepath=args.queue),
+        publisher=get_publisher(),
+        min_interval_seconds=args.min_interval_seconds,
+        jitter_seconds=args.jitter_seconds,
+        max_attempts=args.max_attempts,
+    )
+    try:
+        worker.run(accounts=args.accounts, keep_running=args.keep_running)
+    except KeyboardInterrupt:
+        logger.info("Stopped, the queue resumes with the next run.")
+
+
+if __name__ == "__main__":
+    main()
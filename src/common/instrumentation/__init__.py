@@ -0,0 +1,7 @@
+"""Timings and resource usage of pipeline runs."""
+
+from common.instrumentation.run_metrics import (
+    RunMetrics,
+    format_summary,
+    peak_rss_bytes,
+)
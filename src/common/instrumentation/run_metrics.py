@@ -0,0 +1,419 @@
+"""Collection and export of the performance metrics of a run.
+
+The metrics of every run are written to ``data/08_reporting/metrics``:
+
+- ``run_metrics.json`` holds all metrics of the last run.
+- ``node_metrics.csv`` holds the timings of the nodes of all runs.
+- ``auto_insta.prom`` is a Prometheus textfile of the last run, which a local
+  node exporter can scrape with its textfile collector.
+"""
+
+import csv
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from common.utilities.files import write_atomically
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIRECTORY = "data/08_reporting/metrics"
+
+
+@dataclass(frozen=True)
+class NodeTiming:
+    """Timing of a single node."""
+
+    run_id: str
+    node: str
+    namespace: str
+    wall_seconds: float
+    cpu_seconds: float
+    failed: bool
+
+
+@dataclass(frozen=True)
+class DatasetTiming:
+    """Timing of a single load or save of a dataset."""
+
+    dataset: str
+    operation: str
+    seconds: float
+
+
+class RunMetrics:
+    """Thread-safe collection of the timings of a run.
+
+    Example:
+    -------
+    ::
+
+        >>> metrics = RunMetrics()
+        >>> metrics.start_node("quote.love.create_final_image")
+        >>> metrics.end_node("quote.love.create_final_image", namespace="quote.love")
+        >>> metrics.write({"prompt_tokens": 120})
+
+    """
+
+    def __init__(self, directory: str = METRICS_DIRECTORY):
+        """Create an empty collection.
+
+        Args:
+        ----
+            directory (str, optional): Directory of the metric files. Defaults to
+                METRICS_DIRECTORY.
+
+        """
+        self._directory = Path(directory)
+        self._lock = threading.Lock()
+        self._starts = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start the collection of a new run."""
+        with self._lock:
+            self.run_id = time.strftime("%Y%m%dT%H%M%S")
+            self._run_start = time.perf_counter()
+            self._run_cpu_start = time.process_time()
+            self._nodes: list[NodeTiming] = []
+            self._datasets: list[DatasetTiming] = []
+
+    def start_node(self, name: str) -> None:
+        """Record the start of a node in the current thread.
+
+        Args:
+        ----
+            name (str): Name of the node.
+
+        """
+        self._start(("node", name))
+
+    def end_node(
+        self, name: str, namespace: Optional[str], failed: bool = False
+    ) -> None:
+        """Record the end of a node in the current thread.
+
+        Args:
+        ----
+            name (str): Name of the node.
+            namespace (str, optional): Namespace of the node, e.g. ``quote.love``.
+            failed (bool, optional): Whether the node raised an error. Defaults to
+                False.
+
+        """
+        start = self._end(("node", name))
+        if start is None:
+            return
+        wall_start, cpu_start = start
+        timing = NodeTiming(
+            run_id=self.run_id,
+            node=name,
+            namespace=namespace or "",
+            wall_seconds=time.perf_counter() - wall_start,
+            cpu_seconds=time.thread_time() - cpu_start,
+            failed=failed,
+        )
+        with self._lock:
+            self._nodes.append(timing)
+
+    def start_dataset(self, name: str, operation: str) -> None:
+        """Record the start of a load or save in the current thread.
+
+        Args:
+        ----
+            name (str): Name of the dataset.
+            operation (str): Either "load" or "save".
+
+        """
+        self._start((operation, name))
+
+    def end_dataset(self, name: str, operation: str) -> None:
+        """Record the end of a load or save in the current thread.
+
+        Args:
+        ----
+            name (str): Name of the dataset.
+            operation (str): Either "load" or "save".
+
+        """
+        start = self._end((operation, name))
+        if start is None:
+            return
+        timing = DatasetTiming(
+            dataset=name, operation=operation, seconds=time.perf_counter() - start[0]
+        )
+        with self._lock:
+            self._datasets.append(timing)
+
+    def summary(self, llm_metrics: dict[str, float]) -> dict[str, Any]:
+        """Aggregate the timings of the run.
+
+        Args:
+        ----
+            llm_metrics (dict[str, float]): Counters of the LLM calls of the run.
+
+        Returns:
+        -------
+            dict[str, Any]: Metrics of the run, per node, namespace and dataset.
+
+        """
+        with self._lock:
+            nodes = list(self._nodes)
+            datasets = list(self._datasets)
+
+        namespaces = defaultdict(lambda: {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+        for timing in nodes:
+            namespaces[timing.namespace]["wall_seconds"] += timing.wall_seconds
+            namespaces[timing.namespace]["cpu_seconds"] += timing.cpu_seconds
+
+        dataset_totals = defaultdict(lambda: {"seconds": 0.0, "count": 0})
+        for timing in datasets:
+            totals = dataset_totals[f"{timing.operation}:{timing.dataset}"]
+            totals["seconds"] += timing.seconds
+            totals["count"] += 1
+
+        return {
+            "run_id": self.run_id,
+            "timestamp": time.time(),
+            "wall_seconds": time.perf_counter() - self._run_start,
+            "cpu_seconds": time.process_time() - self._run_cpu_start,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "nodes": [asdict(timing) for timing in nodes],
+            "namespaces": dict(namespaces),
+            "datasets": dict(dataset_totals),
+            "llm": llm_metrics,
+        }
+
+    def write(self, llm_metrics: dict[str, float]) -> dict[str, Any]:
+        """Write the metrics of the run to the metric files.
+
+        Args:
+        ----
+            llm_metrics (dict[str, float]): Counters of the LLM calls of the run.
+
+        Returns:
+        -------
+            dict[str, Any]: Metrics of the run.
+
+        """
+        summary = self.summary(llm_metrics)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        write_atomically(
+            self._directory / "run_metrics.json", json.dumps(summary, indent=2)
+        )
+        write_atomically(self._directory / "auto_insta.prom", _to_prometheus(summary))
+
+        csv_filepath = self._directory / "node_metrics.csv"
+        write_header = not csv_filepath.exists()
+        with csv_filepath.open("a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(NodeTiming.__annotations__))
+            if write_header:
+                writer.writeheader()
+            writer.writerows(summary["nodes"])
+        return summary
+
+    def _start(self, key: tuple[str, str]) -> None:
+        """Remember the start of a timing in the current thread.
+
+        Args:
+        ----
+            key (tuple[str, str]): Kind and name of the timing.
+
+        """
+        if not hasattr(self._starts, "values"):
+            self._starts.values = {}
+        self._starts.values[key] = (time.perf_counter(), time.thread_time())
+
+    def _end(self, key: tuple[str, str]) -> Optional[tuple[float, float]]:
+        """Return the start of a timing in the current thread.
+
+        Args:
+        ----
+            key (tuple[str, str]): Kind and name of the timing.
+
+        Returns:
+        -------
+            Optional[tuple[float, float]]: Wall and CPU time at the start, None if
+                the start was not recorded.
+
+        """
+        return getattr(self._starts, "values", {}).pop(key, None)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident set size of the process.
+
+    Returns
+    -------
+        Optional[int]: Peak RSS in bytes, None where it cannot be measured.
+
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def format_summary(summary: dict[str, Any], top_nodes: int = 10) -> str:
+    """Format the metrics of a run as a table.
+
+    Args:
+    ----
+        summary (dict[str, Any]): Metrics of the run.
+        top_nodes (int, optional): Number of the slowest nodes shown. Defaults to 10.
+
+    Returns:
+    -------
+        str: The table.
+
+    """
+    rows = [("Namespace, node or dataset", "Wall s", "CPU s")]
+    rows += [
+        (namespace or "<none>", timing["wall_seconds"], timing["cpu_seconds"])
+        for namespace, timing in sorted(
+            summary["namespaces"].items(), key=lambda item: -item[1]["wall_seconds"]
+        )
+    ]
+    rows += [
+        (f"  {timing['node']}", timing["wall_seconds"], timing["cpu_seconds"])
+        for timing in sorted(summary["nodes"], key=lambda t: -t["wall_seconds"])[
+            :top_nodes
+        ]
+    ]
+    rows += [
+        (dataset, totals["seconds"], "")
+        for dataset, totals in sorted(
+            summary["datasets"].items(), key=lambda item: -item[1]["seconds"]
+        )[:top_nodes]
+    ]
+    rows.append(("Run", summary["wall_seconds"], summary["cpu_seconds"]))
+
+    width = max(len(row[0]) for row in rows)
+    lines = [
+        f"{name:<{width}}  {_format_number(wall):>9}  {_format_number(cpu):>9}"
+        for name, wall, cpu in rows
+    ]
+    lines.insert(1, "-" * len(lines[0]))
+
+    llm = summary["llm"]
+    lines.append(
+        f"LLM: {llm.get('llm_calls', 0):.0f} calls, "
+        f"{llm.get('prompt_tokens', 0):.0f} prompt and "
+        f"{llm.get('completion_tokens', 0):.0f} completion tokens, "
+        f"{llm.get('retries', 0):.0f} retries, "
+        f"{llm.get('model_load_seconds', 0):.2f}s model load, "
+        f"{llm.get('generation_seconds', 0):.2f}s generation, "
+        f"{llm.get('parse_seconds', 0):.2f}s parsing."
+    )
+    if summary["peak_rss_bytes"] is not None:
+        lines.append(f"Peak RSS: {summary['peak_rss_bytes'] / 2**20:.0f} MiB.")
+    return "\n".join(lines)
+
+
+def _format_number(value: Any) -> str:
+    """Format a number of seconds of the summary table.
+
+    Args:
+    ----
+        value (Any): Seconds, or a string which is kept.
+
+    Returns:
+    -------
+        str: The formatted value.
+
+    """
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def _to_prometheus(summary: dict[str, Any]) -> str:
+    """Render the metrics of a run in the Prometheus text format.
+
+    Args:
+    ----
+        summary (dict[str, Any]): Metrics of the run.
+
+    Returns:
+    -------
+        str: The metrics as Prometheus textfile.
+
+    """
+    lines = [
+        "# HELP auto_insta_run_wall_seconds Wall time of the last run.",
+        "# TYPE auto_insta_run_wall_seconds gauge",
+        f"auto_insta_run_wall_seconds {summary['wall_seconds']}",
+        "# HELP auto_insta_run_cpu_seconds CPU time of the last run.",
+        "# TYPE auto_insta_run_cpu_seconds gauge",
+        f"auto_insta_run_cpu_seconds {summary['cpu_seconds']}",
+        "# HELP auto_insta_run_timestamp_seconds End of the last run.",
+        "# TYPE auto_insta_run_timestamp_seconds gauge",
+        f"auto_insta_run_timestamp_seconds {summary['timestamp']}",
+    ]
+    if summary["peak_rss_bytes"] is not None:
+        lines += [
+            "# HELP auto_insta_peak_rss_bytes Peak resident set size of the run.",
+            "# TYPE auto_insta_peak_rss_bytes gauge",
+            f"auto_insta_peak_rss_bytes {summary['peak_rss_bytes']}",
+        ]
+
+    for metric, description in (
+        ("wall_seconds", "Wall time per node."),
+        ("cpu_seconds", "CPU time per node."),
+    ):
+        lines += [
+            f"# HELP auto_insta_node_{metric} {description}",
+            f"# TYPE auto_insta_node_{metric} gauge",
+        ]
+        lines += [
+            f'auto_insta_node_{metric}{{node="{_escape(timing["node"])}",'
+            f'namespace="{_escape(timing["namespace"])}"}} {timing[metric]}'
+            for timing in summary["nodes"]
+        ]
+
+    lines += [
+        "# HELP auto_insta_dataset_seconds Load and save time per dataset.",
+        "# TYPE auto_insta_dataset_seconds gauge",
+    ]
+    for name, totals in summary["datasets"].items():
+        operation, dataset = name.split(":", 1)
+        lines.append(
+            f'auto_insta_dataset_seconds{{dataset="{_escape(dataset)}",'
+            f'operation="{operation}"}} {totals["seconds"]}'
+        )
+
+    lines += [
+        "# HELP auto_insta_llm Counters of the LLM calls of the last run.",
+        "# TYPE auto_insta_llm gauge",
+    ]
+    lines += [
+        f'auto_insta_llm{{counter="{_escape(name)}"}} {value}'
+        for name, value in sorted(summary["llm"].items())
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value.
+
+    Args:
+    ----
+        value (str): The label value.
+
+    Returns:
+    -------
+        str: The escaped value.
+
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
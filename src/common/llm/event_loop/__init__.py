@@ -0,0 +1,7 @@
+"""Shared event loop for asynchronous LLM calls."""
+
+from common.llm.event_loop.event_loop import (
+    as_sync,
+    run_coroutine,
+    shutdown_event_loop,
+)
@@ -0,0 +1,84 @@
+"""Background event loop on which all asynchronous LLM calls run.
+
+Kedro nodes are synchronous, so coroutines are handed to a single event loop running
+in a background thread. All requests of the process therefore share one loop and
+one asynchronous HTTP connection pool, however many nodes await them.
+"""
+
+import asyncio
+import functools
+import threading
+from collections.abc import Coroutine
+from typing import Any, Callable, Optional
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_THREAD: Optional[threading.Thread] = None
+_LOCK = threading.Lock()
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting it on first use.
+
+    Returns
+    -------
+        asyncio.AbstractEventLoop: The running background loop.
+
+    """
+    global _LOOP, _THREAD  # noqa: PLW0603
+
+    with _LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            _THREAD = threading.Thread(
+                target=_LOOP.run_forever, name="llm-event-loop", daemon=True
+            )
+            _THREAD.start()
+        return _LOOP
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """Run a coroutine on the background loop and wait for its result.
+
+    Args:
+    ----
+        coroutine (Coroutine): Coroutine to run.
+
+    Returns:
+    -------
+        Any: The result of the coroutine.
+
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _get_event_loop()).result()
+
+
+def as_sync(func: Callable[..., Coroutine]) -> Callable[..., Any]:
+    """Turn a coroutine function into a function that can be used as a Kedro node.
+
+    Args:
+    ----
+        func (Callable[..., Coroutine]): Coroutine function.
+
+    Returns:
+    -------
+        Callable[..., Any]: Function running the coroutine on the background loop.
+
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return run_coroutine(func(*args, **kwargs))
+
+    return wrapper
+
+
+def shutdown_event_loop() -> None:
+    """Stop the background loop."""
+    global _LOOP, _THREAD  # noqa: PLW0603
+
+    with _LOCK:
+        if _LOOP is None:
+            return
+        _LOOP.call_soon_threadsafe(_LOOP.stop)
+        _THREAD.join()
+        _LOOP.close()
+        _LOOP, _THREAD = None, None
@@ -19,3 +19,18 @@ class Fact(BaseModel):
     """Fact Class."""
 
     text: str = Field(description="fact to be displayed.")
+
+
+class VariantText(BaseModel):
+    """Text written for a single variant of a batch."""
+
+    variant: str = Field(description="subtopic the text is written about.")
+    text: str = Field(description="text to be displayed.")
+
+
+class TextBatch(BaseModel):
+    """Batch Class holding one text per variant."""
+
+    texts: list[VariantText] = Field(
+        description="list containing exactly one text for every subtopic."
+    )
@@ -0,0 +1,4 @@
+"""Counters of the LLM calls of a run."""
+
+from common.llm.metrics.metrics import LLM_METRICS, LLMMetrics
+from common.llm.metrics.token_usage import TokenUsageCallback
@@ -0,0 +1,71 @@
+"""Thread-safe counters of the LLM calls of a run."""
+
+import threading
+from collections import Counter
+
+
+class LLMMetrics:
+    """Counters shared by all LLM calls of a process.
+
+    Example:
+    -------
+    ::
+
+        >>> LLM_METRICS.increment("repairs")
+        >>> LLM_METRICS.rate("repairs", "parse_failures")
+
+    """
+
+    def __init__(self):
+        """Create empty counters."""
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increase a counter.
+
+        Args:
+        ----
+            name (str): Name of the counter.
+            value (float, optional): Amount added to the counter. Defaults to 1.
+
+        """
+        with self._lock:
+            self._counts[name] += value
+
+    def snapshot(self) -> dict[str, float]:
+        """Return a copy of all counters.
+
+        Returns
+        -------
+            dict[str, float]: Value of every counter.
+
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def rate(self, numerator: str, denominator: str) -> float:
+        """Return the ratio of two counters.
+
+        Args:
+        ----
+            numerator (str): Name of the counter that is divided.
+            denominator (str): Name of the counter that is divided by.
+
+        Returns:
+        -------
+            float: The ratio, or 0 if the denominator is 0.
+
+        """
+        with self._lock:
+            if not self._counts[denominator]:
+                return 0.0
+            return self._counts[numerator] / self._counts[denominator]
+
+    def reset(self) -> None:
+        """Set all counters back to 0."""
+        with self._lock:
+            self._counts.clear()
+
+
+LLM_METRICS = LLMMetrics()
@@ -0,0 +1,158 @@
+"""Callback counting the prompt and completion tokens of the LLM calls."""
+
+from typing import Any
+from uuid import UUID
+
+from common.llm.metrics.metrics import LLM_METRICS
+from common.utilities.tokens import estimate_tokens
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Add the tokens of every LLM call to the ``LLM_METRICS``.
+
+    The counts reported by the API are used where available. The local model does
+    not report them, so they are estimated from the length of the texts instead.
+
+    Example:
+    -------
+    ::
+
+        >>> chain.invoke(inputs, config={"callbacks": [TokenUsageCallback()]})
+
+    """
+
+    def __init__(self):
+        """Create the callback."""
+        self._prompt_tokens: dict[UUID, int] = {}
+        self._streamed_tokens: dict[UUID, int] = {}
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],  # noqa: ARG002
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
+        """Estimate the tokens of the prompts.
+
+        Args:
+        ----
+            serialized (dict[str, Any]): The serialised LLM.
+            prompts (list[str]): The prompts.
+            run_id (UUID): Identifier of the call.
+            kwargs (Any): Further arguments of the callback.
+
+        """
+        self._prompt_tokens[run_id] = sum(estimate_tokens(prompt) for prompt in prompts)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],  # noqa: ARG002
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
+        """Estimate the tokens of the messages.
+
+        Args:
+        ----
+            serialized (dict[str, Any]): The serialised chat model.
+            messages (list[list[BaseMessage]]): The messages.
+            run_id (UUID): Identifier of the call.
+            kwargs (Any): Further arguments of the callback.
+
+        """
+        self._prompt_tokens[run_id] = sum(
+            estimate_tokens(str(message.content))
+            for message_list in messages
+            for message in message_list
+        )
+
+    def on_llm_new_token(
+        self,
+        token: str,  # noqa: ARG002
+        *,
+        run_id: UUID,
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
+        """Count a streamed token.
+
+        Args:
+        ----
+            token (str): The token.
+            run_id (UUID): Identifier of the call.
+            kwargs (Any): Further arguments of the callback.
+
+        """
+        self._streamed_tokens[run_id] = self._streamed_tokens.get(run_id, 0) + 1
+
+    def on_llm_end(
+        self,
+        response: LLMResult,
+        *,
+        run_id: UUID,
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
+        """Record the tokens of a finished call.
+
+        Args:
+        ----
+            response (LLMResult): The response of the LLM.
+            run_id (UUID): Identifier of the call.
+            kwargs (Any): Further arguments of the callback.
+
+        """
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion_tokens = self._streamed_tokens.pop(run_id, None)
+        if completion_tokens is None:
+            completion_tokens = sum(
+                estimate_tokens(generation.text)
+                for generations in response.generations
+                for generation in generations
+            )
+        self._record(
+            prompt_tokens=usage.get(
+                "prompt_tokens", self._prompt_tokens.pop(run_id, 0)
+            ),
+            completion_tokens=usage.get("completion_tokens", completion_tokens),
+        )
+
+    def on_llm_error(
+        self,
+        error: BaseException,  # noqa: ARG002
+        *,
+        run_id: UUID,
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
+        """Record the tokens of a call which failed or was stopped early.
+
+        Args:
+        ----
+            error (BaseException): The error.
+            run_id (UUID): Identifier of the call.
+            kwargs (Any): Further arguments of the callback.
+
+        """
+        self._record(
+            prompt_tokens=self._prompt_tokens.pop(run_id, 0),
+            completion_tokens=self._streamed_tokens.pop(run_id, 0),
+        )
+
+    @staticmethod
+    def _record(prompt_tokens: int, completion_tokens: int) -> None:
+        """Add the tokens of a call to the metrics.
+
+        Args:
+        ----
+            prompt_tokens (int): Number of prompt tokens.
+            completion_tokens (int): Number of completion tokens.
+
+        """
+        LLM_METRICS.increment("llm_calls")
+        LLM_METRICS.increment("prompt_tokens", prompt_tokens)
+        LLM_METRICS.increment("completion_tokens", completion_tokens)
@@ -0,0 +1,8 @@
+"""Pool of warm LLM handles shared by all nodes of a session."""
+
+from common.llm.model_pool.model_pool import (
+    PooledLLM,
+    get_llm,
+    shutdown_llms,
+    warmup_llms,
+)
@@ -0,0 +1,352 @@
+"""Keyed, lazily initialised pool of LLM handles.
+
+Loading the local gguf model means reading several GB from disk, and every new
+``ChatOpenAI`` instance opens fresh HTTP connections. The pool keeps one handle per
+backend and settings for the lifetime of the process, so that every node in a Kedro
+session shares the same warm model.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import httpx
+from common.llm.event_loop import run_coroutine
+from common.llm.metrics import LLM_METRICS
+from langchain_community.llms import GPT4All
+from langchain_core.pydantic_v1 import root_validator
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MODEL_PATH = "models/nous-hermes-llama2-13b.Q4_0.gguf"
+OPENAI_MODEL_NAME = "gpt-3.5-turbo"
+
+# Settings of an ``llm`` parameter block which apply to the respective backend.
+_LOCAL_SETTINGS = ("model", "n_threads", "n_ctx", "n_batch", "max_tokens", "device")
+_OPENAI_SETTINGS = ("model_name", "temperature")
+
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+_HTTP_TIMEOUT = 15
+
+
+class PooledLLM:
+    """A warm LLM handle together with its load and inference timings."""
+
+    def __init__(self, key: tuple, llm: Any, load_seconds: float, local: bool):
+        """Create a new pooled handle.
+
+        Args:
+        ----
+            key (tuple): Key under which the handle is stored in the pool.
+            llm (Any): The LangChain LLM or chat model.
+            load_seconds (float): Time it took to create the handle.
+            local (bool): Whether the model runs in-process. Local models are not
+                thread-safe, hence calls to them are serialised.
+
+        """
+        self.key = key
+        self.llm = llm
+        self.local = local
+        self.load_seconds = load_seconds
+        self.inference_seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock() if local else None
+
+    @contextmanager
+    def timed_inference(self) -> Iterator[Any]:
+        """Time a call against the handle and serialise it for local models.
+
+        Yields
+        ------
+            Any: The LangChain LLM or chat model.
+
+        """
+        if self._lock is not None:
+            self._lock.acquire()
+        start = time.perf_counter()
+        try:
+            yield self.llm
+        finally:
+            self.inference_seconds += time.perf_counter() - start
+            self.calls += 1
+            if self._lock is not None:
+                self._lock.release()
+
+    def close(self) -> None:
+        """Release the resources held by the handle."""
+        client = getattr(self.llm, "client", None)
+        if hasattr(client, "close"):
+            client.close()
+
+
+_POOL: dict[tuple, PooledLLM] = {}
+_POOL_LOCK = threading.Lock()
+_KEY_LOCKS: dict[tuple, threading.Lock] = {}
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_ASYNC_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def get_llm(
+    settings: Optional[dict[str, Any]] = None, hashtags: bool = False
+) -> PooledLLM:
+    """Return the pooled handle for the given settings, creating it on first use.
+
+    The backend is OpenAI whenever ``OPENAI_API_KEY`` is set and the local GPT4All
+    model otherwise. Only the settings of that backend are used, so that namespaces
+    with the same model share one handle.
+
+    Args:
+    ----
+        settings (dict[str, Any], optional): The ``llm`` parameter block, for example
+            ``model``, ``n_threads`` and ``n_batch`` of the local model or
+            ``model_name`` and ``temperature`` of OpenAI. Defaults to None.
+        hashtags (bool, optional): Whether the model creates hashtags, in which case
+            the ``hashtag_model`` of the settings is used if set. Defaults to False.
+
+    Returns:
+    -------
+        PooledLLM: Warm handle for the requested model.
+
+    """
+    backend = "openai" if os.environ.get("OPENAI_API_KEY") else "local"
+    settings = _backend_settings(
+        settings=settings or {}, backend=backend, hashtags=hashtags
+    )
+    key = (backend, *sorted(settings.items()))
+
+    pooled = _POOL.get(key)
+    if pooled is not None:
+        return pooled
+
+    with _POOL_LOCK:
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+
+    # Only one thread loads a given model, the others wait for the result.
+    with key_lock:
+        if key not in _POOL:
+            start = time.perf_counter()
+            if backend == "openai":
+                llm = _create_openai_endpoint(**settings)
+            else:
+                llm = _create_local_model(**settings)
+            load_seconds = time.perf_counter() - start
+            logger.info("Loaded %s LLM in %.2fs.", backend, load_seconds)
+            LLM_METRICS.increment("model_load_seconds", load_seconds)
+            _POOL[key] = PooledLLM(
+                key=key, llm=llm, load_seconds=load_seconds, local=backend == "local"
+            )
+    return _POOL[key]
+
+
+def warmup_llms(
+    settings_list: Optional[list[dict[str, Any]]] = None, prime: bool = False
+) -> None:
+    """Load the models ahead of the first prompt.
+
+    Args:
+    ----
+        settings_list (list[dict[str, Any]], optional): The ``llm`` parameter blocks
+            of the models to load, including their hashtag models. Defaults to the
+            default model only.
+        prime (bool, optional): Whether to generate a single token with every local
+            model, which pages the memory mapped weights in before the first
+            prompt. Defaults to False.
+
+    """
+    for settings in settings_list or [{}]:
+        for hashtags in (False, True):
+            pooled = get_llm(settings, hashtags=hashtags)
+            if prime and pooled.local and not pooled.calls:
+                with pooled.timed_inference() as llm:
+                    llm.invoke("Hello", max_tokens=1)
+                logger.info("Primed LLM %s.", pooled.key)
+
+
+def shutdown_llms() -> None:
+    """Report the timings of all pooled models and release them."""
+    global _HTTP_CLIENT, _ASYNC_HTTP_CLIENT  # noqa: PLW0603
+
+    with _POOL_LOCK:
+        for pooled in _POOL.values():
+            logger.info(
+                "LLM %s: load %.2fs, inference %.2fs over %d calls.",
+                pooled.key,
+                pooled.load_seconds,
+                pooled.inference_seconds,
+                pooled.calls,
+            )
+            pooled.close()
+        _POOL.clear()
+        _KEY_LOCKS.clear()
+
+        if _HTTP_CLIENT is not None:
+            _HTTP_CLIENT.close()
+            _HTTP_CLIENT = None
+        if _ASYNC_HTTP_CLIENT is not None:
+            run_coroutine(_ASYNC_HTTP_CLIENT.aclose())
+            _ASYNC_HTTP_CLIENT = None
+
+
+def _backend_settings(
+    settings: dict[str, Any], backend: str, hashtags: bool
+) -> dict[str, Any]:
+    """Select the settings of a backend out of an ``llm`` parameter block.
+
+    Args:
+    ----
+        settings (dict[str, Any]): The ``llm`` parameter block.
+        backend (str): Either "openai" or "local".
+        hashtags (bool): Whether the ``hashtag_model`` replaces the ``model``.
+
+    Returns:
+    -------
+        dict[str, Any]: Settings passed to the model of the backend.
+
+    """
+    if hashtags and settings.get("hashtag_model"):
+        settings = {**settings, "model": settings["hashtag_model"]}
+    names = _OPENAI_SETTINGS if backend == "openai" else _LOCAL_SETTINGS
+    return {name: value for name, value in settings.items() if name in names}
+
+
+def _get_http_client() -> httpx.Client:
+    """Return the keep-alive HTTP client shared by all OpenAI endpoints.
+
+    Returns
+    -------
+        httpx.Client: Shared HTTP client.
+
+    """
+    global _HTTP_CLIENT  # noqa: PLW0603
+
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+    return _HTTP_CLIENT
+
+
+def _get_async_http_client() -> httpx.AsyncClient:
+    """Return the keep-alive HTTP client shared by all asynchronous OpenAI calls.
+
+    The client is only used from the shared event loop of ``common.llm.event_loop``.
+
+    Returns
+    -------
+        httpx.AsyncClient: Shared asynchronous HTTP client.
+
+    """
+    global _ASYNC_HTTP_CLIENT  # noqa: PLW0603
+
+    if _ASYNC_HTTP_CLIENT is None:
+        _ASYNC_HTTP_CLIENT = httpx.AsyncClient(
+            limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT
+        )
+    return _ASYNC_HTTP_CLIENT
+
+
+def _create_openai_endpoint(
+    model_name: str = OPENAI_MODEL_NAME, temperature: float = 0.0
+) -> ChatOpenAI:
+    """Initialize the OpenAI endpoint.
+
+    Args:
+    ----
+        model_name (str, optional): Name of the instance of the openai model name.
+            Defaults to "gpt-3.5-turbo".
+        temperature (float, optional): The temperature states the certainty that the AI
+            has. Defaults to 0.0.
+
+    Returns:
+    -------
+        ChatOpenAI: OpenAI endpoint.
+
+    """
+    return ChatOpenAI(
+        temperature=temperature,
+        model_name=model_name,
+        openai_api_key=os.environ.get("OPENAI_API_KEY"),
+        openai_api_base=os.environ.get("OPENAI_API_BASE_URL"),
+        request_timeout=_HTTP_TIMEOUT,
+        max_retries=0,
+        http_client=_get_http_client(),
+        http_async_client=_get_async_http_client(),
+    )
+
+
+class _LocalModel(GPT4All):
+    """GPT4All model which also passes the context size to the bindings."""
+
+    n_ctx: int = 2048
+
+    @root_validator()
+    def validate_environment(cls, values: dict) -> dict:  # noqa: N805
+        """Load the model with the configured context size and thread count.
+
+        Args:
+        ----
+            values (dict): Values of the fields.
+
+        Returns:
+        -------
+            dict: Values of the fields including the loaded client.
+
+        """
+        from gpt4all import GPT4All as GPT4AllModel
+
+        model_path, delimiter, model_name = values["model"].rpartition("/")
+        values["client"] = GPT4AllModel(
+            model_name,
+            model_path=model_path + delimiter or None,
+            model_type=values["backend"],
+            allow_download=values["allow_download"],
+            n_threads=values["n_threads"],
+            device=values["device"],
+            n_ctx=values["n_ctx"],
+        )
+        values["backend"] = values["client"].model_type
+        return values
+
+
+def _create_local_model(  # noqa: PLR0913
+    model: str = LOCAL_MODEL_PATH,
+    n_threads: Optional[int] = None,
+    n_ctx: int = 2048,
+    n_batch: int = 8,
+    max_tokens: int = 200,
+    device: str = "cpu",
+) -> GPT4All:
+    """Initialize the local GPT4All model.
+
+    The model streams its tokens, so that every token is reported to the callbacks
+    while it is generated.
+
+    Args:
+    ----
+        model (str, optional): Path to the gguf model file, which also determines
+            the quantisation. Defaults to the nous-hermes 13B model.
+        n_threads (int, optional): Number of CPU threads. Defaults to None, which
+            lets GPT4All use all cores.
+        n_ctx (int, optional): Context size in tokens. Defaults to 2048.
+        n_batch (int, optional): Number of prompt tokens processed in parallel.
+            Defaults to 8.
+        max_tokens (int, optional): Maximum number of generated tokens. Defaults to
+            200.
+        device (str, optional): Device the model runs on. Defaults to "cpu".
+
+    Returns:
+    -------
+        GPT4All: Local model.
+
+    """
+    return _LocalModel(
+        model=model,
+        n_threads=n_threads,
+        n_ctx=n_ctx,
+        n_batch=n_batch,
+        max_tokens=max_tokens,
+        device=device,
+        streaming=True,
+    )
@@ -0,0 +1,3 @@
+"""Local repair of malformed LLM output."""
+
+from common.llm.output_repair.output_repair import repair_output
@@ -0,0 +1,169 @@
+"""Cheap local repairs of LLM output before it is handed to the output parser.
+
+Local models often wrap the JSON in prose, leave trailing commas, use single quotes
+or skip the JSON altogether. Most of these answers still contain the desired
+content, so repairing them is much cheaper than asking the LLM again.
+"""
+
+import ast
+import json
+import re
+from typing import Any, Optional
+
+from langchain_core.pydantic_v1 import BaseModel
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_HASHTAG = re.compile(r"#?(\w+)")
+_JSON_OPENING = re.compile(r"[{\[]")
+
+
+def repair_output(raw_output: str, pydantic_object: type[BaseModel]) -> Optional[str]:
+    """Turn malformed LLM output into JSON matching the pydantic object.
+
+    Args:
+    ----
+        raw_output (str): Text returned by the LLM.
+        pydantic_object (type[BaseModel]): Class the output is parsed into.
+
+    Returns:
+    -------
+        Optional[str]: JSON string of the repaired output, or None if it could not be
+            repaired.
+
+    """
+    fields = pydantic_object.__fields__
+    data = _extract_json(raw_output)
+
+    if isinstance(data, dict):
+        data = _match_fields(data=data, fields=fields)
+    elif isinstance(data, (str, list)):
+        data = _coerce_plain_output(output=data, fields=fields)
+    elif data is None and not _JSON_OPENING.search(raw_output):
+        # JSON that does not decode is truncated or broken, wrapping it as plain
+        # text would publish the raw payload.
+        data = _coerce_plain_output(output=raw_output, fields=fields)
+
+    if not isinstance(data, dict) or not set(fields) <= set(data):
+        return None
+    return json.dumps(data)
+
+
+def _extract_json(raw_output: str) -> Any:
+    """Extract the first JSON value from text surrounding it.
+
+    Text after the first complete value, such as prose or further objects, is
+    ignored.
+
+    Args:
+    ----
+        raw_output (str): Text returned by the LLM.
+
+    Returns:
+    -------
+        Any: The decoded value, or None if the text contains no decodable JSON.
+
+    """
+    fenced = _CODE_FENCE.search(raw_output)
+    text = fenced.group(1) if fenced else raw_output
+
+    start = min(
+        (position for position in (text.find("{"), text.find("[")) if position >= 0),
+        default=None,
+    )
+    if start is None:
+        return None
+    candidate = _TRAILING_COMMA.sub(r"\1", text[start:])
+    try:
+        value, _ = json.JSONDecoder().raw_decode(candidate)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    closing = "}" if candidate[0] == "{" else "]"
+    end = candidate.find(closing)
+    while end >= 0:
+        try:
+            # Python literals cover single quotes and True/False/None.
+            return ast.literal_eval(candidate[: end + 1])
+        except (ValueError, SyntaxError):
+            end = candidate.find(closing, end + 1)
+    return None
+
+
+def _match_fields(data: dict[str, Any], fields: dict[str, Any]) -> dict[str, Any]:
+    """Map decoded JSON onto the fields of the pydantic object.
+
+    Handles the schema being echoed under ``properties`` and single field objects
+    whose value is returned under a different key.
+
+    Args:
+    ----
+        data (dict[str, Any]): Decoded JSON.
+        fields (dict[str, Any]): Fields of the pydantic object.
+
+    Returns:
+    -------
+        dict[str, Any]: The data keyed by the fields of the pydantic object.
+
+    """
+    if set(fields) <= set(data):
+        return data
+    if isinstance(data.get("properties"), dict):
+        return _match_fields(data=data["properties"], fields=fields)
+    (value,) = data.values() if len(data) == 1 else (None,)
+    if len(fields) == 1 and isinstance(value, (str, list)):
+        return _coerce_plain_output(output=value, fields=fields) or data
+    return data
+
+
+def _coerce_plain_output(output: Any, fields: dict[str, Any]) -> Optional[dict]:
+    """Wrap output that is not a JSON object into the single field of the object.
+
+    A bare string becomes the ``text`` of a quote or fact, a list or a comma
+    separated string becomes the list of hashtags.
+
+    Args:
+    ----
+        output (Any): A string or list returned by the LLM.
+        fields (dict[str, Any]): Fields of the pydantic object.
+
+    Returns:
+    -------
+        Optional[dict]: The data keyed by the field, or None if it cannot be coerced.
+
+    """
+    if len(fields) != 1:
+        return None
+    ((field_name, field),) = fields.items()
+
+    if not _is_list(field):
+        if isinstance(output, list):
+            output = " ".join(str(item) for item in output)
+        text = str(output).strip().strip("\"'").strip()
+        return {field_name: text} if text else None
+
+    if field.type_ is not str:
+        return None
+    if isinstance(output, str):
+        separator = r"[,\n]" if re.search(r"[,\n]", output) else r"\s+"
+        output = re.split(separator, output)
+    hashtags = [
+        f"#{match.group(1)}" for item in output if (match := _HASHTAG.search(str(item)))
+    ]
+    return {field_name: hashtags} if hashtags else None
+
+
+def _is_list(field: Any) -> bool:
+    """Check whether a pydantic field holds a list.
+
+    Args:
+    ----
+        field (Any): Pydantic field.
+
+    Returns:
+    -------
+        bool: Whether the field holds a list.
+
+    """
+    return getattr(field.outer_type_, "__origin__", None) is list
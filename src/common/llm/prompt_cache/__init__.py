@@ -0,0 +1,3 @@
+"""Persistent cache of LLM responses."""
+
+from common.llm.prompt_cache.prompt_cache import PROMPT_CACHE, PromptCache
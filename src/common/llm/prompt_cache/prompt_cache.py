@@ -0,0 +1,219 @@
+"""Content-addressed on-disk cache of parsed LLM responses.
+
+Entries are keyed by the hash of the rendered prompt, the schema of the output
+parser and the model with its temperature. Re-running a pipeline after a failure
+sends the same prompts, so it is answered from disk without spending any tokens, and
+past generations can be replayed for benchmarking.
+Skipping whole nodes is left to incremental runs, see ``IncrementalHooks``.
+
+The cache is controlled by the environment variable ``AUTO_INSTA_LLM_CACHE``:
+
+- ``on`` (default): read and write the cache.
+- ``off``: bypass the cache entirely.
+- ``refresh``: always call the LLM, but write the responses to the cache.
+- ``replay``: only answer from the cache and fail on a miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from common.utilities.files import write_atomically
+from langchain_core.pydantic_v1 import BaseModel
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("on", "off", "refresh", "replay")
+
+
+class PromptCache:
+    """On-disk cache of parsed LLM responses with TTL and size based eviction.
+
+    Example:
+    -------
+    ::
+
+        >>> cache = PromptCache(directory="data/02_intermediate/llm_cache")
+        >>> key = cache.key(prompt=prompt, pydantic_object=Quote, llm=llm)
+        >>> cache.get(key, pydantic_object=Quote)
+
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/02_intermediate/llm_cache",
+        ttl_seconds: float = 30 * 24 * 3600,
+        max_entries: int = 10_000,
+    ):
+        """Create a new cache.
+
+        Args:
+        ----
+            directory (str, optional): Directory holding the entries. Defaults to
+                "data/02_intermediate/llm_cache".
+            ttl_seconds (float, optional): Age after which an entry expires. Defaults
+                to 30 days.
+            max_entries (int, optional): Number of entries kept on eviction.
+                Defaults to 10000.
+
+        """
+        self._directory = Path(directory)
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        """Mode of the cache, read from ``AUTO_INSTA_LLM_CACHE``."""
+        mode = os.environ.get("AUTO_INSTA_LLM_CACHE", "on").lower()
+        if mode not in CACHE_MODES:
+            raise ValueError(f"AUTO_INSTA_LLM_CACHE has to be one of {CACHE_MODES}.")
+        return mode
+
+    @staticmethod
+    def key(prompt: str, pydantic_object: type[BaseModel], llm: Any) -> str:
+        """Compute the key of a response.
+
+        Args:
+        ----
+            prompt (str): The rendered prompt.
+            pydantic_object (type[BaseModel]): Class the response is parsed into.
+            llm (Any): The LangChain LLM or chat model.
+
+        Returns:
+        -------
+            str: Hex digest identifying the response.
+
+        """
+        model = getattr(llm, "model_name", None)
+        temperature = getattr(llm, "temperature", None)
+        identity = {
+            "prompt": prompt,
+            "schema": pydantic_object.schema(),
+            "llm": type(llm).__name__,
+            "model": getattr(llm, "model", None) if model is None else model,
+            # A temperature of 0 is a valid setting and must not fall through.
+            "temperature": getattr(llm, "temp", None)
+            if temperature is None
+            else temperature,
+        }
+        encoded = json.dumps(identity, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: str, pydantic_object: type[BaseModel]) -> Optional[BaseModel]:
+        """Return the cached response, if there is a valid one.
+
+        Args:
+        ----
+            key (str): Key of the response.
+            pydantic_object (type[BaseModel]): Class the response is parsed into.
+
+        Raises:
+        ------
+            KeyError: If the cache is in replay mode and has no entry for the key.
+
+        Returns:
+        -------
+            Optional[BaseModel]: The cached response or None.
+
+        """
+        mode = self.mode
+        if mode in ("off", "refresh"):
+            return None
+
+        response = self._read(key=key, pydantic_object=pydantic_object)
+        if response is None:
+            if mode == "replay":
+                raise KeyError(f"No cached LLM response for {key}.")
+            return None
+
+        logger.info("Answered prompt %s from the cache.", key[:12])
+        return response
+
+    def set(self, key: str, response: BaseModel) -> None:
+        """Store a response.
+
+        Args:
+        ----
+            key (str): Key of the response.
+            response (BaseModel): The parsed response.
+
+        """
+        if self.mode == "off":
+            return
+
+        write_atomically(self._filepath(key), response.json())
+
+    def evict(self) -> int:
+        """Remove the expired entries and the oldest ones above ``max_entries``.
+
+        Returns
+        -------
+            int: Number of removed entries.
+
+        """
+        with self._lock:
+            entries = sorted(
+                (
+                    (filepath.stat().st_mtime, filepath)
+                    for filepath in self._directory.glob("*/*.json")
+                ),
+                reverse=True,
+            )
+            now = time.time()
+            expired = [
+                filepath
+                for position, (modified, filepath) in enumerate(entries)
+                if position >= self._max_entries or now - modified > self._ttl_seconds
+            ]
+            for filepath in expired:
+                filepath.unlink(missing_ok=True)
+        return len(expired)
+
+    def _read(self, key: str, pydantic_object: type[BaseModel]) -> Optional[BaseModel]:
+        """Read an entry, removing it if it expired.
+
+        Args:
+        ----
+            key (str): Key of the response.
+            pydantic_object (type[BaseModel]): Class the response is parsed into.
+
+        Returns:
+        -------
+            Optional[BaseModel]: The cached response, or None if there is no valid
+                entry.
+
+        """
+        filepath = self._filepath(key)
+        if not filepath.exists():
+            return None
+        if time.time() - filepath.stat().st_mtime > self._ttl_seconds:
+            filepath.unlink(missing_ok=True)
+            return None
+        try:
+            return pydantic_object.parse_raw(filepath.read_text())
+        except ValueError:
+            logger.warning("Ignoring corrupt cache entry %s.", filepath)
+            return None
+
+    def _filepath(self, key: str) -> Path:
+        """Return the location of an entry.
+
+        Args:
+        ----
+            key (str): Key of the response.
+
+        Returns:
+        -------
+            Path: Location of the entry.
+
+        """
+        return self._directory / key[:2] / f"{key}.json"
+
+
+PROMPT_CACHE = PromptCache()
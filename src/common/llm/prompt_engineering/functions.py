@@ -1,35 +1,73 @@
 """Functions for the llm callback pipeline."""
 
-from common.llm.flow_modules.generate_query import Fact, Hashtag, Quote
-from langchain_community.llms import GPT4All
-from langchain.output_parsers import PydanticOutputParser
-from langchain.prompts import ChatPromptTemplate
-from langchain.prompts import PromptTemplate
-from langchain_core.runnables.base import RunnableSequence
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
 
-import os
-from langchain_openai import ChatOpenAI
+from common.llm.flow_modules.generate_query import Fact, Hashtag, Quote, TextBatch
+from common.llm.metrics import LLM_METRICS, TokenUsageCallback
+from common.llm.model_pool import PooledLLM, get_llm
+from common.llm.output_repair import repair_output
+from common.llm.prompt_cache import PROMPT_CACHE
+from common.llm.rate_limit import LLM_RATE_LIMITER
+from common.llm.retry import (
+    RETRY_BUDGET,
+    RetryBudgetExhaustedError,
+    backoff_delay,
+    classify_error,
+)
+from common.llm.retry.retry import FATAL
+from common.llm.streaming import astream_text_field, stream_text_field
+from langchain.output_parsers import OutputFixingParser, PydanticOutputParser
+from langchain.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import StrOutputParser
+
+logger = logging.getLogger(__name__)
 
 PYDANTIC_OUTPUT_PARSER = {
     "quote": Quote,
     "hashtag": Hashtag,
     "fact": Fact,
+    "batch": TextBatch,
+}
+
+# Maximum number of characters of the text, generation is stopped beyond it.
+MAX_TEXT_LENGTH = {
+    "quote": 100,
+    "fact": 200,
 }
 
 
-def prompt_wrapper(
+def prompt_wrapper(  # noqa: PLR0913
     inputs: dict[str, str],
     template: str,
     output_parser_key: str,
+    use_cache: bool = True,
+    llm_settings: Optional[dict[str, Any]] = None,
+    refresh_cache: bool = False,
 ) -> str:
     """Build the prompt through instruction and system messages.
 
+    The LLM is taken from the process-wide model pool, so the model is only loaded
+    once per session no matter how many prompts are sent. Responses to prompts that
+    were already answered are taken from the prompt cache. Texts with a length limit
+    are streamed and generation stops as soon as the text is complete or too long.
+
     Args:
     ----
         inputs (dict[str, str]): The inputs to the prompt.
         template (str): The template of the prompt.
         output_parser_key (str): Name of the pipeline. Used to find the correct output
             parser object.
+        use_cache (bool, optional): Whether responses are read from and written to
+            the prompt cache. Defaults to True.
+        llm_settings (dict[str, Any], optional): The ``llm`` parameter block of the
+            namespace. Defaults to None, which uses the default model.
+        refresh_cache (bool, optional): Whether the cached response is ignored and
+            replaced, for example because it was rejected. Defaults to False.
 
     Returns:
     -------
@@ -46,80 +84,472 @@ def prompt_wrapper(
         output_parser=output_parser,
     )
 
-    if os.environ.get("OPENAI_API_KEY"):
-        llm = _get_openai_endpoint()
-    else:
-        llm = GPT4All(model="models/nous-hermes-llama2-13b.Q4_0.gguf")
+    pooled_llm = get_llm(llm_settings, hashtags=output_parser_key == "hashtag")
+    cache_key, desired_object = _read_cache(
+        prompt=prompt,
+        inputs=inputs,
+        output_parser=output_parser,
+        pooled_llm=pooled_llm,
+        use_cache=use_cache,
+        refresh_cache=refresh_cache,
+    )
+    if desired_object is not None:
+        return desired_object
+
+    desired_object = _retrying_after_failure(
+        pooled_llm=pooled_llm,
+        prompt=prompt,
+        output_parser=output_parser,
+        inputs=inputs,
+        max_length=MAX_TEXT_LENGTH.get(output_parser_key),
+    )
+    if use_cache:
+        PROMPT_CACHE.set(key=cache_key, response=desired_object)
+    return desired_object
+
 
-    chain = prompt | llm | output_parser
+async def aprompt_wrapper(  # noqa: PLR0913
+    inputs: dict[str, str],
+    template: str,
+    output_parser_key: str,
+    use_cache: bool = True,
+    llm_settings: Optional[dict[str, Any]] = None,
+    refresh_cache: bool = False,
+) -> str:
+    """Asynchronous version of ``prompt_wrapper``.
 
-    return _retrying_after_failure(chain=chain, inputs=inputs)
+    OpenAI requests are awaited through ``ainvoke`` on the shared HTTP connection
+    pool, so many prompts can be in flight from a single thread. The local model
+    can only run one prompt at a time and is called in a worker thread instead.
 
+    Args:
+    ----
+        inputs (dict[str, str]): The inputs to the prompt.
+        template (str): The template of the prompt.
+        output_parser_key (str): Name of the pipeline. Used to find the correct output
+            parser object.
+        use_cache (bool, optional): Whether responses are read from and written to
+            the prompt cache. Defaults to True.
+        llm_settings (dict[str, Any], optional): The ``llm`` parameter block of the
+            namespace. Defaults to None, which uses the default model.
+        refresh_cache (bool, optional): Whether the cached response is ignored and
+            replaced, for example because it was rejected. Defaults to False.
+
+    Returns:
+    -------
+        str: The output of the pipeline. This oftentimes is a class which has different
+            attributes.
+
+    """
+    pooled_llm = get_llm(llm_settings, hashtags=output_parser_key == "hashtag")
+    if pooled_llm.local:
+        return await asyncio.to_thread(
+            prompt_wrapper,
+            inputs=inputs,
+            template=template,
+            output_parser_key=output_parser_key,
+            use_cache=use_cache,
+            llm_settings=llm_settings,
+            refresh_cache=refresh_cache,
+        )
+
+    output_parser = PydanticOutputParser(
+        pydantic_object=PYDANTIC_OUTPUT_PARSER[output_parser_key]
+    )
+    prompt = _build_prompt(
+        inputs=inputs,
+        template=template,
+        output_parser=output_parser,
+    )
 
-def _retrying_after_failure(
-    chain: RunnableSequence, inputs: dict[str, str], max_attempts: int = 10
+    cache_key, desired_object = _read_cache(
+        prompt=prompt,
+        inputs=inputs,
+        output_parser=output_parser,
+        pooled_llm=pooled_llm,
+        use_cache=use_cache,
+        refresh_cache=refresh_cache,
+    )
+    if desired_object is not None:
+        return desired_object
+
+    desired_object = await _aretrying_after_failure(
+        pooled_llm=pooled_llm,
+        prompt=prompt,
+        output_parser=output_parser,
+        inputs=inputs,
+        max_length=MAX_TEXT_LENGTH.get(output_parser_key),
+    )
+    if use_cache:
+        PROMPT_CACHE.set(key=cache_key, response=desired_object)
+    return desired_object
+
+
+def _read_cache(  # noqa: PLR0913
+    prompt: PromptTemplate,
+    inputs: dict[str, str],
+    output_parser: PydanticOutputParser,
+    pooled_llm: PooledLLM,
+    use_cache: bool,
+    refresh_cache: bool,
+) -> tuple[Optional[str], Optional[object]]:
+    """Look up the response to a prompt in the prompt cache.
+
+    The key is computed from the rendered prompt, including the past texts. Their
+    selection is bounded and stable, so the rerun of a failed run sends the same
+    prompt and hits the cache, while a run after a text was added to the history
+    sends a new prompt and is answered by the LLM.
+
+    Args:
+    ----
+        prompt (PromptTemplate): The prompt that is sent to the LLM.
+        inputs (dict[str, str]): The inputs to the prompt.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
+        pooled_llm (PooledLLM): Pooled handle of the LLM.
+        use_cache (bool): Whether the prompt cache is used at all.
+        refresh_cache (bool): Whether the cached response is ignored.
+
+    Returns:
+    -------
+        tuple[Optional[str], Optional[object]]: Key of the prompt and the cached
+            response, or None if the prompt was not answered before.
+
+    """
+    if not use_cache:
+        return None, None
+
+    cache_key = PROMPT_CACHE.key(
+        prompt=prompt.format(**inputs),
+        pydantic_object=output_parser.pydantic_object,
+        llm=pooled_llm.llm,
+    )
+    if refresh_cache:
+        return cache_key, None
+    desired_object = PROMPT_CACHE.get(
+        key=cache_key, pydantic_object=output_parser.pydantic_object
+    )
+    if desired_object is not None:
+        LLM_METRICS.increment("cache_hits")
+    return cache_key, desired_object
+
+
+def _retrying_after_failure(  # noqa: PLR0913
+    pooled_llm: PooledLLM,
+    prompt: PromptTemplate,
+    output_parser: PydanticOutputParser,
+    inputs: dict[str, str],
+    max_length: Optional[int] = None,
+    max_attempts: int = 10,
 ) -> object:
     """Retry the chain after a failure.
 
+    Failed attempts are retried with jittered exponential backoff, and every retry
+    is taken out of the retry budget of the run. Every call to the LLM waits for the
+    shared rate limiter. Output which cannot be parsed is
+    first handed back to the LLM for fixing before the text is regenerated.
+
     Args:
     ----
-        chain (RunnableSequence): Chain that invokes the LLM.
+        pooled_llm (PooledLLM): Pooled handle of the LLM.
+        prompt (PromptTemplate): The prompt that is sent to the LLM.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
         inputs (dict[str, str]): The inputs to the prompt.
+        max_length (int, optional): Maximum number of characters of the text. If
+            set, the output is streamed and cut off at the limit. Defaults to None.
         max_attempts (int, optional): Number of attempts tried before accepting failure.
             Defaults to 10.
 
     Raises:
     ------
-        Exception: If all attempts fail.
+        RuntimeError: If all attempts fail or an attempt fails with a fatal error.
+        RetryBudgetExhaustedError: If the retry budget of the run is used up.
 
     Returns:
     -------
         object: The desired object that is returned by the chain.
 
     """
-    attempts = 0
+    start = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        LLM_METRICS.increment("attempts")
+        LLM_RATE_LIMITER.acquire()
+        try:
+            with pooled_llm.timed_inference() as llm:
+                chain = prompt | llm | StrOutputParser()
+                callbacks = [TokenUsageCallback()]
+                with _timed("generation_seconds"):
+                    if max_length is None:
+                        raw_output = chain.invoke(
+                            inputs, config={"callbacks": callbacks}
+                        )
+                    else:
+                        raw_output = stream_text_field(
+                            chain=chain,
+                            inputs=inputs,
+                            max_length=max_length,
+                            callbacks=callbacks,
+                        )
+                with _timed("parse_seconds"):
+                    desired_object = _parse_output(
+                        raw_output=raw_output, output_parser=output_parser, llm=llm
+                    )
+        except Exception as error:
+            time.sleep(
+                _prepare_retry(error=error, attempt=attempt, max_attempts=max_attempts)
+            )
+            continue
+
+        _log_success(attempt=attempt, start=start)
+        return desired_object
+
+    raise RuntimeError(f"All {max_attempts} attempts failed.")
+
+
+async def _aretrying_after_failure(  # noqa: PLR0913
+    pooled_llm: PooledLLM,
+    prompt: PromptTemplate,
+    output_parser: PydanticOutputParser,
+    inputs: dict[str, str],
+    max_length: Optional[int] = None,
+    max_attempts: int = 10,
+) -> object:
+    """Asynchronous version of ``_retrying_after_failure``.
+
+    Args:
+    ----
+        pooled_llm (PooledLLM): Pooled handle of the LLM.
+        prompt (PromptTemplate): The prompt that is sent to the LLM.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
+        inputs (dict[str, str]): The inputs to the prompt.
+        max_length (int, optional): Maximum number of characters of the text. If
+            set, the output is streamed and cut off at the limit. Defaults to None.
+        max_attempts (int, optional): Number of attempts tried before accepting failure.
+            Defaults to 10.
+
+    Raises:
+    ------
+        RuntimeError: If all attempts fail or an attempt fails with a fatal error.
+        RetryBudgetExhaustedError: If the retry budget of the run is used up.
+
+    Returns:
+    -------
+        object: The desired object that is returned by the chain.
 
-    while attempts < max_attempts:
+    """
+    start = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        LLM_METRICS.increment("attempts")
+        await LLM_RATE_LIMITER.aacquire()
         try:
-            desired_object = chain.invoke(inputs)
-            break
-        except Exception as e:
-            attempts += 1
-
-    # If the loop completes without breaking, it means all attempts failed
-    if attempts == max_attempts:
-        raise Exception("All attempts failed.")
+            with pooled_llm.timed_inference() as llm:
+                chain = prompt | llm | StrOutputParser()
+                callbacks = [TokenUsageCallback()]
+                with _timed("generation_seconds"):
+                    if max_length is None:
+                        raw_output = await chain.ainvoke(
+                            inputs, config={"callbacks": callbacks}
+                        )
+                    else:
+                        raw_output = await astream_text_field(
+                            chain=chain,
+                            inputs=inputs,
+                            max_length=max_length,
+                            callbacks=callbacks,
+                        )
+                with _timed("parse_seconds"):
+                    desired_object = await _aparse_output(
+                        raw_output=raw_output, output_parser=output_parser, llm=llm
+                    )
+        except Exception as error:
+            await asyncio.sleep(
+                _prepare_retry(error=error, attempt=attempt, max_attempts=max_attempts)
+            )
+            continue
+
+        _log_success(attempt=attempt, start=start)
+        return desired_object
+
+    raise RuntimeError(f"All {max_attempts} attempts failed.")
+
+
+def _parse_output(
+    raw_output: str, output_parser: PydanticOutputParser, llm: object
+) -> object:
+    """Parse the LLM output, repairing it if it cannot be parsed.
+
+    The output is first repaired locally. Only if that fails the LLM is asked to fix
+    it, which only sends the broken output and the format instructions and is still
+    much cheaper than regenerating the text from the full prompt.
+
+    Args:
+    ----
+        raw_output (str): Text returned by the LLM.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
+        llm (object): The LLM used to fix the output.
+
+    Returns:
+    -------
+        object: The parsed output.
+
+    """
+    desired_object = _repair_locally(raw_output=raw_output, output_parser=output_parser)
+    if desired_object is not None:
+        return desired_object
+
+    _prepare_llm_fix()
+    LLM_RATE_LIMITER.acquire()
+    return OutputFixingParser.from_llm(llm=llm, parser=output_parser).parse(raw_output)
+
+
+async def _aparse_output(
+    raw_output: str, output_parser: PydanticOutputParser, llm: object
+) -> object:
+    """Asynchronous version of ``_parse_output``.
+
+    Args:
+    ----
+        raw_output (str): Text returned by the LLM.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
+        llm (object): The LLM used to fix the output.
+
+    Returns:
+    -------
+        object: The parsed output.
+
+    """
+    desired_object = _repair_locally(raw_output=raw_output, output_parser=output_parser)
+    if desired_object is not None:
+        return desired_object
+
+    _prepare_llm_fix()
+    await LLM_RATE_LIMITER.aacquire()
+    return await OutputFixingParser.from_llm(llm=llm, parser=output_parser).aparse(
+        raw_output
+    )
+
+
+def _repair_locally(
+    raw_output: str, output_parser: PydanticOutputParser
+) -> Optional[object]:
+    """Parse the LLM output, falling back to a local repair of malformed JSON.
+
+    Args:
+    ----
+        raw_output (str): Text returned by the LLM.
+        output_parser (PydanticOutputParser): Parser of the LLM output.
+
+    Returns:
+    -------
+        Optional[object]: The parsed output, or None if it could not be repaired.
+
+    """
+    LLM_METRICS.increment("outputs")
+    try:
+        return output_parser.parse(raw_output)
+    except OutputParserException:
+        LLM_METRICS.increment("parse_failures")
+
+    repaired_output = repair_output(
+        raw_output=raw_output, pydantic_object=output_parser.pydantic_object
+    )
+    if repaired_output is None:
+        return None
+    try:
+        desired_object = output_parser.parse(repaired_output)
+    except OutputParserException:
+        return None
+    LLM_METRICS.increment("repairs")
     return desired_object
 
 
-def _get_openai_endpoint(
-    model_name: str = "gpt-3.5-turbo", temperature: float = 0.0
-) -> ChatOpenAI:
-    """Initialize the OpenAI endpoint.
+def _prepare_llm_fix() -> None:
+    """Take the request to the LLM to fix its output out of the retry budget.
+
+    Raises
+    ------
+        RetryBudgetExhaustedError: If the retry budget of the run is used up.
+
+    """
+    RETRY_BUDGET.consume()
+    LLM_METRICS.increment("llm_fixes")
+    logger.info("Could not repair the LLM output, asking the LLM to fix it.")
+
+
+def _prepare_retry(error: Exception, attempt: int, max_attempts: int) -> float:
+    """Decide whether a failed attempt is retried and how long to wait for it.
+
+    This is the retry policy shared by the synchronous and the asynchronous path.
+    An exhausted retry budget is passed on as it is, so that it is neither
+    classified nor taken out of the budget once more.
 
     Args:
     ----
-        model_name (str, optional): Name of the instance of the openai model name.
-            Defaults to "gpt-3.5-turbo".
-        temperature (float, optional): The temperature states the certainty that the AI
-            has. Defaults to 0.0.
+        error (Exception): The error of the failed attempt.
+        attempt (int): Number of the failed attempt, starting at 1.
+        max_attempts (int): Number of attempts tried before accepting failure.
+
+    Raises:
+    ------
+        RetryBudgetExhaustedError: If the error is an exhausted retry budget, or if
+            the retry budget is used up by this retry.
+        RuntimeError: If the error is fatal or all attempts failed.
 
     Returns:
     -------
-        ChatOpenAI: OpenAI endpoint.
+        float: Seconds to wait before the next attempt.
 
     """
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    openai_base_url = os.environ.get("OPENAI_API_BASE_URL")
-
-    return ChatOpenAI(
-        temperature=temperature,
-        model_name=model_name,
-        openai_api_key=openai_api_key,
-        openai_api_base=openai_base_url,
-        request_timeout=15,
-        max_retries=2,
+    if isinstance(error, RetryBudgetExhaustedError):
+        raise error
+    error_class = classify_error(error)
+    if error_class == FATAL:
+        raise RuntimeError("The LLM call failed with a fatal error.") from error
+    if attempt == max_attempts:
+        raise RuntimeError(f"All {max_attempts} attempts failed.") from error
+
+    RETRY_BUDGET.consume()
+    LLM_METRICS.increment("retries")
+    LLM_METRICS.increment(f"{error_class}_errors")
+    delay = backoff_delay(attempt=attempt, error=error)
+    logger.warning(
+        "Attempt %d/%d failed with %s error (%s), retrying in %.2fs.",
+        attempt,
+        max_attempts,
+        error_class,
+        error,
+        delay,
     )
+    return delay
+
+
+def _log_success(attempt: int, start: float) -> None:
+    """Log the number of attempts and the time a prompt took.
+
+    Args:
+    ----
+        attempt (int): Number of the successful attempt, starting at 1.
+        start (float): ``time.perf_counter`` at the start of the first attempt.
+
+    """
+    logger.info(
+        "Prompt succeeded after %d attempt(s) in %.2fs.",
+        attempt,
+        time.perf_counter() - start,
+    )
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    """Add the duration of the block to a metric, unless the block fails.
+
+    Args:
+    ----
+        name (str): Name of the metric.
+
+    """
+    start = time.perf_counter()
+    yield
+    LLM_METRICS.increment(name, time.perf_counter() - start)
 
 
 def _build_prompt(
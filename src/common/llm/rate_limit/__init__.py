@@ -0,0 +1,3 @@
+"""Rate limiting of LLM requests."""
+
+from common.llm.rate_limit.rate_limit import LLM_RATE_LIMITER, TokenBucket
@@ -0,0 +1,85 @@
+"""Token bucket limiting the calls to the LLM.
+
+The bucket is shared by all LLM calls of the process, so that every call counts,
+including regenerations, retries and output fixes. Its rate and burst are read from
+the environment variables ``AUTO_INSTA_LLM_REQUESTS_PER_MINUTE`` and
+``AUTO_INSTA_LLM_CONCURRENCY``.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the number of requests per minute."""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """Create a full bucket.
+
+        Args:
+        ----
+            requests_per_minute (float): Rate at which tokens are refilled.
+            burst (int, optional): Maximum number of tokens in the bucket. Defaults
+                to 1.
+
+        """
+        self._lock = threading.Lock()
+        self.reset(requests_per_minute=requests_per_minute, burst=burst)
+
+    def acquire(self) -> None:
+        """Take a token out of the bucket, waiting until one is available."""
+        wait_seconds = self._take()
+        while wait_seconds > 0:
+            time.sleep(wait_seconds)
+            wait_seconds = self._take()
+
+    async def aacquire(self) -> None:
+        """Asynchronous version of ``acquire``, which does not block the loop."""
+        wait_seconds = self._take()
+        while wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+            wait_seconds = self._take()
+
+    def reset(self, requests_per_minute: float, burst: int = 1) -> None:
+        """Change the rate and burst and fill the bucket.
+
+        Args:
+        ----
+            requests_per_minute (float): Rate at which tokens are refilled.
+            burst (int, optional): Maximum number of tokens in the bucket. Defaults
+                to 1.
+
+        """
+        with self._lock:
+            self._rate = requests_per_minute / 60
+            self._capacity = burst
+            self._tokens = float(burst)
+            self._updated = time.monotonic()
+
+    def _take(self) -> float:
+        """Take a token out of the bucket if there is one.
+
+        Returns
+        -------
+            float: 0 if a token was taken, otherwise the seconds until the next
+                token is available.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+
+LLM_RATE_LIMITER = TokenBucket(
+    requests_per_minute=float(os.environ.get("AUTO_INSTA_LLM_REQUESTS_PER_MINUTE", 60)),
+    burst=int(os.environ.get("AUTO_INSTA_LLM_CONCURRENCY", 4)),
+)
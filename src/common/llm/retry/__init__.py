@@ -0,0 +1,9 @@
+"""Retry policies for LLM calls."""
+
+from common.llm.retry.retry import (
+    RETRY_BUDGET,
+    RetryBudget,
+    RetryBudgetExhaustedError,
+    backoff_delay,
+    classify_error,
+)
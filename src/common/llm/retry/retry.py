@@ -0,0 +1,145 @@
+"""Error classification, backoff and a global retry budget for LLM calls."""
+
+import logging
+import random
+import threading
+
+import httpx
+import openai
+from langchain_core.exceptions import OutputParserException
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+PARSE = "parse"
+FATAL = "fatal"
+OTHER = "other"
+
+_BASE_DELAY = {RATE_LIMIT: 4.0, TIMEOUT: 1.0, PARSE: 0.0, OTHER: 1.0}
+_MAX_DELAY = 60.0
+
+
+class RetryBudgetExhaustedError(RuntimeError):
+    """Raised when all retries of a run are used up."""
+
+
+class RetryBudget:
+    """Thread-safe number of retries shared by all LLM calls of a run.
+
+    A single failing prompt can otherwise burn through the quota during an upstream
+    outage, as every prompt retries on its own.
+    """
+
+    def __init__(self, max_retries: int = 50):
+        """Create a new budget.
+
+        Args:
+        ----
+            max_retries (int, optional): Number of retries allowed per run. Defaults
+                to 50.
+
+        """
+        self._max_retries = max_retries
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        """Number of retries used in the current run."""
+        return self._used
+
+    def consume(self) -> None:
+        """Take one retry out of the budget.
+
+        Raises
+        ------
+            RetryBudgetExhaustedError: If no retry is left.
+
+        """
+        with self._lock:
+            if self._used >= self._max_retries:
+                raise RetryBudgetExhaustedError(
+                    f"The retry budget of {self._max_retries} retries is exhausted."
+                )
+            self._used += 1
+
+    def reset(self, max_retries: int = None) -> None:
+        """Restore the budget at the start of a run.
+
+        Args:
+        ----
+            max_retries (int, optional): New number of retries allowed per run.
+                Defaults to the current one.
+
+        """
+        with self._lock:
+            self._used = 0
+            if max_retries is not None:
+                self._max_retries = max_retries
+
+
+RETRY_BUDGET = RetryBudget()
+
+
+def classify_error(error: Exception) -> str:
+    """Classify the error of a failed LLM call.
+
+    Args:
+    ----
+        error (Exception): The raised error.
+
+    Returns:
+    -------
+        str: One of ``rate_limit``, ``timeout``, ``parse``, ``fatal`` or ``other``.
+            Fatal errors such as invalid credentials are not worth retrying.
+
+    """
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMIT
+    if isinstance(
+        error,
+        (openai.APITimeoutError, openai.APIConnectionError, httpx.TimeoutException),
+    ):
+        return TIMEOUT
+    if isinstance(error, (OutputParserException, ValueError)):
+        return PARSE
+    if isinstance(
+        error,
+        (
+            openai.AuthenticationError,
+            openai.PermissionDeniedError,
+            openai.BadRequestError,
+            openai.NotFoundError,
+        ),
+    ):
+        return FATAL
+    return OTHER
+
+
+def backoff_delay(attempt: int, error: Exception) -> float:
+    """Compute the jittered exponential delay before the next attempt.
+
+    Rate limit errors wait at least as long as the ``retry-after`` header asks for.
+
+    Args:
+    ----
+        attempt (int): Number of the failed attempt, starting at 1.
+        error (Exception): The raised error.
+
+    Returns:
+    -------
+        float: Seconds to wait.
+
+    """
+    base_delay = _BASE_DELAY.get(classify_error(error), _BASE_DELAY[OTHER])
+    delay = random.uniform(0, min(_MAX_DELAY, base_delay * 2 ** (attempt - 1)))
+
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after")
+    if retry_after is not None:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            logger.debug("Ignoring retry-after header %r.", retry_after)
+    return delay
@@ -0,0 +1,8 @@
+"""Streaming generation with early termination."""
+
+from common.llm.streaming.streaming import (
+    StreamStats,
+    TextFieldWatcher,
+    astream_text_field,
+    stream_text_field,
+)
@@ -0,0 +1,307 @@
+"""Streaming generation which stops as soon as the text is complete or too long.
+
+The texts are small JSON objects like ``{"text": "..."}``. While the tokens come
+in, the value of the text field is scanned incrementally. Generation stops as soon
+as the string closes, so that the model does not keep decoding after the answer, or
+as soon as it exceeds the length limit of the topic, so that a run-on answer is
+rejected without waiting for its end.
+
+Tokens are observed through a callback, which works for chat models streamed via
+``stream``/``astream`` as well as for GPT4All, which reports every token to the
+callbacks while it generates.
+"""
+
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from common.llm.metrics import LLM_METRICS
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+# Closing the text field or exceeding its limit ends the generation.
+CLOSED = "closed"
+TOO_LONG = "too_long"
+
+
+class TextFieldWatcher:
+    """Incrementally scan streamed JSON for the string value of one field.
+
+    Example:
+    -------
+    ::
+
+        >>> watcher = TextFieldWatcher(field="text", max_length=100)
+        >>> watcher.feed('{"text": "Love is')
+        >>> watcher.feed(' patient."}')
+        'closed'
+        >>> watcher.value
+        'Love is patient.'
+
+    """
+
+    def __init__(self, field: str = "text", max_length: Optional[int] = None):
+        """Create a watcher.
+
+        Args:
+        ----
+            field (str, optional): Name of the field. Defaults to "text".
+            max_length (int, optional): Maximum number of characters of the value.
+                Defaults to None, which means no limit.
+
+        """
+        self._key = re.compile(rf'"{re.escape(field)}"\s*:\s*"')
+        self._max_length = max_length
+        self._buffer = ""
+        self._value_start: Optional[int] = None
+        self._position = 0
+        self._escaped = False
+        self._length = 0
+        self.status: Optional[str] = None
+
+    @property
+    def output(self) -> str:
+        """The text streamed so far."""
+        return self._buffer
+
+    @property
+    def value(self) -> Optional[str]:
+        """The decoded value once the field is closed, None before."""
+        if self.status != CLOSED:
+            return None
+        return json.loads(self._buffer[self._value_start - 1 : self._position])
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add the next chunk of the stream.
+
+        Args:
+        ----
+            chunk (str): The chunk.
+
+        Returns:
+        -------
+            Optional[str]: ``closed`` once the value is complete, ``too_long`` once
+                it exceeds the limit, None otherwise.
+
+        """
+        self._buffer += chunk
+        if self.status is not None:
+            return self.status
+
+        if self._value_start is None:
+            match = self._key.search(self._buffer)
+            if match is None:
+                return None
+            self._value_start = self._position = match.end()
+
+        while self._position < len(self._buffer):
+            character = self._buffer[self._position]
+            self._position += 1
+            if self._escaped:
+                self._escaped = False
+            elif character == "\\":
+                self._escaped = True
+                continue
+            elif character == '"':
+                self.status = CLOSED
+                return self.status
+
+            self._length += 1
+            if self._max_length is not None and self._length > self._max_length:
+                self.status = TOO_LONG
+                return self.status
+        return None
+
+
+@dataclass
+class StreamStats:
+    """Timings of a streamed call."""
+
+    time_to_first_token: Optional[float] = None
+    tokens: int = 0
+    seconds: float = 0.0
+    stopped_early: bool = False
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Number of tokens decoded per second after the first one."""
+        decoding_seconds = self.seconds - (self.time_to_first_token or 0.0)
+        if self.tokens < 2 or decoding_seconds <= 0:  # noqa: PLR2004
+            return 0.0
+        return (self.tokens - 1) / decoding_seconds
+
+
+class _StopGenerationError(Exception):
+    """Raised from the callback to end the generation."""
+
+
+class _WatchingCallback(BaseCallbackHandler):
+    """Feed every new token to a watcher and stop the generation when it is done."""
+
+    # Errors have to reach the LLM to stop it, and the callback has to run in the
+    # thread or event loop of the LLM.
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, watcher: TextFieldWatcher, stats: StreamStats, start: float):
+        """Create the callback.
+
+        Args:
+        ----
+            watcher (TextFieldWatcher): Watcher of the text field.
+            stats (StreamStats): Timings of the call, updated in place.
+            start (float): ``time.perf_counter`` at the start of the call.
+
+        """
+        self._watcher = watcher
+        self._stats = stats
+        self._start = start
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:  # noqa: ARG002
+        """Feed the token to the watcher.
+
+        Args:
+        ----
+            token (str): The new token.
+            kwargs (Any): Further arguments of the callback.
+
+        Raises:
+        ------
+            _StopGenerationError: If the text field is closed or too long.
+
+        """
+        if self._stats.time_to_first_token is None:
+            self._stats.time_to_first_token = time.perf_counter() - self._start
+        self._stats.tokens += 1
+        if self._watcher.feed(token) is not None:
+            raise _StopGenerationError
+
+
+def stream_text_field(
+    chain: Runnable,
+    inputs: dict[str, Any],
+    max_length: Optional[int],
+    callbacks: Optional[list[BaseCallbackHandler]] = None,
+) -> str:
+    """Stream the output of the chain until its text field is complete.
+
+    Args:
+    ----
+        chain (Runnable): Chain of prompt, LLM and string output parser.
+        inputs (dict[str, Any]): The inputs to the prompt.
+        max_length (int, optional): Maximum number of characters of the text.
+        callbacks (list[BaseCallbackHandler], optional): Further callbacks of the
+            call. Defaults to None.
+
+    Raises:
+    ------
+        OutputParserException: If the text exceeds ``max_length``.
+
+    Returns:
+    -------
+        str: The output of the LLM, reduced to the text field if it was complete.
+
+    """
+    watcher = TextFieldWatcher(max_length=max_length)
+    stats = StreamStats()
+    start = time.perf_counter()
+    callback = _WatchingCallback(watcher=watcher, stats=stats, start=start)
+    chunks = []
+    try:
+        for chunk in chain.stream(
+            inputs, config={"callbacks": [*(callbacks or []), callback]}
+        ):
+            chunks.append(chunk)
+    except _StopGenerationError:
+        stats.stopped_early = True
+    stats.seconds = time.perf_counter() - start
+    return _finish(watcher=watcher, stats=stats, chunks=chunks)
+
+
+async def astream_text_field(
+    chain: Runnable,
+    inputs: dict[str, Any],
+    max_length: Optional[int],
+    callbacks: Optional[list[BaseCallbackHandler]] = None,
+) -> str:
+    """Asynchronous version of ``stream_text_field``.
+
+    Args:
+    ----
+        chain (Runnable): Chain of prompt, LLM and string output parser.
+        inputs (dict[str, Any]): The inputs to the prompt.
+        max_length (int, optional): Maximum number of characters of the text.
+        callbacks (list[BaseCallbackHandler], optional): Further callbacks of the
+            call. Defaults to None.
+
+    Raises:
+    ------
+        OutputParserException: If the text exceeds ``max_length``.
+
+    Returns:
+    -------
+        str: The output of the LLM, reduced to the text field if it was complete.
+
+    """
+    watcher = TextFieldWatcher(max_length=max_length)
+    stats = StreamStats()
+    start = time.perf_counter()
+    callback = _WatchingCallback(watcher=watcher, stats=stats, start=start)
+    chunks = []
+    try:
+        async for chunk in chain.astream(
+            inputs, config={"callbacks": [*(callbacks or []), callback]}
+        ):
+            chunks.append(chunk)
+    except _StopGenerationError:
+        stats.stopped_early = True
+    stats.seconds = time.perf_counter() - start
+    return _finish(watcher=watcher, stats=stats, chunks=chunks)
+
+
+def _finish(watcher: TextFieldWatcher, stats: StreamStats, chunks: list[str]) -> str:
+    """Record the timings of a streamed call and build its output.
+
+    Args:
+    ----
+        watcher (TextFieldWatcher): Watcher of the text field.
+        stats (StreamStats): Timings of the call.
+        chunks (list[str]): Chunks returned by the chain, used if the LLM did not
+            report its tokens.
+
+    Raises:
+    ------
+        OutputParserException: If the text exceeded the length limit.
+
+    Returns:
+    -------
+        str: The output of the LLM.
+
+    """
+    LLM_METRICS.increment("streamed_calls")
+    LLM_METRICS.increment("streamed_tokens", stats.tokens)
+    LLM_METRICS.increment("streaming_seconds", stats.seconds)
+    LLM_METRICS.increment("time_to_first_token_seconds", stats.time_to_first_token or 0)
+    LLM_METRICS.increment("early_stops", stats.stopped_early)
+    logger.info(
+        "Streamed %d tokens, first after %.2fs, %.1f tokens/s%s.",
+        stats.tokens,
+        stats.time_to_first_token or 0.0,
+        stats.tokens_per_second,
+        ", stopped early" if stats.stopped_early else "",
+    )
+
+    if watcher.status == TOO_LONG:
+        LLM_METRICS.increment("too_long")
+        raise OutputParserException(
+            "The text exceeded the length limit, generation was stopped."
+        )
+    if watcher.status == CLOSED:
+        return json.dumps({"text": watcher.value})
+    return watcher.output or "".join(chunks)
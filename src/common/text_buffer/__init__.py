@@ -0,0 +1,3 @@
+"""Buffers of pre-generated texts per subtopic."""
+
+from common.text_buffer.text_buffer import TEXT_BUFFER, TextBuffer
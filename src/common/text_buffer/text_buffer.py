@@ -0,0 +1,212 @@
+"""Buffers of validated texts which are ready to be posted.
+
+Generating a text puts the latency of the LLM on the critical path of every post.
+The buffer pipelines generate texts ahead of time with batched prompts, and the
+content pipelines take the oldest buffered text of their subtopic. The LLM is only
+called live when the buffer of a subtopic is empty.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import ContextManager, Optional
+
+from common.utilities.sqlite import sqlite_transaction
+
+BUFFER_FILEPATH = "data/02_intermediate/text_buffer.db"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS texts ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "topic TEXT NOT NULL, "
+    "text TEXT NOT NULL, "
+    "created_at REAL NOT NULL, "
+    "leased_at REAL)",
+    "CREATE INDEX IF NOT EXISTS texts_topic ON texts (topic, id)",
+)
+
+
+class TextBuffer:
+    """First-in first-out buffers of texts per topic backed by SQLite in WAL mode.
+
+    Taking a text only leases it, so that a run which fails after taking a text does
+    not lose it. The texts taken by a run are removed by ``commit`` once the run
+    succeeded and made available again by ``release`` if it failed. If the process
+    dies in between, the lease expires and the text is taken again by a later run.
+
+    Example:
+    -------
+    ::
+
+        >>> buffer = TextBuffer()
+        >>> buffer.push("quote.love", ["Love is patient."])
+        >>> buffer.take("quote.love")
+        'Love is patient.'
+        >>> buffer.commit()
+        1
+
+    """
+
+    def __init__(
+        self,
+        filepath: str = BUFFER_FILEPATH,
+        timeout: float = 30.0,
+        lease: float = 3600.0,
+    ):
+        """Create buffers stored at the given path.
+
+        Args:
+        ----
+            filepath (str, optional): The location of the SQLite database. Defaults
+                to BUFFER_FILEPATH.
+            timeout (float, optional): Seconds to wait for the lock of a concurrent
+                writer. Defaults to 30.
+            lease (float, optional): Seconds after which a text that was taken but
+                never committed is available again. Defaults to one hour.
+
+        """
+        self._filepath = Path(filepath)
+        self._timeout = timeout
+        self._lease = lease
+        self._leased_ids: list[int] = []
+        self._lock = threading.Lock()
+
+    def push(self, topic: str, texts: list[str]) -> None:
+        """Append texts to the buffer of a topic.
+
+        Args:
+        ----
+            topic (str): Topic of the texts, for example "quote.love".
+            texts (list[str]): The texts.
+
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO texts (topic, text, created_at) VALUES (?, ?, ?)",
+                [(topic, text, now) for text in texts],
+            )
+
+    def take(self, topic: str) -> Optional[str]:
+        """Lease the oldest available text of a topic.
+
+        Args:
+        ----
+            topic (str): Topic of the text.
+
+        Returns:
+        -------
+            Optional[str]: The text, None if no text of the topic is available.
+
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT id, text FROM texts WHERE topic = ? "
+                "AND (leased_at IS NULL OR leased_at <= ?) ORDER BY id LIMIT 1",
+                (topic, now - self._lease),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE texts SET leased_at = ? WHERE id = ?", (now, row[0])
+            )
+        with self._lock:
+            self._leased_ids.append(row[0])
+        return row[1]
+
+    def commit(self) -> int:
+        """Remove the texts taken by this process.
+
+        Returns
+        -------
+            int: Number of removed texts.
+
+        """
+        return self._end_leases("DELETE FROM texts WHERE id = ?")
+
+    def release(self) -> int:
+        """Make the texts taken by this process available again.
+
+        Returns
+        -------
+            int: Number of released texts.
+
+        """
+        return self._end_leases("UPDATE texts SET leased_at = NULL WHERE id = ?")
+
+    def texts(self, topic: str) -> list[str]:
+        """Return the buffered texts of a topic and its subtopics.
+
+        Args:
+        ----
+            topic (str): Topic, for example "quote" or "quote.love".
+
+        Returns:
+        -------
+            list[str]: The texts, oldest first.
+
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT text FROM texts WHERE topic = ? OR topic LIKE ? ORDER BY id",
+                (topic, f"{topic}.%"),
+            ).fetchall()
+        return [text for (text,) in rows]
+
+    def counts(self, topic: str) -> dict[str, int]:
+        """Count the available texts of a topic and its subtopics.
+
+        Args:
+        ----
+            topic (str): Topic, for example "quote".
+
+        Returns:
+        -------
+            dict[str, int]: Number of texts per topic.
+
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT topic, COUNT(*) FROM texts "
+                "WHERE (topic = ? OR topic LIKE ?) "
+                "AND (leased_at IS NULL OR leased_at <= ?) GROUP BY topic",
+                (topic, f"{topic}.%", time.time() - self._lease),
+            ).fetchall()
+        return dict(rows)
+
+    def _end_leases(self, statement: str) -> int:
+        """Run a statement on every text leased by this process.
+
+        Args:
+        ----
+            statement (str): Statement taking the id of the text.
+
+        Returns:
+        -------
+            int: Number of texts whose lease ended.
+
+        """
+        with self._lock:
+            leased_ids, self._leased_ids = self._leased_ids, []
+        if not leased_ids:
+            return 0
+        with self._transaction() as connection:
+            connection.executemany(statement, [(text_id,) for text_id in leased_ids])
+        return len(leased_ids)
+
+    def _transaction(self) -> ContextManager[sqlite3.Connection]:
+        """Run statements in a transaction holding the write lock from its start.
+
+        Returns
+        -------
+            ContextManager[sqlite3.Connection]: Transaction on the database.
+
+        """
+        return sqlite_transaction(
+            filepath=self._filepath, schema=_SCHEMA, timeout=self._timeout
+        )
+
+
+TEXT_BUFFER = TextBuffer()
@@ -0,0 +1,3 @@
+"""Canvas tools init file."""
+
+from common.utilities.canvas.canvas import clear_canvas_cache, get_canvas
@@ -0,0 +1,154 @@
+"""Memoised base canvases.
+
+Every variant starts from a canvas that only depends on its ``canvas_settings``.
+The base canvas, including its background image or gradient, is built once per
+settings and every post gets a copy of it, which is a single memory copy instead of
+building the image again.
+"""
+
+import ast
+import threading
+from typing import Any, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+_CANVASES: dict[tuple, Image.Image] = {}
+_CANVASES_LOCK = threading.Lock()
+
+
+def get_canvas(canvas_settings: dict[str, Any]) -> Image.Image:
+    """Return a fresh copy of the base canvas for the settings.
+
+    Args:
+    ----
+        canvas_settings (dict[str, Any]): Contains ``image_width``, ``image_length``
+            and ``background_color``, and optionally a ``background_image`` path or a
+            ``gradient`` with ``start_color``, ``end_color`` and ``direction``
+            ("vertical" or "horizontal").
+
+    Returns:
+    -------
+        Image.Image: Canvas which may be drawn on.
+
+    """
+    key = _freeze(canvas_settings)
+    canvas = _CANVASES.get(key)
+    if canvas is None:
+        with _CANVASES_LOCK:
+            canvas = _CANVASES.get(key)
+            if canvas is None:
+                canvas = _CANVASES[key] = _create_base_canvas(canvas_settings)
+    return canvas.copy()
+
+
+def clear_canvas_cache() -> None:
+    """Drop all memoised base canvases."""
+    with _CANVASES_LOCK:
+        _CANVASES.clear()
+
+
+def _create_base_canvas(canvas_settings: dict[str, Any]) -> Image.Image:
+    """Build the base canvas for the settings.
+
+    A background image takes precedence over a gradient, which takes precedence
+    over the plain background color.
+
+    Args:
+    ----
+        canvas_settings (dict[str, Any]): See ``get_canvas``.
+
+    Returns:
+    -------
+        Image.Image: Base canvas.
+
+    """
+    size = (canvas_settings["image_width"], canvas_settings["image_length"])
+
+    if canvas_settings.get("background_image"):
+        with Image.open(canvas_settings["background_image"]) as image:
+            return ImageOps.fit(image.convert("RGB"), size)
+
+    gradient = canvas_settings.get("gradient")
+    if gradient:
+        return _create_gradient(
+            size=size,
+            start_color=_to_rgb(gradient["start_color"]),
+            end_color=_to_rgb(gradient["end_color"]),
+            direction=gradient.get("direction", "vertical"),
+        )
+
+    return Image.new("RGB", size, _to_rgb(canvas_settings["background_color"]))
+
+
+def _create_gradient(
+    size: tuple[int, int],
+    start_color: tuple[int, int, int],
+    end_color: tuple[int, int, int],
+    direction: str,
+) -> Image.Image:
+    """Create a linear gradient between two colors.
+
+    Args:
+    ----
+        size (tuple[int, int]): Width and height of the canvas.
+        start_color (tuple[int, int, int]): Color at the top or left edge.
+        end_color (tuple[int, int, int]): Color at the bottom or right edge.
+        direction (str): Either "vertical" or "horizontal".
+
+    Returns:
+    -------
+        Image.Image: Gradient canvas.
+
+    """
+    width, height = size
+    if direction == "vertical":
+        steps, shape = height, (height, 1, 1)
+    elif direction == "horizontal":
+        steps, shape = width, (1, width, 1)
+    else:
+        raise ValueError(f"Unknown gradient direction: {direction}")
+
+    weights = np.linspace(0.0, 1.0, steps).reshape(shape)
+    colors = (1 - weights) * np.array(start_color) + weights * np.array(end_color)
+    array = np.broadcast_to(colors, (height, width, 3)).round().astype(np.uint8)
+    return Image.fromarray(array, "RGB")
+
+
+def _to_rgb(color: Union[int, str, list, tuple]) -> tuple[int, int, int]:
+    """Convert a color from the parameters to an RGB tuple.
+
+    Args:
+    ----
+        color (Union[int, str, list, tuple]): A grey value, an RGB sequence or its
+            string representation such as "(0, 0, 0)".
+
+    Returns:
+    -------
+        tuple[int, int, int]: RGB color.
+
+    """
+    if isinstance(color, str):
+        color = ast.literal_eval(color)
+    if isinstance(color, int):
+        return (color, color, color)
+    return tuple(color)
+
+
+def _freeze(value: Any) -> Any:
+    """Turn nested parameters into a hashable key.
+
+    Args:
+    ----
+        value (Any): Parameters, possibly containing dictionaries and lists.
+
+    Returns:
+    -------
+        Any: Hashable equivalent of the parameters.
+
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
@@ -0,0 +1,7 @@
+"""File tools init file."""
+
+from common.utilities.files.files import (
+    open_atomically,
+    temporary_file,
+    write_atomically,
+)
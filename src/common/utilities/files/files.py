@@ -0,0 +1,73 @@
+"""Atomic and temporary files shared by the caches, pools and the publisher."""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+
+@contextmanager
+def open_atomically(filepath: Path, mode: str = "w") -> Iterator[IO]:
+    """Open a file whose content only replaces the file once it was fully written.
+
+    The content is written to a temporary file next to ``filepath``, which is named
+    after the writing thread and moved over ``filepath`` at the end. Readers
+    therefore never see a partial file, and concurrent writers never share a
+    temporary file. The temporary file is removed if writing fails.
+
+    Args:
+    ----
+        filepath (Path): Path of the file.
+        mode (str): ``"w"`` for text or ``"wb"`` for bytes.
+
+    Yields:
+    ------
+        IO: The opened temporary file.
+
+    """
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    temporary_filepath = filepath.with_suffix(f".{threading.get_ident()}.tmp")
+    try:
+        with temporary_filepath.open(mode) as file:
+            yield file
+        os.replace(temporary_filepath, filepath)
+    finally:
+        temporary_filepath.unlink(missing_ok=True)
+
+
+def write_atomically(filepath: Path, text: str) -> None:
+    """Write a text file atomically.
+
+    Args:
+    ----
+        filepath (Path): Path of the file.
+        text (str): Content of the file.
+
+    """
+    with open_atomically(filepath) as file:
+        file.write(text)
+
+
+@contextmanager
+def temporary_file(data: bytes, suffix: str) -> Iterator[Path]:
+    """Write the data to a unique temporary file, which is removed afterwards.
+
+    Args:
+    ----
+        data (bytes): Content of the file.
+        suffix (str): File extension.
+
+    Yields:
+    ------
+        Path: Path of the file.
+
+    """
+    file_descriptor, temp_path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(file_descriptor, "wb") as f:
+            f.write(data)
+        yield Path(temp_path)
+    finally:
+        os.remove(temp_path)
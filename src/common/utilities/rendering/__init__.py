@@ -0,0 +1,7 @@
+"""Rendering tools init file."""
+
+from common.utilities.rendering.rendering import (
+    draw_text,
+    render_images,
+    render_images_to_files,
+)
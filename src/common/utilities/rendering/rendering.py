@@ -0,0 +1,310 @@
+"""Drawing of texts on canvases, one post at a time or in batches.
+
+The batch functions spread the posts over a process pool. Fonts are sent to every
+worker once when it starts, and every worker keeps its own base canvases and
+measurement caches, so a post only costs a canvas copy and the drawing itself.
+Images are sent back to the parent as raw pixels, which is why
+``render_images_to_files`` saves the images in the workers instead.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from common.utilities.canvas import get_canvas
+from common.utilities.text_tools import calc_total_text_width_height, get_text_measurer
+from PIL import Image, ImageDraw, ImageFont
+
+# Fonts of a worker process of the pool, indexed like the fonts of the batch.
+_WORKER_FONTS: list[ImageFont.FreeTypeFont] = []
+
+
+def draw_text(
+    image: Image.Image,
+    text_dictionary: dict[str, ImageFont.FreeTypeFont],
+    font_color: tuple[int, int, int],
+) -> Image.Image:
+    """Draw the lines of text centred on the image.
+
+    Args:
+    ----
+        image (Image.Image): Image on which the text is drawn, in place.
+        text_dictionary (dict[str, ImageFont.FreeTypeFont]): Dictionary containing the
+            lines of text and the font used for every line.
+        font_color (tuple[int, int, int]): Color of the text.
+
+    Returns:
+    -------
+        Image.Image: Image with the text placed on it.
+
+    """
+    draw = ImageDraw.Draw(image)
+
+    # Calculate the starting y-coordinate to center the text vertically.
+    _, total_height = calc_total_text_width_height(text_dictionary=text_dictionary)
+    y_start = (image.height - total_height) // 2
+
+    # Draw each line of text.
+    for text, font in text_dictionary.items():
+        text_width, text_height = get_text_measurer(font).bbox(text)
+        x = (image.width - text_width) // 2
+        draw.text((x, y_start), text, font=font, fill=font_color)
+        y_start += text_height  # Move down for the next line
+
+    return image
+
+
+def render_images(
+    text_dictionaries: Iterable[dict[str, ImageFont.FreeTypeFont]],
+    canvas_settings: dict[str, Any],
+    font_color: tuple[int, int, int],
+    max_workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Iterator[Image.Image]:
+    """Render many posts, yielding the images in the order of the texts.
+
+    Args:
+    ----
+        text_dictionaries (Iterable[dict[str, ImageFont.FreeTypeFont]]): Text
+            dictionaries as created by ``create_text_dictionary``.
+        canvas_settings (dict[str, Any]): Settings of the canvas, see ``get_canvas``.
+        font_color (tuple[int, int, int]): Color of the text.
+        max_workers (int, optional): Number of processes. With 1 the posts are
+            rendered in the current process. Defaults to the number of cores.
+        chunksize (int, optional): Number of posts sent to a worker at once.
+            Defaults to 16.
+
+    Returns:
+    -------
+        Iterator[Image.Image]: The rendered images.
+
+    """
+    fonts, tasks = _prepare_batch(text_dictionaries=text_dictionaries, filepaths=None)
+    return _render_batch(
+        fonts=fonts,
+        tasks=tasks,
+        canvas_settings=canvas_settings,
+        font_color=font_color,
+        save_kwargs={},
+        max_workers=max_workers,
+        chunksize=chunksize,
+    )
+
+
+def render_images_to_files(  # noqa: PLR0913
+    text_dictionaries: Iterable[dict[str, ImageFont.FreeTypeFont]],
+    filepaths: Iterable[str],
+    canvas_settings: dict[str, Any],
+    font_color: tuple[int, int, int],
+    save_kwargs: Optional[dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Iterator[str]:
+    """Render many posts and save them, yielding the paths once they are written.
+
+    The filepaths are checked against the texts right away, not on the first image.
+
+    Args:
+    ----
+        text_dictionaries (Iterable[dict[str, ImageFont.FreeTypeFont]]): Text
+            dictionaries as created by ``create_text_dictionary``.
+        filepaths (Iterable[str]): Path of every image, the format follows from the
+            extension.
+        canvas_settings (dict[str, Any]): Settings of the canvas, see ``get_canvas``.
+        font_color (tuple[int, int, int]): Color of the text.
+        save_kwargs (dict[str, Any], optional): Keyword arguments of
+            ``Image.save``, for example ``compress_level``. Defaults to None.
+        max_workers (int, optional): Number of processes. With 1 the posts are
+            rendered in the current process. Defaults to the number of cores.
+        chunksize (int, optional): Number of posts sent to a worker at once.
+            Defaults to 16.
+
+    Raises:
+    ------
+        ValueError: If the number of filepaths differs from the number of texts.
+
+    Returns:
+    -------
+        Iterator[str]: The paths of the saved images.
+
+    """
+    fonts, tasks = _prepare_batch(
+        text_dictionaries=text_dictionaries, filepaths=filepaths
+    )
+    return _render_batch(
+        fonts=fonts,
+        tasks=tasks,
+        canvas_settings=canvas_settings,
+        font_color=font_color,
+        save_kwargs=save_kwargs or {},
+        max_workers=max_workers,
+        chunksize=chunksize,
+    )
+
+
+def _prepare_batch(
+    text_dictionaries: Iterable[dict[str, ImageFont.FreeTypeFont]],
+    filepaths: Optional[Iterable[str]],
+) -> tuple[list[ImageFont.FreeTypeFont], list[tuple[list[tuple[str, int]], Any]]]:
+    """Replace the fonts of the posts by their position in a list of distinct fonts.
+
+    The list is sent to every worker once instead of pickling the fonts per post.
+
+    Args:
+    ----
+        text_dictionaries (Iterable[dict[str, ImageFont.FreeTypeFont]]): Text
+            dictionaries of the posts.
+        filepaths (Iterable[str], optional): Paths to save the images at, or None to
+            return the images.
+
+    Raises:
+    ------
+        ValueError: If the number of filepaths differs from the number of texts.
+
+    Returns:
+    -------
+        tuple[list[ImageFont.FreeTypeFont], list[tuple[list[tuple[str, int]], Any]]]:
+            The distinct fonts, and the lines with the position of their font and
+            the path of every post.
+
+    """
+    fonts: list[ImageFont.FreeTypeFont] = []
+    font_positions: dict[int, int] = {}
+    posts = []
+    for text_dictionary in text_dictionaries:
+        lines = []
+        for text, font in text_dictionary.items():
+            if id(font) not in font_positions:
+                font_positions[id(font)] = len(fonts)
+                fonts.append(font)
+            lines.append((text, font_positions[id(font)]))
+        posts.append(lines)
+
+    if filepaths is None:
+        return fonts, [(lines, None) for lines in posts]
+
+    filepaths = list(filepaths)
+    if len(filepaths) != len(posts):
+        raise ValueError(
+            f"Got {len(filepaths)} filepaths for {len(posts)} text dictionaries."
+        )
+    return fonts, list(zip(posts, filepaths))
+
+
+def _render_batch(  # noqa: PLR0913
+    fonts: list[ImageFont.FreeTypeFont],
+    tasks: list[tuple[list[tuple[str, int]], Any]],
+    canvas_settings: dict[str, Any],
+    font_color: tuple[int, int, int],
+    save_kwargs: dict[str, Any],
+    max_workers: Optional[int],
+    chunksize: int,
+) -> Iterator:
+    """Render the posts in the current process or in a process pool.
+
+    Args:
+    ----
+        fonts (list[ImageFont.FreeTypeFont]): Distinct fonts of the batch.
+        tasks (list[tuple[list[tuple[str, int]], Any]]): Lines and path per post.
+        canvas_settings (dict[str, Any]): Settings of the canvas.
+        font_color (tuple[int, int, int]): Color of the text.
+        save_kwargs (dict[str, Any]): Keyword arguments of ``Image.save``.
+        max_workers (int, optional): Number of processes.
+        chunksize (int): Number of posts sent to a worker at once.
+
+    Yields:
+    ------
+        Image.Image | str: The images or the paths of the saved images.
+
+    """
+    arguments = (canvas_settings, font_color, save_kwargs)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _render_post(task, fonts, *arguments)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_initialize_worker, initargs=(fonts,)
+    ) as executor:
+        yield from executor.map(
+            _render_post_in_worker,
+            tasks,
+            *([argument] * len(tasks) for argument in arguments),
+            chunksize=chunksize,
+        )
+
+
+def _initialize_worker(fonts: list[ImageFont.FreeTypeFont]) -> None:
+    """Keep the fonts of the batch in the worker process.
+
+    Args:
+    ----
+        fonts (list[ImageFont.FreeTypeFont]): Distinct fonts of the batch.
+
+    """
+    _WORKER_FONTS[:] = fonts
+
+
+def _render_post_in_worker(
+    task: tuple[list[tuple[str, int]], Optional[str]],
+    canvas_settings: dict[str, Any],
+    font_color: tuple[int, int, int],
+    save_kwargs: dict[str, Any],
+) -> Any:
+    """Render a single post with the fonts kept by ``_initialize_worker``.
+
+    Args:
+    ----
+        task (tuple[list[tuple[str, int]], Optional[str]]): Lines with the position of
+            their font, and the path to save the image at.
+        canvas_settings (dict[str, Any]): Settings of the canvas.
+        font_color (tuple[int, int, int]): Color of the text.
+        save_kwargs (dict[str, Any]): Keyword arguments of ``Image.save``.
+
+    Returns:
+    -------
+        Image.Image | str: The image, or its path once it is saved.
+
+    """
+    return _render_post(task, _WORKER_FONTS, canvas_settings, font_color, save_kwargs)
+
+
+def _render_post(
+    task: tuple[list[tuple[str, int]], Optional[str]],
+    fonts: list[ImageFont.FreeTypeFont],
+    canvas_settings: dict[str, Any],
+    font_color: tuple[int, int, int],
+    save_kwargs: dict[str, Any],
+) -> Any:
+    """Render a single post of a batch.
+
+    Args:
+    ----
+        task (tuple[list[tuple[str, int]], Optional[str]]): Lines with the position of
+            their font, and the path to save the image at.
+        fonts (list[ImageFont.FreeTypeFont]): Distinct fonts of the batch.
+        canvas_settings (dict[str, Any]): Settings of the canvas.
+        font_color (tuple[int, int, int]): Color of the text.
+        save_kwargs (dict[str, Any]): Keyword arguments of ``Image.save``.
+
+    Returns:
+    -------
+        Image.Image | str: The image, or its path once it is saved.
+
+    """
+    lines, filepath = task
+    text_dictionary = {text: fonts[position] for text, position in lines}
+    image = draw_text(
+        image=get_canvas(canvas_settings),
+        text_dictionary=text_dictionary,
+        font_color=font_color,
+    )
+    if filepath is None:
+        return image
+
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    image.save(filepath, **save_kwargs)
+    return filepath
@@ -0,0 +1,3 @@
+"""SQLite tools init file."""
+
+from common.utilities.sqlite.sqlite import sqlite_transaction
@@ -0,0 +1,47 @@
+"""Transactions on the SQLite databases backing the queues and buffers."""
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+@contextmanager
+def sqlite_transaction(
+    filepath: Path, schema: Iterable[str], timeout: float = 30.0
+) -> Iterator[sqlite3.Connection]:
+    """Run statements in a transaction holding the write lock from its start.
+
+    Taking the write lock before the first read makes sure that two processes never
+    claim the same row. The database runs in WAL mode, so that readers are not
+    blocked by the writer, and the statements of ``schema`` create the tables on
+    first use.
+
+    Args:
+    ----
+        filepath (Path): The location of the SQLite database.
+        schema (Iterable[str]): ``CREATE ... IF NOT EXISTS`` statements.
+        timeout (float, optional): Seconds to wait for the lock of a concurrent
+            writer. Defaults to 30.
+
+    Yields:
+    ------
+        sqlite3.Connection: Connection to the database.
+
+    """
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(filepath, timeout=timeout, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in schema:
+            connection.execute(statement)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
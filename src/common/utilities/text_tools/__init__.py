@@ -1,7 +1,14 @@
 """Text tools init file."""
 
+from common.utilities.text_tools.measurement import (
+    TextMeasurer,
+    get_sized_font,
+    get_text_measurer,
+)
 from common.utilities.text_tools.text_tools import (
+    break_lines_by_width,
     calc_total_text_width_height,
     calculate_max_line_length,
+    fit_text_to_box,
     introduce_line_breaks,
 )
@@ -0,0 +1,245 @@
+"""Cached text measurement based on per-font glyph tables.
+
+Measuring a text through Pillow runs a FreeType layout for every call. Posts are
+measured over and over again with the same font, so the advance of every glyph and
+the kerning of every glyph pair are looked up once and cached per font. The width of
+a line then is a vectorised sum over those tables.
+
+Fonts of other sizes are derived from a loaded font once and kept as well, so that
+fitting a text to the canvas does not reopen the font file for every candidate size.
+"""
+
+import operator
+import string
+import threading
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Measuring does not depend on the size of the image that is drawn on.
+_SCRATCH_DRAW = ImageDraw.Draw(Image.new(mode="L", size=(1, 1)))
+
+
+class TextMeasurer:
+    """Measure texts set in one font.
+
+    Example:
+    -------
+    ::
+
+        >>> measurer = get_text_measurer(font)
+        >>> measurer.width("Love is patient.")
+        >>> measurer.line_widths(["Love is", "patient."])
+
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, cache_size: int = 65_536):
+        """Create a measurer and precompute the advances of printable ASCII glyphs.
+
+        Args:
+        ----
+            font (ImageFont.FreeTypeFont): Font the texts are set in.
+            cache_size (int, optional): Number of bounding boxes kept in the LRU
+                cache. Defaults to 65536.
+
+        """
+        self._font = font
+        self._advances: dict[str, float] = {}
+        self._kerning: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.bbox = lru_cache(maxsize=cache_size)(self._bbox)
+        self._glyph_advances(string.printable)
+
+    @property
+    def font(self) -> ImageFont.FreeTypeFont:
+        """Font the texts are set in."""
+        return self._font
+
+    def advances(self, text: str) -> np.ndarray:
+        """Return the advance of every character including the kerning before it.
+
+        Args:
+        ----
+            text (str): Text to measure.
+
+        Returns:
+        -------
+            np.ndarray: Advance in pixels per character.
+
+        """
+        advances = self._glyph_advances(text)
+        if len(text) > 1:
+            advances[1:] += self._pair_kerning(text)
+        return advances
+
+    def width(self, text: str) -> float:
+        """Return the advance width of a text.
+
+        Args:
+        ----
+            text (str): Text to measure.
+
+        Returns:
+        -------
+            float: Width in pixels.
+
+        """
+        return float(self.advances(text).sum())
+
+    def line_widths(self, lines: list[str]) -> np.ndarray:
+        """Return the advance widths of many lines at once.
+
+        Args:
+        ----
+            lines (list[str]): Lines to measure.
+
+        Returns:
+        -------
+            np.ndarray: Width in pixels per line.
+
+        """
+        widths = np.zeros(len(lines))
+        non_empty = [position for position, line in enumerate(lines) if line]
+        if not non_empty:
+            return widths
+
+        advances = np.concatenate([self.advances(lines[i]) for i in non_empty])
+        starts = np.cumsum([0] + [len(lines[i]) for i in non_empty[:-1]])
+        widths[non_empty] = np.add.reduceat(advances, starts)
+        return widths
+
+    def _bbox(self, text: str) -> tuple[int, int]:
+        """Return the right and bottom edge of the text drawn at the origin.
+
+        This matches ``ImageDraw.textbbox`` exactly and is cached by ``bbox``.
+
+        Args:
+        ----
+            text (str): Text to measure.
+
+        Returns:
+        -------
+            tuple[int, int]: Width and height of the text.
+
+        """
+        _, _, width, height = _SCRATCH_DRAW.textbbox((0, 0), text=text, font=self._font)
+        return width, height
+
+    def _glyph_advances(self, text: str) -> np.ndarray:
+        """Look up the advance of every character, measuring unknown glyphs once.
+
+        Args:
+        ----
+            text (str): Text whose characters are looked up.
+
+        Returns:
+        -------
+            np.ndarray: Advance in pixels per character.
+
+        """
+        missing = set(text) - self._advances.keys()
+        if missing:
+            with self._lock:
+                for character in missing:
+                    self._advances[character] = self._font.getlength(character)
+        return np.array(list(map(self._advances.__getitem__, text)), dtype=np.float64)
+
+    def _pair_kerning(self, text: str) -> np.ndarray:
+        """Look up the kerning of every pair of neighbouring characters.
+
+        Args:
+        ----
+            text (str): Text whose pairs are looked up.
+
+        Returns:
+        -------
+            np.ndarray: Kerning in pixels per pair.
+
+        """
+        pairs = list(map(operator.add, text, text[1:]))
+        missing = set(pairs) - self._kerning.keys()
+        if missing:
+            with self._lock:
+                for pair in missing:
+                    self._kerning[pair] = (
+                        self._font.getlength(pair)
+                        - self._advances[pair[0]]
+                        - self._advances[pair[1]]
+                    )
+        return np.array(list(map(self._kerning.__getitem__, pairs)), dtype=np.float64)
+
+
+_MEASURERS: dict[tuple, TextMeasurer] = {}
+_MEASURERS_LOCK = threading.Lock()
+
+
+def get_text_measurer(font: ImageFont.FreeTypeFont) -> TextMeasurer:
+    """Return the measurer of a font, creating it on first use.
+
+    Fonts loaded from the same file with the same size share one measurer.
+
+    Args:
+    ----
+        font (ImageFont.FreeTypeFont): Font the texts are set in.
+
+    Returns:
+    -------
+        TextMeasurer: Measurer of the font.
+
+    """
+    key = _font_key(font)
+    measurer = _MEASURERS.get(key)
+    if measurer is None:
+        with _MEASURERS_LOCK:
+            measurer = _MEASURERS.get(key)
+            if measurer is None:
+                measurer = _MEASURERS[key] = TextMeasurer(font)
+    return measurer
+
+
+_SIZED_FONTS: dict[tuple, ImageFont.FreeTypeFont] = {}
+_SIZED_FONTS_LOCK = threading.Lock()
+
+
+def get_sized_font(font: ImageFont.FreeTypeFont, size: int) -> ImageFont.FreeTypeFont:
+    """Return the font in another size, creating it on first use.
+
+    Args:
+    ----
+        font (ImageFont.FreeTypeFont): Font of any size.
+        size (int): Requested size.
+
+    Returns:
+    -------
+        ImageFont.FreeTypeFont: The font in the requested size.
+
+    """
+    if font.size == size:
+        return font
+
+    path, _, index, layout_engine = _font_key(font)
+    key = (path, size, index, layout_engine)
+    sized_font = _SIZED_FONTS.get(key)
+    if sized_font is None:
+        with _SIZED_FONTS_LOCK:
+            sized_font = _SIZED_FONTS.get(key)
+            if sized_font is None:
+                sized_font = _SIZED_FONTS[key] = font.font_variant(size=size)
+    return sized_font
+
+
+def _font_key(font: ImageFont.FreeTypeFont) -> tuple:
+    """Identify a font by its file, size, face and layout engine.
+
+    Args:
+    ----
+        font (ImageFont.FreeTypeFont): The font.
+
+    Returns:
+    -------
+        tuple: Hashable key of the font.
+
+    """
+    path = font.path if isinstance(font.path, (str, bytes)) else id(font)
+    return (path, font.size, font.index, font.layout_engine)
@@ -1,6 +1,14 @@
 """Text tools functions."""
 
-from PIL import Image, ImageDraw, ImageFont
+import bisect
+
+import numpy as np
+from common.utilities.text_tools.measurement import (
+    TextMeasurer,
+    get_sized_font,
+    get_text_measurer,
+)
+from PIL import ImageFont
 
 
 def calculate_max_line_length(
@@ -52,6 +60,269 @@ def introduce_line_breaks(text: str, max_line_length: int) -> str:
     return lines
 
 
+def break_lines_by_width(
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    max_width: float,
+    balanced: bool = False,
+) -> list[str]:
+    """Break the text into lines which fit within the given pixel width.
+
+    The widths come from the cumulative glyph advances of the text, so every break
+    point is found with a binary search over a prefix sum instead of laying out the
+    candidate lines. Words longer than a line are split between characters.
+
+    Args:
+    ----
+        text (str): Text that needs to be broken into lines.
+        font (ImageFont.FreeTypeFont): Font used for the text.
+        max_width (float): Maximum width of a line in pixels.
+        balanced (bool, optional): Whether to minimise the raggedness of all lines,
+            in the manner of Knuth-Plass, instead of filling lines greedily.
+            Defaults to False.
+
+    Returns:
+    -------
+        list[str]: The lines, each followed by a space like ``introduce_line_breaks``.
+
+    """
+    words = text.split()
+    if not words:
+        return [""]
+
+    measurer = get_text_measurer(font)
+    cumulative, starts, ends = _prefix_sums(words=words, measurer=measurer)
+    too_wide = set(np.flatnonzero(cumulative[ends] - cumulative[starts] > max_width))
+    if too_wide:
+        words = [
+            chunk
+            for position, word in enumerate(words)
+            for chunk in (
+                _split_long_word(word=word, measurer=measurer, max_width=max_width)
+                if position in too_wide
+                else [word]
+            )
+        ]
+        cumulative, starts, ends = _prefix_sums(words=words, measurer=measurer)
+
+    if balanced:
+        breaks = _balanced_breaks(
+            starts=cumulative[starts], ends=cumulative[ends], max_width=max_width
+        )
+    else:
+        breaks = _greedy_breaks(
+            starts=cumulative[starts], ends=cumulative[ends], max_width=max_width
+        )
+
+    return [
+        " ".join(words[first:last]) + " "
+        for first, last in zip(breaks[:-1], breaks[1:])
+    ]
+
+
+def fit_text_to_box(  # noqa: PLR0913
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    max_width: float,
+    max_height: float,
+    min_fontsize: int,
+    max_fontsize: int,
+    balanced: bool = False,
+) -> tuple[list[str], ImageFont.FreeTypeFont]:
+    """Find the largest font size whose wrapped text fits within the box.
+
+    The sizes are searched with a binary search. Every candidate size is derived
+    from ``font`` once and measured through its cached ``TextMeasurer``, so fitting
+    costs a handful of cached measurements. If not even ``min_fontsize`` fits, the
+    text is set in ``min_fontsize``.
+
+    Args:
+    ----
+        text (str): Text that needs to be fitted.
+        font (ImageFont.FreeTypeFont): Font used for the text, in any size.
+        max_width (float): Maximum width of a line in pixels.
+        max_height (float): Maximum height of all lines in pixels.
+        min_fontsize (int): Smallest allowed font size.
+        max_fontsize (int): Largest allowed font size.
+        balanced (bool, optional): Whether lines are balanced instead of filled
+            greedily, see ``break_lines_by_width``. Defaults to False.
+
+    Returns:
+    -------
+        tuple[list[str], ImageFont.FreeTypeFont]: The lines and the font in the
+            fitting size.
+
+    """
+    best_lines, best_font = None, None
+    low, high = min_fontsize, max_fontsize
+    while low <= high:
+        size = (low + high) // 2
+        sized_font = get_sized_font(font, size)
+        lines = break_lines_by_width(
+            text=text, font=sized_font, max_width=max_width, balanced=balanced
+        )
+        if _fits_in_box(
+            lines=lines, font=sized_font, max_width=max_width, max_height=max_height
+        ):
+            best_lines, best_font = lines, sized_font
+            low = size + 1
+        else:
+            high = size - 1
+
+    if best_font is None:
+        best_font = get_sized_font(font, min_fontsize)
+        best_lines = break_lines_by_width(
+            text=text, font=best_font, max_width=max_width, balanced=balanced
+        )
+    return best_lines, best_font
+
+
+def _fits_in_box(
+    lines: list[str], font: ImageFont.FreeTypeFont, max_width: float, max_height: float
+) -> bool:
+    """Check whether the lines fit within the box once drawn.
+
+    The lines are measured the way ``apply_text_on_image`` draws them, including the
+    trailing blank line.
+
+    Args:
+    ----
+        lines (list[str]): Lines of the text.
+        font (ImageFont.FreeTypeFont): Font used for the text.
+        max_width (float): Maximum width of a line in pixels.
+        max_height (float): Maximum height of all lines in pixels.
+
+    Returns:
+    -------
+        bool: Whether the lines fit.
+
+    """
+    measurer = get_text_measurer(font)
+    sizes = [measurer.bbox(line) for line in [*lines, " "]]
+    return (
+        max(width for width, _ in sizes) <= max_width
+        and sum(height for _, height in sizes) <= max_height
+    )
+
+
+def _prefix_sums(
+    words: list[str], measurer: TextMeasurer
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Compute the cumulative advances of the words joined by single spaces.
+
+    Args:
+    ----
+        words (list[str]): Words of the text.
+        measurer (TextMeasurer): Measurer of the font.
+
+    Returns:
+    -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The cumulative width before every
+            character of the joined text, and the character position of the start
+            and the end of every word.
+
+    """
+    cumulative = np.concatenate([[0.0], np.cumsum(measurer.advances(" ".join(words)))])
+    lengths = np.array(list(map(len, words)))
+    ends = np.cumsum(lengths + 1) - 1
+    return cumulative, ends - lengths, ends
+
+
+def _split_long_word(word: str, measurer: TextMeasurer, max_width: float) -> list[str]:
+    """Split a word which is wider than a line into chunks that fit.
+
+    Args:
+    ----
+        word (str): The word.
+        measurer (TextMeasurer): Measurer of the font.
+        max_width (float): Maximum width of a line in pixels.
+
+    Returns:
+    -------
+        list[str]: The chunks of the word.
+
+    """
+    cumulative = np.cumsum(measurer.advances(word))
+    chunks = []
+    start, offset = 0, 0.0
+    while start < len(word):
+        end = int(np.searchsorted(cumulative, offset + max_width, side="right"))
+        end = max(end, start + 1)
+        chunks.append(word[start:end])
+        offset = cumulative[end - 1]
+        start = end
+    return chunks
+
+
+def _greedy_breaks(starts: np.ndarray, ends: np.ndarray, max_width: float) -> list[int]:
+    """Fill every line with as many words as fit.
+
+    Args:
+    ----
+        starts (np.ndarray): Cumulative width at the start of every word.
+        ends (np.ndarray): Cumulative width at the end of every word.
+        max_width (float): Maximum width of a line in pixels.
+
+    Returns:
+    -------
+        list[int]: Index of the first word of every line, followed by the number of
+            words.
+
+    """
+    # Lines hold a handful of words, bisecting lists beats numpy's call overhead.
+    starts, ends = starts.tolist(), ends.tolist()
+    breaks = [0]
+    while breaks[-1] < len(starts):
+        first = breaks[-1]
+        last = bisect.bisect_right(ends, starts[first] + max_width)
+        breaks.append(max(last, first + 1))
+    return breaks
+
+
+def _balanced_breaks(
+    starts: np.ndarray, ends: np.ndarray, max_width: float
+) -> list[int]:
+    """Choose the breaks minimising the squared slack of all lines but the last.
+
+    Args:
+    ----
+        starts (np.ndarray): Cumulative width at the start of every word.
+        ends (np.ndarray): Cumulative width at the end of every word.
+        max_width (float): Maximum width of a line in pixels.
+
+    Returns:
+    -------
+        list[int]: Index of the first word of every line, followed by the number of
+            words.
+
+    """
+    n_words = len(starts)
+    # widths[i, j] is the width of the line holding the words i to j.
+    widths = ends[None, :] - starts[:, None]
+    slack = max_width - widths
+    costs = np.where(slack >= 0, slack**2, np.inf)
+    costs[np.tril_indices(n_words, k=-1)] = np.inf
+    costs[:, -1] = np.where(slack[:, -1] >= 0, 0.0, np.inf)
+    # A line holding a single word is always allowed, so that a break is found.
+    single_word_costs = np.diag(costs).copy()
+    single_word_costs[np.isinf(single_word_costs)] = 0.0
+    np.fill_diagonal(costs, single_word_costs)
+
+    best = np.full(n_words + 1, np.inf)
+    best[n_words] = 0.0
+    next_break = np.full(n_words, n_words)
+    for first in range(n_words - 1, -1, -1):
+        totals = costs[first, first:] + best[first + 1 :]
+        position = int(np.argmin(totals))
+        best[first] = totals[position]
+        next_break[first] = first + position + 1
+
+    breaks = [0]
+    while breaks[-1] < n_words:
+        breaks.append(int(next_break[breaks[-1]]))
+    return breaks
+
+
 def calc_total_text_width_height(
     text_dictionary: dict[str, ImageFont.FreeTypeFont],
 ) -> tuple[int, int]:
@@ -78,6 +349,8 @@ def calc_total_text_width_height(
 def _calc_text_width_height(text: str, font: ImageFont.FreeTypeFont) -> tuple[int, int]:
     """Calculate the width and height of the text.
 
+    The measurement is cached per font and text, see ``TextMeasurer``.
+
     Args:
     ----
         text (str): Text whose size needs to be calculated.
@@ -88,10 +361,7 @@ def _calc_text_width_height(text: str, font: ImageFont.FreeTypeFont) -> tuple[in
         tuple[int, int]: Width and height of the text.
 
     """
-    im = Image.new(mode="P", size=(0, 0))
-    draw = ImageDraw.Draw(im)
-    _, _, width, height = draw.textbbox((0, 0), text=text, font=font)
-    return width, height
+    return get_text_measurer(font).bbox(text)
 
 
 def _adjust_output_parser_key(output_parser_key: str) -> str:
@@ -0,0 +1,3 @@
+"""Token tools init file."""
+
+from common.utilities.tokens.tokens import estimate_tokens
@@ -0,0 +1,18 @@
+"""Estimation of the tokens of texts sent to and received from the LLMs."""
+
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text, roughly four characters per token.
+
+    Args:
+    ----
+        text (str): Text whose tokens are counted.
+
+    Returns:
+    -------
+        int: Estimated number of tokens.
+
+    """
+    return math.ceil(len(text) / 4) + 1
@@ -1,8 +1,9 @@
 """Dataset for fonts."""
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import numpy as np
+from common.utilities.text_tools import get_sized_font
 from kedro.io import AbstractDataset
 from PIL import ImageFont
 
@@ -18,17 +19,26 @@ class FontDataset(AbstractDataset[np.ndarray, np.ndarray]):
 
     """
 
-    def __init__(self, filepath: str, fontsize: int):
+    def __init__(
+        self,
+        filepath: str,
+        fontsize: int,
+        preload_size_range: Optional[tuple[int, int]] = None,
+    ):
         """Create a new instance of FontDataset to load / save filepath.
 
         Args:
         ----
             filepath: The location of the font file to load / save data.
             fontsize: The size of the font.
+            preload_size_range: Smallest and largest size, inclusive, of the font
+                which are created on load, so that fitting texts to the canvas finds
+                every size in the font cache.
 
         """
         self._filepath = filepath
         self._fontsize = fontsize
+        self._preload_size_range = preload_size_range
 
     def _load(self) -> ImageFont.FreeTypeFont:
         """Load data from the image file.
@@ -38,7 +48,12 @@ class FontDataset(AbstractDataset[np.ndarray, np.ndarray]):
             Data from the image file as a numpy array.
 
         """
-        return ImageFont.truetype(self._filepath, self._fontsize)
+        font = ImageFont.truetype(self._filepath, self._fontsize)
+        if self._preload_size_range is not None:
+            min_size, max_size = self._preload_size_range
+            for size in range(min_size, max_size + 1):
+                get_sized_font(font, size)
+        return font
 
     def _save(self, data: np.ndarray) -> None:
         """Not intended to save the font data."""
@@ -0,0 +1,172 @@
+"""Dataset for the history of generated texts backed by SQLite."""
+
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict
+
+import pandas as pd
+from kedro.io import AbstractDataset
+
+_COLUMNS = ["topic", "text", "timestamp"]
+
+
+class HistoryDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """``HistoryDataset`` loads and appends past texts to a SQLite table.
+
+    Saving appends the given rows instead of rewriting the whole history, and the
+    database runs in WAL mode, so that variants running in parallel can append
+    concurrently while others read. Rows which are already stored for a topic are
+    ignored, which makes appending the same text twice harmless.
+
+    Example:
+    -------
+    ::
+
+        >>> HistoryDataset(filepath='data/01_raw/past_generations.db', topic='quote')
+
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        table: str = "past_texts",
+        topic: str = None,
+        timeout: float = 30.0,
+    ):
+        """Create a new instance of HistoryDataset to load / append filepath.
+
+        Args:
+        ----
+            filepath: The location of the SQLite database.
+            table: The table holding the texts. Defaults to "past_texts".
+            topic: If given, only texts of this topic and its subtopics are loaded.
+                Defaults to None.
+            timeout: Seconds to wait for the lock of a concurrent writer. Defaults
+                to 30.
+
+        """
+        self._filepath = Path(filepath)
+        self._table = table
+        self._topic = topic
+        self._timeout = timeout
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection and create the table if it does not exist yet.
+
+        Returns
+        -------
+            Connection to the database.
+
+        """
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self._filepath, timeout=self._timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "topic TEXT NOT NULL, "
+            "text TEXT NOT NULL, "
+            "timestamp TEXT NOT NULL, "
+            "UNIQUE (topic, text))"
+        )
+        return connection
+
+    def _load(self) -> pd.DataFrame:
+        """Load the texts in the order they were appended.
+
+        Returns
+        -------
+            DataFrame containing topic, text and timestamp, indexed by the ascending
+            row id, so that consumers can pick up the rows appended since.
+
+        """
+        query = f"SELECT id, topic, text, timestamp FROM {self._table}"
+        params = ()
+        if self._topic is not None:
+            query += " WHERE topic = ? OR topic LIKE ?"
+            params = (self._topic, f"{self._topic}.%")
+        query += " ORDER BY id"
+
+        connection = self._connect()
+        try:
+            data = pd.read_sql_query(query, connection, params=params, index_col="id")
+        finally:
+            connection.close()
+        data["timestamp"] = pd.to_datetime(data["timestamp"])
+        return data
+
+    def _save(self, data: pd.DataFrame) -> None:
+        """Append the texts to the table.
+
+        Args:
+        ----
+            data: DataFrame containing topic, text and timestamp of the new texts.
+
+        """
+        rows = [
+            (str(topic), str(text), pd.Timestamp(timestamp).isoformat())
+            for topic, text, timestamp in data.loc[:, _COLUMNS].itertuples(index=False)
+        ]
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT OR IGNORE INTO {self._table} (topic, text, timestamp) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+        finally:
+            connection.close()
+
+    def _exists(self) -> bool:
+        """Check whether the database exists."""
+        return self._filepath.exists()
+
+    def _describe(self) -> Dict[str, Any]:
+        """Return the attributes of the dataset."""
+        return {"filepath": self._filepath, "table": self._table, "topic": self._topic}
+
+
+def migrate_excel_history(
+    excel_filepath: str,
+    filepath: str,
+    table: str = "past_texts",
+    default_topic: str = "unknown",
+) -> int:
+    """Copy the history of an Excel workbook into a ``HistoryDataset``.
+
+    Older workbooks only contain the text, missing topics and timestamps are
+    filled in. Running the migration twice does not duplicate any text.
+
+    Example:
+    -------
+    ::
+
+        >>> migrate_excel_history(
+        ...     "data/01_raw/past_generations.xlsx", "data/01_raw/past_generations.db"
+        ... )
+
+    Args:
+    ----
+        excel_filepath: The location of the Excel workbook.
+        filepath: The location of the SQLite database.
+        table: The table holding the texts. Defaults to "past_texts".
+        default_topic: Topic of texts without one. Defaults to "unknown".
+
+    Returns:
+    -------
+        Number of texts in the database after the migration.
+
+    """
+    history = pd.read_excel(excel_filepath).dropna(subset=["text"])
+    if "topic" not in history:
+        history["topic"] = default_topic
+    if "timestamp" not in history:
+        history["timestamp"] = pd.NaT
+    history["topic"] = history["topic"].fillna(default_topic)
+    history["timestamp"] = history["timestamp"].fillna(pd.Timestamp.now())
+
+    dataset = HistoryDataset(filepath=filepath, table=table)
+    dataset.save(history)
+    return len(dataset.load())
@@ -1,52 +1,201 @@
 """Dataset for images in png format."""
 
-from typing import Any, Dict
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import deepcopy
+from io import BytesIO
+from pathlib import PurePosixPath
+from typing import Any, Dict, Optional
 
-import numpy as np
+import fsspec
 from kedro.io import AbstractDataset
-from PIL import Image
 from kedro.io.core import get_filepath_str, get_protocol_and_path
-from pathlib import PurePosixPath
-import fsspec
-import os
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Encoding and writing in the background runs on a single shared thread, so that
+# the images are written in the order they were saved. The interpreter waits for its
+# pending writes at exit. Kedro never releases the outputs of a pipeline, so the
+# writes are also tracked here to raise their errors at the end of the run.
+_WRITER: Optional[ThreadPoolExecutor] = None
+_WRITER_LOCK = threading.Lock()
+_PENDING_WRITES: set[Future] = set()
 
 
-class ImageDataset(AbstractDataset[np.ndarray, np.ndarray]):
-    """``ImageDatset`` loads font data.
+class ImageDataset(AbstractDataset[Image.Image, Image.Image]):
+    """``ImageDataset`` saves and loads images.
+
+    Loaded images keep the bytes they were decoded from in ``info["encoded_bytes"]``
+    and, for local files, their path in ``info["filepath"]``, so that uploading them
+    does not encode them again.
 
     Example:
     -------
     ::
 
-        >>> ImageDataset(filepath='/img/file/path.png')
+        >>> ImageDataset(
+        ...     filepath='/img/file/path.png',
+        ...     save_args={"compress_level": 1},
+        ...     quantize=16,
+        ...     background=True,
+        ... )
 
     """
 
-    def __init__(self, filepath: str):
+    DEFAULT_SAVE_ARGS: Dict[str, Any] = {}
+
+    def __init__(
+        self,
+        filepath: str,
+        save_args: Optional[Dict[str, Any]] = None,
+        quantize: Optional[int] = None,
+        background: bool = False,
+    ):
         """Create a new instance of ImageDataset to load / save filepath.
 
         Args:
         ----
             filepath: The location of the image file to load / save data.
+            save_args: Options of ``PIL.Image.save``, for example ``format``,
+                ``compress_level``, ``optimize`` or ``quality``. The format follows
+                from the extension of ``filepath`` by default.
+            quantize: Number of palette colors the image is reduced to before
+                encoding. Text on a flat background needs very few colors, which
+                makes PNGs much smaller and faster to write. Defaults to None,
+                which keeps all colors.
+            background: Whether the image is encoded and written on a background
+                thread. Pending writes are waited for on ``release``, by
+                ``wait_for_background_writes`` and at exit. Failed writes are
+                logged as soon as they fail.
 
         """
         protocol, path = get_protocol_and_path(filepath)
         self._protocol = protocol
         self._filepath = PurePosixPath(path)
         self._fs = fsspec.filesystem(self._protocol)
+        self._save_args = {**self.DEFAULT_SAVE_ARGS, **(save_args or {})}
+        self._quantize = quantize
+        self._background = background
+        self._pending: list[Future] = []
 
-    def _load(self) -> None:
-        """Not intended to load images in."""
+    def _load(self) -> Image.Image:
+        """Load the image, after the pending background writes are done.
 
-    def _save(self, data: np.ndarray) -> None:
-        """Not intended to save the font data."""
+        Returns
+        -------
+            Image.Image: The image together with its encoded bytes.
+
+        """
+        self._release()
+        load_path = get_filepath_str(self._filepath, self._protocol)
+        with self._fs.open(load_path, mode="rb") as f:
+            encoded_bytes = f.read()
+
+        image = Image.open(BytesIO(encoded_bytes))
+        image.load()
+        image.info["encoded_bytes"] = encoded_bytes
+        if self._protocol == "file":
+            image.info["filepath"] = load_path
+        return image
+
+    def _save(self, data: Image.Image) -> None:
+        """Save the image, on a background thread if configured."""
+        if not self._background:
+            self._write(data)
+            return
+
+        self._pending = [future for future in self._pending if not future.done()]
+        future = _get_writer().submit(self._write_in_background, data)
+        with _WRITER_LOCK:
+            _PENDING_WRITES.add(future)
+        future.add_done_callback(_forget_write)
+        self._pending.append(future)
+
+    def _write_in_background(self, data: Image.Image) -> None:
+        """Write the image, logging the error as soon as the write fails."""
+        try:
+            self._write(data)
+        except Exception:
+            logger.exception(
+                "Writing the image %s in the background failed.", self._filepath
+            )
+            raise
+
+    def _write(self, data: Image.Image) -> None:
+        """Encode the image and write it to the filesystem."""
         save_path = get_filepath_str(self._filepath, self._protocol)
-        folder_path = save_path.rsplit("/", 1)[0]
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
+        self._fs.mkdirs(str(self._filepath.parent), exist_ok=True)
+
+        if self._quantize is not None:
+            data = data.quantize(colors=self._quantize)
+
+        save_args = deepcopy(self._save_args)
+        save_args.setdefault(
+            "format", Image.registered_extensions().get(self._filepath.suffix.lower())
+        )
         with self._fs.open(save_path, mode="wb") as f:
-            data.save(f)
+            data.save(f, **save_args)
+
+    def _release(self) -> None:
+        """Wait for the pending background writes and raise their errors."""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
 
     def _describe(self) -> Dict[str, Any]:
-        """Not intended to describe the data."""
-        pass
+        """Return the attributes of the dataset."""
+        return {
+            "filepath": self._filepath,
+            "protocol": self._protocol,
+            "save_args": self._save_args,
+            "quantize": self._quantize,
+            "background": self._background,
+        }
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    """Return the thread writing images in the background, starting it on first use.
+
+    Returns
+    -------
+        ThreadPoolExecutor: Executor with a single thread.
+
+    """
+    global _WRITER  # noqa: PLW0603
+
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image")
+        return _WRITER
+
+
+def _forget_write(future: Future) -> None:
+    """Stop tracking a background write which succeeded.
+
+    Args:
+    ----
+        future (Future): The finished write.
+
+    """
+    if future.exception() is None:
+        with _WRITER_LOCK:
+            _PENDING_WRITES.discard(future)
+
+
+def wait_for_background_writes() -> None:
+    """Wait for the pending background writes of all image datasets.
+
+    Raises
+    ------
+        Exception: The error of the first failed write, if any write failed.
+
+    """
+    with _WRITER_LOCK:
+        pending = list(_PENDING_WRITES)
+        _PENDING_WRITES.clear()
+    errors = [future.exception() for future in pending]
+    failed = [error for error in errors if error is not None]
+    if failed:
+        raise failed[0]
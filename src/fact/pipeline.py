@@ -1,12 +1,18 @@
 """Pipelines for facts creation."""
 
-from common.content_creation import create_content_pipeline
+from common.content_creation import (
+    create_batched_text_pipeline,
+    create_content_pipeline,
+)
 from common.insta_publish import create_insta_publish_pipeline
 from kedro.pipeline import Pipeline
 
 
 def create_pipeline(
-    namespace: str, variants: list[str] = None, publish: bool = True
+    namespace: str,
+    variants: list[str] = None,
+    publish: bool = True,
+    text_mode: str = None,
 ) -> Pipeline:
     """Pipeline for quotes with author information.
 
@@ -15,16 +21,30 @@ def create_pipeline(
         namespace (str): Namespace for the pipeline.
         variants (list[str]): Variants of the pipeline.
         publish (bool): Whether to publish the image. Defaults to True.
+        text_mode (str): How the texts are created. ``batched`` creates the texts of
+            all variants with a single prompt, ``concurrent`` sends the prompts of
+            all variants concurrently. By default every variant has its own node.
+            Defaults to None.
 
     Returns:
     -------
         Pipeline: Pipeline for quotes with author information.
 
     """
+    batched = text_mode in ("batched", "concurrent")
+    text_pipeline = (
+        create_batched_text_pipeline(
+            namespace=namespace,
+            variants=variants,
+            concurrent=text_mode == "concurrent",
+        )
+        if batched
+        else Pipeline([])
+    )
     namespaces = [f"{namespace}.{variant}" for variant in variants]
-    return sum(
+    return text_pipeline + sum(
         [
-            create_content_pipeline(namespace=namespace)
+            create_content_pipeline(namespace=namespace, batched=batched)
             + create_insta_publish_pipeline(namespace=namespace, publish=publish)
             for namespace in namespaces
         ]
@@ -0,0 +1,328 @@
+"""Project hooks."""
+
+import logging
+from typing import Any, Callable
+
+from common.incremental import IncrementalFunction, NodeOutputStore
+from common.instrumentation import RunMetrics, format_summary
+from common.llm.event_loop import shutdown_event_loop
+from common.llm.metrics import LLM_METRICS
+from common.llm.model_pool import shutdown_llms, warmup_llms
+from common.llm.prompt_cache import PROMPT_CACHE
+from common.llm.retry import RETRY_BUDGET
+from common.text_buffer import TEXT_BUFFER
+from datasets.image_dataset import wait_for_background_writes
+from kedro.framework.hooks import hook_impl
+from kedro.io import DataCatalog
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+
+logger = logging.getLogger(__name__)
+
+
+class LLMPoolHooks:
+    """Warm up the pooled LLMs before a run and release them afterwards."""
+
+    def __init__(self, warmup: bool = True, prime: bool = True):
+        """Create the hooks.
+
+        Args:
+        ----
+            warmup (bool, optional): Whether to load the models before the first node
+                runs. Defaults to True.
+            prime (bool, optional): Whether to generate a token with every local
+                model during the warmup, so that its weights are in memory before
+                the first prompt. Defaults to True.
+
+        """
+        self._warmup = warmup
+        self._prime = prime
+
+    @hook_impl
+    def before_pipeline_run(
+        self, run_params: dict[str, Any], pipeline: Pipeline, catalog: DataCatalog
+    ) -> None:
+        """Load the models of all LLM nodes of the pipeline, each of them once."""
+        # Incremental runs mostly reuse texts, the models are loaded on first use.
+        extra_params = run_params.get("extra_params") or {}
+        if not self._warmup or extra_params.get("incremental"):
+            return
+
+        llm_nodes = pipeline.only_nodes_with_tags("llm").nodes
+        llm_params = {
+            dataset
+            for node in llm_nodes
+            for dataset in node.inputs
+            if dataset == "params:llm"
+            or (dataset.startswith("params:") and dataset.endswith(".llm"))
+        }
+        if llm_nodes:
+            warmup_llms(
+                [catalog.load(dataset) for dataset in sorted(llm_params)] or None,
+                prime=self._prime,
+            )
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Report model timings and release the pooled models."""
+        shutdown_llms()
+        shutdown_event_loop()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Release the pooled models when the run fails."""
+        shutdown_llms()
+        shutdown_event_loop()
+
+
+class RetryBudgetHooks:
+    """Restore the retry budget shared by all LLM calls at the start of every run."""
+
+    def __init__(self, max_retries: int = 50):
+        """Create the hooks.
+
+        Args:
+        ----
+            max_retries (int, optional): Number of LLM retries allowed per run.
+                Defaults to 50.
+
+        """
+        self._max_retries = max_retries
+
+    @hook_impl
+    def before_pipeline_run(self) -> None:
+        """Reset the retry budget."""
+        RETRY_BUDGET.reset(max_retries=self._max_retries)
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Report how much of the retry budget was used."""
+        logger.info("Used %d LLM retries in this run.", RETRY_BUDGET.used)
+
+
+class LLMMetricsHooks:
+    """Report how often LLM output had to be repaired and prompts retried."""
+
+    @hook_impl
+    def before_pipeline_run(self) -> None:
+        """Reset the counters of the previous run."""
+        LLM_METRICS.reset()
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Log the repair and retry rates of the run."""
+        logger.info(
+            "LLM output: %.1f%% unparsable, %.1f%% of those repaired locally. "
+            "Attempts: %.1f%% retried. Counters: %s",
+            100 * LLM_METRICS.rate("parse_failures", "outputs"),
+            100 * LLM_METRICS.rate("repairs", "parse_failures"),
+            100 * LLM_METRICS.rate("retries", "attempts"),
+            LLM_METRICS.snapshot(),
+        )
+        if LLM_METRICS.snapshot().get("streamed_calls"):
+            logger.info(
+                "Streaming: %.2fs mean time to first token, %.1f tokens/s, %.1f%% "
+                "stopped early.",
+                LLM_METRICS.rate("time_to_first_token_seconds", "streamed_calls"),
+                LLM_METRICS.rate("streamed_tokens", "streaming_seconds"),
+                100 * LLM_METRICS.rate("early_stops", "streamed_calls"),
+            )
+
+
+class PromptCacheHooks:
+    """Evict expired and surplus entries of the prompt cache after every run."""
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Evict the prompt cache."""
+        evicted = PROMPT_CACHE.evict()
+        if evicted:
+            logger.info("Evicted %d entries from the prompt cache.", evicted)
+
+
+class TextBufferHooks:
+    """Remove the buffered texts taken by a run only once the run succeeded."""
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Remove the taken texts from the buffers."""
+        taken = TEXT_BUFFER.commit()
+        if taken:
+            logger.info("Took %d texts from the text buffers.", taken)
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Put the taken texts back into the buffers when the run fails."""
+        released = TEXT_BUFFER.release()
+        if released:
+            logger.info("Put %d texts back into the text buffers.", released)
+
+
+class ImageWriterHooks:
+    """Wait for the images written in the background before a run ends."""
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Wait for the pending writes and fail the run if one of them failed."""
+        wait_for_background_writes()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Wait for the pending writes, their errors are logged as they happen."""
+        try:
+            wait_for_background_writes()
+        except Exception:
+            logger.debug("Ignoring a failed image write of a failed run.")
+
+
+class IncrementalHooks:
+    """Skip the LLM nodes whose code and inputs did not change since their last run.
+
+    The mode is enabled per run with ``kedro run --params incremental=true``, since a
+    regular run is meant to create new texts. The outputs of the skipped nodes are
+    taken from their previous run, so that for example a new font or font colour
+    only re-renders the posts.
+
+    Kedro offers no hook to skip a node, so the functions of the nodes are replaced
+    for the run. The nodes are shared by all pipelines of the registry, therefore
+    their original functions are kept and restored once the run ends or fails.
+    """
+
+    def __init__(
+        self,
+        tags: tuple[str, ...] = ("llm",),
+        excluded_inputs: tuple[str, ...] = ("past_texts",),
+        directory: str = "data/02_intermediate/node_outputs",
+    ):
+        """Create the hooks.
+
+        Args:
+        ----
+            tags (tuple[str, ...], optional): Tags of the nodes which are skipped if
+                nothing changed. Defaults to ("llm",).
+            excluded_inputs (tuple[str, ...], optional): Inputs which are not part of
+                the fingerprint. The history of texts grows with every run and would
+                otherwise invalidate every text. Defaults to ("past_texts",).
+            directory (str, optional): Directory of the persisted outputs. Defaults
+                to "data/02_intermediate/node_outputs".
+
+        """
+        self._tags = tags
+        self._excluded_inputs = excluded_inputs
+        self._store = NodeOutputStore(directory=directory)
+        self._original_functions: list[tuple[Node, Callable]] = []
+
+    @hook_impl
+    def before_pipeline_run(
+        self, run_params: dict[str, Any], pipeline: Pipeline
+    ) -> None:
+        """Wrap the functions of the tagged nodes if the mode is enabled."""
+        extra_params = run_params.get("extra_params") or {}
+        if not extra_params.get("incremental"):
+            return
+
+        # Filtering the pipeline would copy its nodes, the run uses these ones.
+        for node in pipeline.nodes:
+            if node.tags.isdisjoint(self._tags):
+                continue
+            # Nodes without outputs only have side effects, which are never skipped.
+            if not node.outputs or isinstance(node.func, IncrementalFunction):
+                continue
+            self._original_functions.append((node, node.func))
+            node.func = IncrementalFunction(
+                node=node, store=self._store, excluded_inputs=self._excluded_inputs
+            )
+        logger.info(
+            "Incremental run, %d nodes may be skipped.", len(self._original_functions)
+        )
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Restore the functions of the wrapped nodes."""
+        self._unwrap()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Restore the functions of the wrapped nodes when the run fails."""
+        self._unwrap()
+
+    def _unwrap(self) -> None:
+        """Restore the original functions of the wrapped nodes."""
+        for node, func in self._original_functions:
+            node.func = func
+        self._original_functions.clear()
+
+
+class ProjectHooks:
+    """Record where the time and memory of every run go.
+
+    The wall and CPU time of every node and namespace, the load and save time of the
+    datasets, the token, retry and timing counters of the LLM calls and the peak RSS
+    are written to ``data/08_reporting/metrics`` and summarised in the log.
+    """
+
+    def __init__(self, directory: str = "data/08_reporting/metrics"):
+        """Create the hooks.
+
+        Args:
+        ----
+            directory (str, optional): Directory of the metric files. Defaults to
+                "data/08_reporting/metrics".
+
+        """
+        self._metrics = RunMetrics(directory=directory)
+
+    @hook_impl
+    def before_pipeline_run(self) -> None:
+        """Start the metrics of a new run."""
+        self._metrics.reset()
+
+    @hook_impl
+    def before_node_run(self, node: Node) -> None:
+        """Start the timing of a node."""
+        self._metrics.start_node(node.name)
+
+    @hook_impl
+    def after_node_run(self, node: Node) -> None:
+        """End the timing of a node."""
+        self._metrics.end_node(node.name, namespace=node.namespace)
+
+    @hook_impl
+    def on_node_error(self, node: Node) -> None:
+        """End the timing of a failed node."""
+        self._metrics.end_node(node.name, namespace=node.namespace, failed=True)
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str) -> None:
+        """Start the timing of a load."""
+        self._metrics.start_dataset(dataset_name, operation="load")
+
+    @hook_impl
+    def after_dataset_loaded(self, dataset_name: str) -> None:
+        """End the timing of a load."""
+        self._metrics.end_dataset(dataset_name, operation="load")
+
+    @hook_impl
+    def before_dataset_saved(self, dataset_name: str) -> None:
+        """Start the timing of a save."""
+        self._metrics.start_dataset(dataset_name, operation="save")
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str) -> None:
+        """End the timing of a save."""
+        self._metrics.end_dataset(dataset_name, operation="save")
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        """Write the metrics of the run and log their summary."""
+        self._report()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        """Write the metrics of the failed run."""
+        self._report()
+
+    def _report(self) -> None:
+        """Write the metrics of the run and log their summary."""
+        summary = self._metrics.write(llm_metrics=LLM_METRICS.snapshot())
+        logger.info("Run metrics:\n%s", format_summary(summary))
@@ -1,5 +1,6 @@
 """Project pipelines."""
 
+from common.content_creation import create_text_buffer_pipeline
 from fact import create_pipeline as create_fact_pipeline
 from kedro.pipeline import Pipeline
 from quote import create_pipeline as create_quote_pipeline
@@ -18,13 +19,25 @@ def register_pipelines() -> dict[str, Pipeline]:
         A mapping from pipeline names to ``Pipeline`` objects.
 
     """
-    return {
+    pipelines = {
         "quote_pipeline": create_quote_pipeline(
             namespace="quote",
             variants=DYNAMIC_PIPELINES_MAPPING["quote"],
             publish=False,
+            text_mode="batched",
         ),
         "fact_pipeline": create_fact_pipeline(
-            namespace="fact", variants=DYNAMIC_PIPELINES_MAPPING["fact"], publish=False
+            namespace="fact",
+            variants=DYNAMIC_PIPELINES_MAPPING["fact"],
+            publish=False,
+            text_mode="batched",
         ),
     }
+    pipelines["__default__"] = sum(pipelines.values())
+
+    # Fill the text buffers in idle time, e.g. kedro run --pipeline quote_buffer.
+    for namespace, variants in DYNAMIC_PIPELINES_MAPPING.items():
+        pipelines[f"{namespace}_buffer"] = create_text_buffer_pipeline(
+            namespace=namespace, variants=variants
+        )
+    return pipelines
@@ -1,11 +1,28 @@
 """Project settings."""
 
 # Instantiated project hooks.
-# For example, after creating a hooks.py and defining a ProjectHooks class there, do
-# from auto_insta.hooks import ProjectHooks
+from registry.hooks import (
+    ImageWriterHooks,
+    IncrementalHooks,
+    LLMMetricsHooks,
+    LLMPoolHooks,
+    ProjectHooks,
+    PromptCacheHooks,
+    RetryBudgetHooks,
+    TextBufferHooks,
+)
 
 # Hooks are executed in a Last-In-First-Out (LIFO) order.
-# HOOKS = (ProjectHooks(),)
+HOOKS = (
+    LLMPoolHooks(),
+    RetryBudgetHooks(max_retries=50),
+    LLMMetricsHooks(),
+    PromptCacheHooks(),
+    TextBufferHooks(),
+    ImageWriterHooks(),
+    IncrementalHooks(),
+    ProjectHooks(),
+)
 
 # Installed plugins for which to disable hook auto-registration.
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
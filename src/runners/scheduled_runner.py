@@ -0,0 +1,190 @@
+"""Runner which schedules nodes on dedicated pools depending on their tags."""
+
+import logging
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain
+from typing import Optional
+
+from common.llm.rate_limit import LLM_RATE_LIMITER
+from kedro.io import DataCatalog
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+from kedro.runner import ThreadRunner, run_node
+from pluggy import PluginManager
+
+logger = logging.getLogger(__name__)
+
+LLM_TAG = "llm"
+RENDER_TAG = "render"
+HISTORY_TAG = "history"
+
+
+class ScheduledRunner(ThreadRunner):
+    """``ScheduledRunner`` runs independent nodes concurrently on dedicated pools.
+
+    Nodes are assigned to a pool by their tags:
+
+    - ``llm``: I/O bound LLM calls, capped in concurrency. The requests they send
+      are rate limited by the shared ``LLM_RATE_LIMITER``, which counts every LLM
+      call instead of every node.
+    - ``render``: Image rendering, one worker per core. Pillow releases the GIL in
+      its drawing and encoding routines, so threads scale across cores while the
+      images and fonts are not pickled between processes.
+    - ``history``: Nodes writing the shared past texts, run one at a time.
+
+    All other nodes run on a default pool. The limits are read from the environment
+    variables ``AUTO_INSTA_LLM_CONCURRENCY``, ``AUTO_INSTA_LLM_REQUESTS_PER_MINUTE``
+    and ``AUTO_INSTA_RENDER_WORKERS``, as Kedro instantiates the runner itself.
+
+    Example:
+    -------
+    ::
+
+        $ kedro run --runner=runners.scheduled_runner.ScheduledRunner
+
+    """
+
+    def __init__(
+        self,
+        is_async: bool = False,
+        llm_concurrency: int = None,
+        llm_requests_per_minute: float = None,
+        render_workers: int = None,
+    ):
+        """Create a new runner.
+
+        Args:
+        ----
+            is_async (bool, optional): Whether to load and save datasets
+                asynchronously. Defaults to False.
+            llm_concurrency (int, optional): Maximum number of LLM nodes running at
+                the same time. Defaults to 4.
+            llm_requests_per_minute (float, optional): Maximum number of LLM
+                requests per minute. Defaults to 60.
+            render_workers (int, optional): Number of workers rendering images.
+                Defaults to the number of cores.
+
+        """
+        super().__init__(is_async=is_async)
+        self._llm_concurrency = llm_concurrency or int(
+            os.environ.get("AUTO_INSTA_LLM_CONCURRENCY", 4)
+        )
+        LLM_RATE_LIMITER.reset(
+            requests_per_minute=llm_requests_per_minute
+            or float(os.environ.get("AUTO_INSTA_LLM_REQUESTS_PER_MINUTE", 60)),
+            burst=self._llm_concurrency,
+        )
+        self._render_workers = render_workers or int(
+            os.environ.get("AUTO_INSTA_RENDER_WORKERS", os.cpu_count() or 1)
+        )
+
+    def _run(
+        self,
+        pipeline: Pipeline,
+        catalog: DataCatalog,
+        hook_manager: PluginManager,
+        session_id: str = None,
+    ) -> None:
+        """Run the nodes of the pipeline on the pools matching their tags.
+
+        Args:
+        ----
+            pipeline (Pipeline): The ``Pipeline`` to run.
+            catalog (DataCatalog): The ``DataCatalog`` from which to fetch data.
+            hook_manager (PluginManager): The ``PluginManager`` to activate hooks.
+            session_id (str, optional): The id of the session. Defaults to None.
+
+        """
+        nodes = pipeline.nodes
+        load_counts = Counter(chain.from_iterable(n.inputs for n in nodes))
+        node_dependencies = pipeline.node_dependencies
+        todo_nodes = set(node_dependencies.keys())
+        done_nodes = set()
+        futures = set()
+
+        pools = {
+            LLM_TAG: ThreadPoolExecutor(self._llm_concurrency, "llm"),
+            RENDER_TAG: ThreadPoolExecutor(self._render_workers, "render"),
+            HISTORY_TAG: ThreadPoolExecutor(1, "history"),
+            None: ThreadPoolExecutor(self._get_required_workers_count(pipeline)),
+        }
+        try:
+            while True:
+                ready = {n for n in todo_nodes if node_dependencies[n] <= done_nodes}
+                todo_nodes -= ready
+                for node in ready:
+                    lane = self._get_lane(node)
+                    futures.add(
+                        pools[lane].submit(
+                            run_node,
+                            node,
+                            catalog,
+                            hook_manager,
+                            self._is_async,
+                            session_id,
+                        )
+                    )
+                if not futures:
+                    if todo_nodes:
+                        raise RuntimeError(f"Unable to schedule nodes: {todo_nodes}")
+                    break
+
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        node = future.result()
+                    except Exception:
+                        self._suggest_resume_scenario(pipeline, done_nodes, catalog)
+                        raise
+                    done_nodes.add(node)
+                    self._logger.info("Completed node: %s", node.name)
+                    self._logger.info(
+                        "Completed %d out of %d tasks", len(done_nodes), len(nodes)
+                    )
+
+                    self._release_datasets(node, catalog, load_counts, pipeline)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _release_datasets(
+        node: Node, catalog: DataCatalog, load_counts: Counter, pipeline: Pipeline
+    ) -> None:
+        """Release the datasets of a finished node that are not needed anymore.
+
+        Args:
+        ----
+            node (Node): The finished node.
+            catalog (DataCatalog): The ``DataCatalog`` holding the datasets.
+            load_counts (Counter): Number of pending loads per dataset.
+            pipeline (Pipeline): The ``Pipeline`` that is run.
+
+        """
+        for dataset in node.inputs:
+            load_counts[dataset] -= 1
+            if load_counts[dataset] < 1 and dataset not in pipeline.inputs():
+                catalog.release(dataset)
+        for dataset in node.outputs:
+            if load_counts[dataset] < 1 and dataset not in pipeline.outputs():
+                catalog.release(dataset)
+
+    @staticmethod
+    def _get_lane(node: Node) -> Optional[str]:
+        """Return the pool a node is scheduled on.
+
+        Args:
+        ----
+            node (Node): The node to schedule.
+
+        Returns:
+        -------
+            Optional[str]: Tag of the pool, or None for the default pool.
+
+        """
+        for tag in (HISTORY_TAG, LLM_TAG, RENDER_TAG):
+            if tag in node.tags:
+                return tag
+        return None
@@ -0,0 +1 @@
+"""Tests for the content creation functions."""
@@ -0,0 +1,208 @@
+"""Tests for the creation of the texts of the posts."""
+
+import asyncio
+import re
+
+import pandas as pd
+import pytest
+from langchain_core.language_models import LLM
+
+from common.content_creation import functions
+from common.llm.flow_modules.generate_query import Quote, TextBatch, VariantText
+from common.llm.event_loop import as_sync, shutdown_event_loop
+from common.llm.model_pool import PooledLLM
+from common.llm.prompt_engineering import functions as prompt_functions
+from common.llm.rate_limit import TokenBucket
+from common.text_buffer import TextBuffer
+
+_TEMPLATE = "Write a quote about {topic}.\n{format_instructions}\n{past_texts}"
+_CONTEXT_PARAMS = {"recent_k": 5, "top_k": 5, "token_budget": 200}
+_DEDUPLICATION_PARAMS = {"threshold": 0.8, "max_regenerations": 2}
+
+
+class _AsyncQuoteLLM(LLM):
+    """Fake asynchronous LLM answering with a quote about the topic of the prompt.
+
+    ``in_flight`` counts the prompts that are awaited at the same time.
+    """
+
+    in_flight: dict
+
+    @property
+    def _llm_type(self):
+        return "async-quote"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        topic = re.search(r"about (\w+)\.", prompt).group(1)
+        return f'{{"text": "Every {topic} story is worth telling."}}'
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.in_flight["current"] += 1
+        self.in_flight["peak"] = max(self.in_flight["peak"], self.in_flight["current"])
+        await asyncio.sleep(0.02)
+        self.in_flight["current"] -= 1
+        return self._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch, tmp_path):
+    monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "off")
+    monkeypatch.setattr(
+        prompt_functions,
+        "LLM_RATE_LIMITER",
+        TokenBucket(requests_per_minute=60_000, burst=100),
+    )
+    monkeypatch.setattr(
+        functions, "TEXT_BUFFER", TextBuffer(filepath=str(tmp_path / "buffer.db"))
+    )
+    yield
+    shutdown_event_loop()
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    llm = _AsyncQuoteLLM(in_flight={"current": 0, "peak": 0})
+    pooled_llm = PooledLLM(key=(), llm=llm, load_seconds=0.0, local=False)
+    monkeypatch.setattr(
+        prompt_functions, "get_llm", lambda *args, **kwargs: pooled_llm
+    )
+    return llm
+
+
+@pytest.fixture
+def past_texts():
+    return pd.DataFrame(
+        {
+            "topic": ["quote.love"],
+            "text": ["Love is patient."],
+            "timestamp": [pd.Timestamp("2024-01-01")],
+        }
+    )
+
+
+class TestAsyncTextCreation:
+    def test_create_text_for_image(self, llm, past_texts):
+        text = as_sync(functions.acreate_text_for_image)(
+            template=_TEMPLATE,
+            output_parser_key="quote.love",
+            past_texts=past_texts,
+            context_params=_CONTEXT_PARAMS,
+            deduplication_params=_DEDUPLICATION_PARAMS,
+        )
+        assert text.text == "Every love story is worth telling."
+
+    @pytest.mark.parametrize("max_concurrency", [1, 3])
+    def test_concurrency_is_capped(self, llm, past_texts, max_concurrency):
+        variants = ["love", "life", "hope", "grief", "joy", "luck"]
+        texts = as_sync(functions.acreate_texts_for_variants)(
+            past_texts,
+            _CONTEXT_PARAMS,
+            _DEDUPLICATION_PARAMS,
+            max_concurrency,
+            None,
+            *[_TEMPLATE] * len(variants),
+            output_parser_key="quote",
+            variants=variants,
+        )
+        assert {variant: text.text for variant, text in texts.items()} == {
+            variant: f"Every {variant} story is worth telling."
+            for variant in variants
+        }
+        assert llm.in_flight["peak"] == max_concurrency
+
+
+
+def _batch(*texts):
+    return TextBatch(
+        texts=[VariantText(variant=variant, text=text) for variant, text in texts]
+    )
+
+
+@pytest.fixture
+def batch_prompts(monkeypatch):
+    """Stub ``prompt_wrapper`` answering with the queued batches in turn."""
+    batch_prompts = {"responses": [], "calls": []}
+
+    def prompt_wrapper(**kwargs):
+        batch_prompts["calls"].append(kwargs)
+        return batch_prompts["responses"].pop(0)
+
+    monkeypatch.setattr(functions, "prompt_wrapper", prompt_wrapper)
+    return batch_prompts
+
+
+def _create_texts_for_images(past_texts, variants):
+    return functions.create_texts_for_images(
+        template="{topics}\n{format_instructions}\n{past_texts}",
+        output_parser_key="quote",
+        variants=variants,
+        past_texts=past_texts,
+        context_params=_CONTEXT_PARAMS,
+        deduplication_params=_DEDUPLICATION_PARAMS,
+    )
+
+
+class TestBatchedTextCreation:
+    def test_batch_is_split_per_variant(self, batch_prompts, past_texts):
+        batch_prompts["responses"] = [
+            _batch(("Life", "Life goes on."), ("love", "Love never fails."))
+        ]
+        texts = _create_texts_for_images(past_texts, variants=["love", "life"])
+
+        assert texts == {
+            "love": Quote(text="Love never fails."),
+            "life": Quote(text="Life goes on."),
+        }
+        assert functions.select_text_for_variant(texts, "life").text == (
+            "Life goes on."
+        )
+        assert batch_prompts["calls"][0]["inputs"]["topics"] == "love, life"
+        assert batch_prompts["calls"][0]["output_parser_key"] == "batch"
+
+    def test_partial_batch_prompts_for_missing_variants(
+        self, batch_prompts, past_texts
+    ):
+        batch_prompts["responses"] = [
+            _batch(
+                ("love", "Love never fails."),
+                ("love", "Love is all you need."),
+                ("grief", "Grief is love with nowhere to go."),
+            ),
+            _batch(("hope", "Hope floats."), ("love", "Love is all you need.")),
+        ]
+        texts = _create_texts_for_images(past_texts, variants=["love", "hope"])
+
+        assert {variant: text.text for variant, text in texts.items()} == {
+            "love": "Love never fails.",
+            "hope": "Hope floats.",
+        }
+        assert [call["inputs"]["topics"] for call in batch_prompts["calls"]] == [
+            "love, hope",
+            "hope",
+        ]
+        assert [call["refresh_cache"] for call in batch_prompts["calls"]] == [
+            False,
+            True,
+        ]
+
+    def test_near_duplicates_are_regenerated(self, batch_prompts, past_texts):
+        batch_prompts["responses"] = [
+            _batch(("love", "Love is patient."), ("hope", "Hope floats.")),
+            _batch(("love", "Love never fails.")),
+        ]
+        texts = _create_texts_for_images(past_texts, variants=["love", "hope"])
+
+        assert texts["love"].text == "Love never fails."
+        retry = batch_prompts["calls"][1]["inputs"]
+        assert retry["topics"] == "love"
+        assert retry["past_texts"].count("Love is patient.") == 2
+
+    def test_gives_up_after_max_regenerations(self, batch_prompts, past_texts):
+        batch_prompts["responses"] = [
+            _batch(("love", "Love never fails.")),
+            _batch(),
+            _batch(),
+        ]
+        with pytest.raises(ValueError, match="hope"):
+            _create_texts_for_images(past_texts, variants=["love", "hope"])
+        assert len(batch_prompts["calls"]) == 3
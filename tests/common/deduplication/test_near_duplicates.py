@@ -0,0 +1,82 @@
+"""Tests for the MinHash LSH detector of near-duplicate texts."""
+
+import pandas as pd
+import pytest
+
+from common.deduplication import near_duplicates
+from common.deduplication.near_duplicates import (
+    NearDuplicateDetector,
+    get_near_duplicate_detector,
+)
+
+PAST_TEXTS = [
+    "Love is patient, love is kind, it does not envy, it does not boast.",
+    "The only way to do great work is to love what you do.",
+    "In the middle of every difficulty lies opportunity.",
+]
+
+
+@pytest.fixture(autouse=True)
+def reset_detector(monkeypatch):
+    monkeypatch.setattr(near_duplicates, "_DETECTOR", None)
+
+
+class TestNearDuplicateDetector:
+    def test_finds_near_duplicate(self):
+        detector = NearDuplicateDetector.from_texts(PAST_TEXTS)
+        candidate = "Love is patient, love is kind, it does not envy, it does not brag."
+        assert detector.find_duplicate(candidate) == PAST_TEXTS[0]
+
+    def test_ignores_different_text(self):
+        detector = NearDuplicateDetector.from_texts(PAST_TEXTS)
+        assert detector.find_duplicate("Fortune favours the bold and brave.") is None
+
+    def test_threshold_override(self):
+        detector = NearDuplicateDetector.from_texts(PAST_TEXTS)
+        candidate = "The only way to do good work is to love what you do."
+        assert detector.find_duplicate(candidate, threshold=0.1) == PAST_TEXTS[1]
+        assert detector.find_duplicate(candidate, threshold=1.0) is None
+
+    def test_update_adds_only_new_rows(self):
+        detector = NearDuplicateDetector()
+        texts = pd.Series(PAST_TEXTS, index=[3, 5, 8])
+        assert detector.update(texts.iloc[:2])
+        assert detector.update(texts)
+        assert not detector.update(texts)
+        assert detector.texts == PAST_TEXTS
+
+    def test_update_rebuilds_on_changed_history(self):
+        detector = NearDuplicateDetector()
+        detector.update(pd.Series(PAST_TEXTS, index=[1, 2, 3]))
+        detector.update(pd.Series(PAST_TEXTS[1:], index=[2, 3]))
+        assert detector.texts == PAST_TEXTS[1:]
+        assert detector.find_duplicate(PAST_TEXTS[0]) is None
+
+    def test_save_and_load(self, tmp_path):
+        filepath = tmp_path / "near_duplicates.npz"
+        detector = NearDuplicateDetector(threshold=0.5)
+        detector.update(pd.Series(PAST_TEXTS, index=[1, 2, 3]))
+        detector.save(filepath)
+
+        loaded = NearDuplicateDetector.load(filepath)
+        assert loaded.texts == PAST_TEXTS
+        assert loaded.find_duplicate(PAST_TEXTS[2]) == PAST_TEXTS[2]
+        assert not loaded.update(pd.Series(PAST_TEXTS, index=[1, 2, 3]))
+
+    def test_load_missing_file(self, tmp_path):
+        assert NearDuplicateDetector.load(tmp_path / "missing.npz").texts == []
+
+    def test_bands_have_to_divide_num_perm(self):
+        with pytest.raises(ValueError, match="divide"):
+            NearDuplicateDetector(num_perm=128, bands=30)
+
+
+class TestGetNearDuplicateDetector:
+    def test_detector_is_shared_and_persisted(self, tmp_path):
+        filepath = tmp_path / "near_duplicates.npz"
+        texts = pd.Series(PAST_TEXTS, index=[1, 2, 3])
+
+        detector = get_near_duplicate_detector(texts=texts.iloc[:2], filepath=filepath)
+        assert get_near_duplicate_detector(texts=texts, filepath=filepath) is detector
+        assert detector.texts == PAST_TEXTS
+        assert NearDuplicateDetector.load(filepath).texts == PAST_TEXTS
@@ -0,0 +1,124 @@
+"""Tests for the TF-IDF index of past texts and the selection of the prompt context."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.deduplication import PastTextIndex, select_past_texts
+
+PAST_TEXTS = [
+    "Love is patient, love is kind.",
+    "The only way to do great work is to love what you do.",
+    "In the middle of every difficulty lies opportunity.",
+    "Hope is the thing with feathers that perches in the soul.",
+]
+
+PARAMS = {"recent_k": 1, "top_k": 2, "token_budget": 200}
+
+
+class TestPastTextIndex:
+    def test_most_similar_texts_first(self):
+        index = PastTextIndex()
+        index.update(PAST_TEXTS)
+        assert index.most_similar("love and kindness", k=2) == PAST_TEXTS[:2]
+
+    def test_k_is_bounded(self):
+        index = PastTextIndex()
+        index.update(PAST_TEXTS)
+        assert len(index.most_similar("love", k=10)) == len(PAST_TEXTS)
+        assert index.most_similar("love", k=0) == []
+        assert PastTextIndex().most_similar("love", k=3) == []
+
+    def test_update_appends_new_texts(self):
+        index = PastTextIndex()
+        assert index.update(PAST_TEXTS[:2])
+        assert index.update(PAST_TEXTS)
+        assert not index.update(PAST_TEXTS)
+
+        rebuilt = PastTextIndex()
+        rebuilt.update(PAST_TEXTS)
+        assert index.most_similar("hope", k=4) == rebuilt.most_similar("hope", k=4)
+
+    def test_changed_history_rebuilds(self):
+        index = PastTextIndex()
+        index.update(PAST_TEXTS)
+        assert index.update(PAST_TEXTS[1:])
+        assert index.texts == PAST_TEXTS[1:]
+        assert PAST_TEXTS[0] not in index.most_similar("love is kind", k=3)
+
+    def test_stores_only_the_buckets_of_the_texts(self):
+        index = PastTextIndex()
+        index.update(PAST_TEXTS)
+        assert index._buckets.size < len(PAST_TEXTS) * 64
+        assert index._offsets[-1] == index._buckets.size
+
+    def test_save_and_load(self, tmp_path):
+        filepath = tmp_path / "index" / "quote.npz"
+        index = PastTextIndex(ngram_size=3)
+        index.update(PAST_TEXTS)
+        index.save(filepath)
+        assert [path.name for path in filepath.parent.iterdir()] == ["quote.npz"]
+
+        loaded = PastTextIndex.load(filepath)
+        assert loaded.texts == PAST_TEXTS
+        assert loaded.most_similar("hope", k=2) == index.most_similar("hope", k=2)
+        assert not loaded.update(PAST_TEXTS)
+
+    def test_dense_index_is_rebuilt(self, tmp_path):
+        filepath = tmp_path / "quote.npz"
+        np.savez(
+            filepath,
+            texts=np.array(PAST_TEXTS),
+            counts=np.zeros((len(PAST_TEXTS), 2048), dtype=np.float32),
+            ngram_size=4,
+        )
+        index = PastTextIndex.load(filepath)
+        assert index.texts == []
+        assert index.update(PAST_TEXTS)
+
+
+@pytest.fixture
+def past_texts():
+    return pd.DataFrame(
+        {
+            "topic": ["quote.love", "quote.work", "quote.love", "fact.love"],
+            "text": [PAST_TEXTS[0], PAST_TEXTS[1], PAST_TEXTS[3], "Swans mate for life."],
+            "timestamp": pd.to_datetime(
+                ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+            ),
+        }
+    )
+
+
+class TestSelectPastTexts:
+    def test_recent_and_similar_texts_of_the_topic(self, past_texts):
+        selected = select_past_texts(
+            past_texts=past_texts, topic="quote.love", query="love", params=PARAMS
+        )
+        assert selected == [PAST_TEXTS[3], PAST_TEXTS[0]]
+
+    def test_namespace_includes_its_variants(self, past_texts):
+        selected = select_past_texts(
+            past_texts=past_texts,
+            topic="quote",
+            query="work",
+            params={**PARAMS, "top_k": 1},
+        )
+        assert selected == [PAST_TEXTS[3], PAST_TEXTS[1]]
+
+    def test_token_budget_cuts_the_selection(self, past_texts):
+        selected = select_past_texts(
+            past_texts=past_texts,
+            topic="quote",
+            query="love",
+            params={"recent_k": 3, "top_k": 3, "token_budget": 20},
+        )
+        assert selected == [PAST_TEXTS[3]]
+
+    def test_index_is_kept_on_disk(self, past_texts, tmp_path):
+        params = {**PARAMS, "index_dir": str(tmp_path)}
+        select_past_texts(
+            past_texts=past_texts, topic="quote.love", query="love", params=params
+        )
+        index = PastTextIndex.load(tmp_path / "quote.love.npz")
+        assert index.texts == [PAST_TEXTS[0], PAST_TEXTS[3]]
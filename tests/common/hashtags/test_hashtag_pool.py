@@ -0,0 +1,53 @@
+"""Tests for the topic-keyed pools of scored hashtags."""
+
+import json
+import time
+
+import pytest
+
+from common.hashtags import HashtagPool
+
+WEEK = 7 * 86400
+
+
+@pytest.fixture()
+def pool(tmp_path):
+    return HashtagPool(directory=tmp_path)
+
+
+class TestHashtagPool:
+    def test_missing_pool_is_due(self, pool):
+        assert pool.get("love", max_age_seconds=WEEK) is None
+
+    def test_refreshed_pool_is_used(self, pool):
+        pool.update("love", ["#Love", "romance"], max_age_seconds=WEEK)
+        assert pool.get("love", max_age_seconds=WEEK) == {
+            "#love": 1.0,
+            "#romance": 1.0,
+        }
+
+    def test_small_pool_settles_after_max_refreshes(self, pool):
+        for refresh in range(3):
+            assert pool.get("love", WEEK, min_size=20, max_refreshes=3) is None
+            pool.update("love", [f"#love{refresh}"], max_age_seconds=WEEK)
+        assert len(pool.get("love", WEEK, min_size=20, max_refreshes=3)) == 3
+
+    def test_stale_pool_starts_a_new_interval(self, pool, tmp_path):
+        pool.update("love", ["#love"], max_age_seconds=WEEK)
+        filepath = tmp_path / "love.json"
+        data = json.loads(filepath.read_text())
+        data["refreshed_at"] = time.time() - 2 * WEEK
+        filepath.write_text(json.dumps(data))
+        assert pool.get("love", WEEK, min_size=20, max_refreshes=1) is None
+
+        pool.update("love", ["#romance"], max_age_seconds=WEEK)
+        assert pool.get("love", WEEK, min_size=20, max_refreshes=1) == {
+            "#love": 0.5,
+            "#romance": 1.0,
+        }
+
+    def test_sample_draws_without_replacement(self, pool):
+        scores = {"#love": 1.0, "#romance": 2.0, "#heart": 0.5}
+        hashtags = pool.sample(scores, k=2)
+        assert len(set(hashtags)) == 2
+        assert set(hashtags) <= set(scores)
@@ -0,0 +1 @@
+"""Tests for the reuse of node outputs."""
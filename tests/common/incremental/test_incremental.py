@@ -0,0 +1,107 @@
+"""Tests for the fingerprint-based reuse of node outputs."""
+
+from functools import partial
+
+import pandas as pd
+import pytest
+from kedro.pipeline import node
+
+from common.incremental import IncrementalFunction, NodeOutputStore
+
+
+class _CountingFunction:
+    """Node function counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, topic, past_texts=None, params=None):
+        self.calls += 1
+        return f"{topic} {params}"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NodeOutputStore(directory=str(tmp_path))
+
+
+def _incremental(func, inputs, store, excluded_inputs=("past_texts",)):
+    return IncrementalFunction(
+        node=node(func, inputs, "text", name="quote.love.create_text"),
+        store=store,
+        excluded_inputs=excluded_inputs,
+    )
+
+
+class TestIncrementalFunction:
+    def test_unchanged_fingerprint_reuses_the_outputs(self, store):
+        func = _CountingFunction()
+        incremental = _incremental(func, ["topic", "past_texts", "params:x"], store)
+        assert incremental("love", None, 1) == "love 1"
+        assert incremental("love", None, 1) == "love 1"
+        assert func.calls == 1
+
+    def test_changed_parameter_reruns(self, store):
+        func = _CountingFunction()
+        incremental = _incremental(func, ["topic", "past_texts", "params:x"], store)
+        incremental("love", None, 1)
+        assert incremental("love", None, 2) == "love 2"
+        assert func.calls == 2
+
+    def test_changed_code_reruns(self, store):
+        func = _CountingFunction()
+        _incremental(func, ["topic", "past_texts", "params:x"], store)("love", None, 1)
+
+        changed_func = _CountingFunction()
+        changed = partial(changed_func, params=2)
+        assert _incremental(changed, ["topic", "past_texts"], store)("love", None) == (
+            "love 2"
+        )
+        assert changed_func.calls == 1
+
+    def test_past_texts_are_excluded(self, store):
+        func = _CountingFunction()
+        incremental = _incremental(func, ["topic", "past_texts", "params:x"], store)
+        incremental("love", pd.DataFrame({"text": ["Stay hungry."]}), 1)
+        incremental("love", pd.DataFrame({"text": ["Stay hungry.", "Be kind."]}), 1)
+        assert func.calls == 1
+
+    def test_keyword_inputs_map_to_their_datasets(self, store):
+        func = _CountingFunction()
+        inputs = {"topic": "topic", "past_texts": "history", "params": "params:x"}
+        incremental = _incremental(func, inputs, store, excluded_inputs=("history",))
+        incremental(topic="love", past_texts=["a"], params=1)
+        incremental(topic="love", past_texts=["a", "b"], params=1)
+        assert func.calls == 1
+        incremental(topic="love", past_texts=["a", "b"], params=2)
+        assert func.calls == 2
+
+    def test_positional_inputs_map_to_their_datasets(self, store):
+        func = _CountingFunction()
+        incremental = _incremental(
+            func, ["topic", "history", "params:x"], store, excluded_inputs=("history",)
+        )
+        incremental("love", ["a"], 1)
+        incremental("love", ["a", "b"], 1)
+        assert func.calls == 1
+        incremental("hope", ["a", "b"], 1)
+        assert func.calls == 2
+
+    def test_unhashable_input_always_runs(self, store):
+        func = _CountingFunction()
+        incremental = _incremental(func, ["topic", "past_texts", "params:x"], store)
+        incremental(lambda: None, None, 1)
+        incremental(lambda: None, None, 1)
+        assert func.calls == 2
+
+
+class TestNodeOutputStore:
+    def test_load_requires_the_fingerprint(self, store):
+        store.save("node", "ab12", {"text": "Stay hungry."})
+        assert store.load("node", "ab12") == (True, {"text": "Stay hungry."})
+        assert store.load("node", "cd34") == (False, None)
+        assert store.load("other", "ab12") == (False, None)
+
+    def test_corrupt_outputs_are_ignored(self, store, tmp_path):
+        (tmp_path / "node.pkl").write_bytes(b"not a pickle")
+        assert store.load("node", "ab12") == (False, None)
@@ -0,0 +1,94 @@
+"""Tests for the durable queue of posts."""
+
+import time
+
+import pytest
+
+from common.insta_publish.publish_queue import (
+    FAILED,
+    IN_PROGRESS,
+    PENDING,
+    PUBLISHED,
+    PublishQueue,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return PublishQueue(filepath=str(tmp_path / "publish_queue.db"))
+
+
+class TestPublishQueue:
+    def test_enqueue_is_idempotent(self, queue):
+        first = queue.enqueue("quote.love", b"image", ".png", caption="#love")
+        second = queue.enqueue("quote.love", b"image", ".png", caption="#love")
+        other = queue.enqueue("quote.love", b"image", ".png", caption="#life")
+        assert first == second != other
+        assert queue.counts() == {PENDING: 2}
+
+    def test_claim_oldest_post_of_account(self, queue):
+        queue.enqueue("quote.love", b"first", ".png", caption="")
+        queue.enqueue("quote.life", b"other", ".png", caption="")
+        queue.enqueue("quote.love", b"second", ".png", caption="")
+
+        post = queue.claim("quote.love", worker_id="worker")
+        assert (post.image, post.attempts) == (b"first", 1)
+        assert queue.claim("quote.love", worker_id="worker").image == b"second"
+        assert queue.claim("quote.love", worker_id="worker") is None
+        assert queue.counts() == {IN_PROGRESS: 2, PENDING: 1}
+
+    def test_mark_published(self, queue):
+        queue.enqueue("quote.love", b"image", ".png", caption="")
+        post = queue.claim("quote.love", worker_id="worker")
+        assert queue.mark_published(post, worker_id="worker", media_id="1")
+        assert queue.counts() == {PUBLISHED: 1}
+        assert queue.pending_accounts() == []
+
+    def test_mark_failed_retries_later(self, queue):
+        queue.enqueue("quote.love", b"image", ".png", caption="")
+        post = queue.claim("quote.love", worker_id="worker")
+        assert queue.mark_failed(
+            post, worker_id="worker", error="timeout", retry_in=60.0
+        )
+        assert queue.claim("quote.love", worker_id="worker") is None
+        assert queue.next_due("quote.love") >= time.time() + 59
+
+    def test_mark_failed_gives_up(self, queue):
+        queue.enqueue("quote.love", b"image", ".png", caption="")
+        post = queue.claim("quote.love", worker_id="worker")
+        queue.mark_failed(post, worker_id="worker", error="banned", retry_in=None)
+        assert queue.counts() == {FAILED: 1}
+        assert queue.next_due("quote.love") is None
+
+    def test_recover_keeps_active_leases(self, queue):
+        queue.enqueue("quote.love", b"image", ".png", caption="")
+        queue.claim("quote.love", worker_id="worker")
+        assert queue.recover() == 0
+        assert queue.counts() == {IN_PROGRESS: 1}
+
+    def test_recover_expired_leases_of_given_accounts(self, tmp_path):
+        queue = PublishQueue(filepath=str(tmp_path / "publish_queue.db"), lease=0.0)
+        queue.enqueue("quote.love", b"love", ".png", caption="")
+        queue.enqueue("quote.life", b"life", ".png", caption="")
+        queue.claim("quote.love", worker_id="crashed")
+        queue.claim("quote.life", worker_id="crashed")
+
+        assert queue.recover(["quote.love"]) == 1
+        post = queue.claim("quote.love", worker_id="worker")
+        assert (post.image, post.attempts) == (b"love", 2)
+        assert queue.recover() == 2
+
+    def test_expired_lease_cannot_mark_reclaimed_post(self, tmp_path):
+        queue = PublishQueue(filepath=str(tmp_path / "publish_queue.db"), lease=0.0)
+        queue.enqueue("quote.love", b"image", ".png", caption="")
+        stale = queue.claim("quote.love", worker_id="stale")
+        assert queue.recover() == 1
+        post = queue.claim("quote.love", worker_id="worker")
+
+        assert not queue.mark_published(stale, worker_id="stale", media_id="1")
+        assert not queue.mark_failed(
+            stale, worker_id="stale", error="timeout", retry_in=None
+        )
+        assert queue.counts() == {IN_PROGRESS: 1}
+        assert queue.mark_published(post, worker_id="worker", media_id="2")
+        assert queue.counts() == {PUBLISHED: 1}
@@ -0,0 +1,99 @@
+"""Tests for the Instagram publisher reusing logged-in sessions."""
+
+import json
+
+import pytest
+from instagrapi.exceptions import LoginRequired
+
+from common.insta_publish.publisher import InstagramPublisher
+
+CREDENTIALS = {"quote": {"love": {"username": "love", "password": "secret"}}}
+
+
+class FakeClient:
+    """Stand-in for ``instagrapi.Client`` recording its calls."""
+
+    instances: list["FakeClient"] = []
+
+    def __init__(self):
+        self.settings = {"uuids": {"device": f"device-{len(self.instances)}"}}
+        self.loaded_settings = None
+        self.logins = []
+        self.uploads = []
+        self.expired_uploads = 0
+        self.instances.append(self)
+
+    def load_settings(self, path):
+        self.loaded_settings = json.loads(path.read_text())
+        self.settings = self.loaded_settings
+
+    def set_uuids(self, uuids):
+        self.settings = {**self.settings, "uuids": uuids}
+
+    def get_settings(self):
+        return self.settings
+
+    def dump_settings(self, path):
+        path.write_text(json.dumps(self.settings))
+
+    def login(self, username, password):
+        self.logins.append((username, password))
+
+    def photo_upload(self, path, caption):
+        if self.expired_uploads:
+            self.expired_uploads -= 1
+            raise LoginRequired("expired")
+        self.uploads.append((path, caption))
+        return f"media-{len(self.uploads)}"
+
+
+@pytest.fixture(autouse=True)
+def clients():
+    FakeClient.instances = []
+    return FakeClient.instances
+
+
+def _publisher(session_dir):
+    return InstagramPublisher(
+        credentials=CREDENTIALS,
+        session_dir=None if session_dir is None else str(session_dir),
+        client_factory=FakeClient,
+    )
+
+
+class TestInstagramPublisher:
+    def test_logs_in_once_per_account(self, tmp_path, clients):
+        publisher = _publisher(tmp_path)
+        assert publisher.upload_photo("quote.love", "a.png", caption="#a") == "media-1"
+        assert publisher.upload_photo("quote.love", "b.png", caption="#b") == "media-2"
+        assert len(clients) == 1
+        assert clients[0].logins == [("love", "secret")]
+        assert clients[0].uploads == [("a.png", "#a"), ("b.png", "#b")]
+
+    def test_persists_settings(self, tmp_path, clients):
+        _publisher(tmp_path).upload_photo("quote.love", "a.png", caption="")
+        settings = json.loads((tmp_path / "quote.love.json").read_text())
+        assert settings == clients[0].settings
+
+    def test_resumes_persisted_session(self, tmp_path, clients):
+        (tmp_path / "quote.love.json").write_text(
+            json.dumps({"uuids": {"device": "stored"}})
+        )
+        _publisher(tmp_path).upload_photo("quote.love", "a.png", caption="")
+        assert clients[0].loaded_settings == {"uuids": {"device": "stored"}}
+
+    def test_logs_in_again_when_session_expired(self, tmp_path, clients):
+        publisher = _publisher(tmp_path)
+        publisher.upload_photo("quote.love", "a.png", caption="")
+        clients[0].expired_uploads = 1
+
+        assert publisher.upload_photo("quote.love", "b.png", caption="") == "media-1"
+        assert len(clients) == 2
+        assert clients[1].loaded_settings is None
+        assert clients[1].settings["uuids"] == clients[0].settings["uuids"]
+        assert clients[1].uploads == [("b.png", "")]
+
+    def test_sessions_in_memory_only(self, tmp_path, clients):
+        _publisher(None).upload_photo("quote.love", "a.png", caption="")
+        assert clients[0].logins == [("love", "secret")]
+        assert not list(tmp_path.iterdir())
@@ -0,0 +1,85 @@
+"""Tests for the collection and export of the metrics of a run."""
+
+import csv
+import json
+import threading
+
+import pytest
+
+from common.instrumentation.run_metrics import RunMetrics, format_summary
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    return RunMetrics(directory=str(tmp_path / "metrics"))
+
+
+def _run_node(metrics, name, namespace="quote.love"):
+    metrics.start_node(name)
+    metrics.end_node(name, namespace=namespace)
+
+
+class TestRunMetrics:
+    def test_summary_per_node_namespace_and_dataset(self, metrics):
+        _run_node(metrics, "create_text")
+        _run_node(metrics, "create_image")
+        _run_node(metrics, "merge", namespace=None)
+        for _ in range(2):
+            metrics.start_dataset("quote.love.text", "load")
+            metrics.end_dataset("quote.love.text", "load")
+
+        summary = metrics.summary({"llm_calls": 2})
+        assert [timing["node"] for timing in summary["nodes"]] == [
+            "create_text",
+            "create_image",
+            "merge",
+        ]
+        assert set(summary["namespaces"]) == {"quote.love", ""}
+        assert summary["datasets"]["load:quote.love.text"]["count"] == 2
+        assert summary["llm"] == {"llm_calls": 2}
+
+    def test_end_without_start_is_ignored(self, metrics):
+        metrics.end_node("create_text", namespace="quote.love")
+        metrics.end_dataset("quote.love.text", "save")
+        summary = metrics.summary({})
+        assert (summary["nodes"], summary["datasets"]) == ([], {})
+
+    def test_timings_are_kept_per_thread(self, metrics):
+        threads = [
+            threading.Thread(target=_run_node, args=(metrics, "create_text", topic))
+            for topic in ("quote.love", "quote.life", "quote.hope")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(metrics.summary({})["namespaces"]) == 3
+
+    def test_reset_starts_new_run(self, metrics):
+        _run_node(metrics, "create_text")
+        metrics.reset()
+        assert metrics.summary({})["nodes"] == []
+
+    def test_write(self, metrics, tmp_path):
+        _run_node(metrics, 'create "text"')
+        metrics.write({"prompt_tokens": 120})
+        metrics.write({"prompt_tokens": 120})
+
+        directory = tmp_path / "metrics"
+        summary = json.loads((directory / "run_metrics.json").read_text())
+        assert summary["llm"] == {"prompt_tokens": 120}
+        prometheus = (directory / "auto_insta.prom").read_text()
+        assert 'auto_insta_llm{counter="prompt_tokens"} 120' in prometheus
+        assert 'node="create \\"text\\""' in prometheus
+        with (directory / "node_metrics.csv").open() as file:
+            rows = list(csv.DictReader(file))
+        assert [row["node"] for row in rows] == ['create "text"'] * 2
+        assert not list(directory.glob("*.tmp"))
+
+
+def test_format_summary(metrics):
+    _run_node(metrics, "create_text")
+    table = format_summary(metrics.summary({"llm_calls": 3}))
+    assert "quote.love" in table
+    assert "  create_text" in table
+    assert "LLM: 3 calls" in table
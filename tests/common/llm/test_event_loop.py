@@ -0,0 +1,58 @@
+"""Tests for the background event loop of the asynchronous LLM calls."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.llm.event_loop import as_sync, run_coroutine, shutdown_event_loop
+
+
+@pytest.fixture(autouse=True)
+def _shutdown_event_loop():
+    yield
+    shutdown_event_loop()
+
+
+async def _running_loop():
+    return asyncio.get_running_loop()
+
+
+class TestEventLoop:
+    def test_as_sync_from_worker_threads(self):
+        in_flight = {"current": 0, "peak": 0}
+
+        async def double(value):
+            in_flight["current"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+            await asyncio.sleep(0.05)
+            in_flight["current"] -= 1
+            return value * 2, threading.current_thread().name
+
+        sync_double = as_sync(double)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(sync_double, range(16)))
+
+        assert sync_double.__name__ == "double"
+        assert results == [(value * 2, "llm-event-loop") for value in range(16)]
+        assert in_flight["peak"] > 1
+
+    def test_errors_are_raised_in_the_caller(self):
+        async def fail():
+            raise KeyError("missing")
+
+        with pytest.raises(KeyError, match="missing"):
+            run_coroutine(fail())
+
+    def test_shutdown_and_restart(self):
+        loop = run_coroutine(_running_loop())
+        assert run_coroutine(_running_loop()) is loop
+
+        shutdown_event_loop()
+        assert loop.is_closed()
+        shutdown_event_loop()
+
+        restarted_loop = run_coroutine(_running_loop())
+        assert restarted_loop is not loop
+        assert restarted_loop.is_running()
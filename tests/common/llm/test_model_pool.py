@@ -0,0 +1,153 @@
+"""Tests for the pool of warm LLM handles."""
+
+import sys
+import threading
+import types
+
+import pytest
+
+from common.llm.model_pool import get_llm, model_pool, shutdown_llms, warmup_llms
+
+
+class _FakeModel:
+    """Fake local model recording its settings and prompts."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.prompts = []
+        self.client = types.SimpleNamespace(closed=False)
+        self.client.close = lambda: setattr(self.client, "closed", True)
+
+    def invoke(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return ""
+
+
+@pytest.fixture
+def created_models(monkeypatch):
+    created_models = []
+
+    def create_local_model(**settings):
+        created_models.append(_FakeModel(**settings))
+        return created_models[-1]
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(model_pool, "_create_local_model", create_local_model)
+    yield created_models
+    shutdown_llms()
+
+
+class TestGetLLM:
+    def test_equal_settings_share_one_handle(self, created_models):
+        settings = {"model": "models/large.gguf", "n_ctx": 2048, "n_threads": 8}
+        pooled = get_llm(settings)
+        # Settings of the other backend do not create another handle.
+        assert get_llm({**settings, "temperature": 0.7}) is pooled
+        assert get_llm(dict(reversed(settings.items()))) is pooled
+        assert len(created_models) == 1
+        assert created_models[0].settings == settings
+        assert pooled.local
+
+    @pytest.mark.parametrize(
+        "other_settings",
+        [
+            {"model": "models/large.gguf", "n_ctx": 4096},
+            {"model": "models/small.gguf", "n_ctx": 2048},
+        ],
+    )
+    def test_different_settings_do_not_share(self, created_models, other_settings):
+        pooled = get_llm({"model": "models/large.gguf", "n_ctx": 2048})
+        assert get_llm(other_settings) is not pooled
+        assert [model.settings for model in created_models][-1] == other_settings
+
+    def test_hashtag_model(self, created_models):
+        settings = {"model": "models/large.gguf", "hashtag_model": "models/small.gguf"}
+        assert get_llm(settings, hashtags=True) is not get_llm(settings)
+        assert [model.settings["model"] for model in created_models] == [
+            "models/small.gguf",
+            "models/large.gguf",
+        ]
+
+    def test_model_is_loaded_once_by_concurrent_threads(self, created_models):
+        handles = []
+        threads = [
+            threading.Thread(target=lambda: handles.append(get_llm()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(created_models) == 1
+        assert all(handle is handles[0] for handle in handles)
+
+
+class TestWarmupAndShutdown:
+    def test_warmup_loads_and_primes_the_models(self, created_models):
+        warmup_llms([{"model": "models/large.gguf"}], prime=True)
+        assert len(created_models) == 1
+        assert created_models[0].prompts == ["Hello"]
+        assert get_llm({"model": "models/large.gguf"}).calls == 1
+
+    def test_warmup_loads_the_hashtag_models(self, created_models):
+        warmup_llms(
+            [{"model": "models/large.gguf", "hashtag_model": "models/small.gguf"}]
+        )
+        assert [model.settings["model"] for model in created_models] == [
+            "models/large.gguf",
+            "models/small.gguf",
+        ]
+        assert not any(model.prompts for model in created_models)
+
+    def test_shutdown_clears_the_pool(self, created_models):
+        pooled = get_llm()
+        shutdown_llms()
+        assert created_models[0].client.closed
+        assert get_llm() is not pooled
+        assert len(created_models) == 2
+
+    def test_openai_endpoints_share_the_http_clients(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        try:
+            cold = get_llm({"model_name": "gpt-4o-mini", "temperature": 0.0})
+            warm = get_llm({"model_name": "gpt-4o-mini", "temperature": 0.7})
+            assert cold is not warm
+            assert not cold.local
+            assert cold.llm.http_client is warm.llm.http_client
+            assert cold.llm.http_async_client is warm.llm.http_async_client
+            http_client = cold.llm.http_client
+        finally:
+            shutdown_llms()
+        assert http_client.is_closed
+        assert model_pool._HTTP_CLIENT is None
+
+
+def test_local_model_passes_the_context_size(monkeypatch):
+    loaded_models = []
+
+    class FakeGPT4All:
+        model_type = "llama"
+
+        def __init__(self, model_name, **kwargs):
+            loaded_models.append((model_name, kwargs))
+
+    monkeypatch.setitem(
+        sys.modules, "gpt4all", types.SimpleNamespace(GPT4All=FakeGPT4All)
+    )
+    llm = model_pool._create_local_model(
+        model="models/small.gguf", n_threads=4, n_ctx=4096
+    )
+    assert loaded_models == [
+        (
+            "small.gguf",
+            {
+                "model_path": "models/",
+                "model_type": None,
+                "allow_download": False,
+                "n_threads": 4,
+                "device": "cpu",
+                "n_ctx": 4096,
+            },
+        )
+    ]
+    assert (llm.n_ctx, llm.n_batch, llm.backend) == (4096, 8, "llama")
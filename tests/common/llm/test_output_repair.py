@@ -0,0 +1,73 @@
+"""Tests for the local repair of malformed LLM output."""
+
+import json
+
+import pytest
+
+from common.llm.flow_modules.generate_query import Hashtag, Quote, TextBatch
+from common.llm.output_repair import repair_output
+
+
+def _repaired(raw_output, pydantic_object=Quote):
+    repaired = repair_output(raw_output=raw_output, pydantic_object=pydantic_object)
+    return None if repaired is None else json.loads(repaired)
+
+
+class TestRepairOutput:
+    def test_valid_json_is_kept(self):
+        assert _repaired('{"text": "Stay hungry."}') == {"text": "Stay hungry."}
+
+    def test_embedded_json_is_extracted(self):
+        raw_output = 'Sure! Here it is: {"text": "Stay hungry."} Hope it helps.'
+        assert _repaired(raw_output) == {"text": "Stay hungry."}
+
+    def test_code_fence_and_trailing_comma(self):
+        raw_output = '```json\n{"text": "Stay hungry.",}\n```'
+        assert _repaired(raw_output) == {"text": "Stay hungry."}
+
+    def test_single_quotes(self):
+        assert _repaired("{'text': 'Stay hungry.'}") == {"text": "Stay hungry."}
+
+    def test_first_of_multiple_objects_is_used(self):
+        raw_output = '{"text": "Stay hungry."}\n{"text": "Stay foolish."}'
+        assert _repaired(raw_output) == {"text": "Stay hungry."}
+
+    def test_first_of_multiple_single_quoted_objects_is_used(self):
+        raw_output = "{'text': 'Stay hungry.'} {'text': 'Stay foolish.'}"
+        assert _repaired(raw_output) == {"text": "Stay hungry."}
+
+    @pytest.mark.parametrize(
+        "raw_output",
+        [
+            '{"text": "Stay hung',
+            '{"text": "Stay hungry."',
+            'Here it is: {"text": "Stay',
+            '["#travel", "#sun',
+        ],
+    )
+    def test_truncated_json_is_not_repaired(self, raw_output):
+        assert _repaired(raw_output) is None
+        assert _repaired(raw_output, pydantic_object=Hashtag) is None
+
+    def test_plain_text_becomes_the_text(self):
+        assert _repaired('"Stay hungry."') == {"text": "Stay hungry."}
+
+    def test_renamed_single_field(self):
+        assert _repaired('{"quote": "Stay hungry."}') == {"text": "Stay hungry."}
+
+    def test_echoed_schema(self):
+        raw_output = '{"properties": {"text": "Stay hungry."}}'
+        assert _repaired(raw_output) == {"text": "Stay hungry."}
+
+    def test_plain_hashtags(self):
+        assert _repaired("#travel, sun\n#beach", pydantic_object=Hashtag) == {
+            "hashtag": ["#travel", "#sun", "#beach"]
+        }
+
+    def test_hashtag_list(self):
+        assert _repaired('["travel", "#sun"]', pydantic_object=Hashtag) == {
+            "hashtag": ["#travel", "#sun"]
+        }
+
+    def test_multiple_fields_are_not_coerced(self):
+        assert _repaired("Stay hungry.", pydantic_object=TextBatch) is None
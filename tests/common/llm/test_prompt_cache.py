@@ -0,0 +1,152 @@
+"""Tests for the on-disk cache of parsed LLM responses."""
+
+import os
+import time
+
+import pytest
+
+from common.llm.flow_modules.generate_query import Hashtag, Quote
+from common.llm.model_pool import PooledLLM
+from common.llm.prompt_cache import PromptCache
+from common.llm.prompt_engineering import functions
+
+
+class _LLM:
+    def __init__(self, model="model", temperature=None, temp=None):
+        self.model = model
+        self.temperature = temperature
+        self.temp = temp
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PromptCache(directory=str(tmp_path / "llm_cache"), max_entries=2)
+
+
+def _touch(cache_directory, key, modified):
+    (filepath,) = cache_directory.glob(f"*/{key}.json")
+    os.utime(filepath, (modified, modified))
+
+
+@pytest.fixture(autouse=True)
+def cache_mode(monkeypatch):
+    monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "on")
+
+
+class TestPromptCacheKey:
+    def test_same_prompt_same_key(self):
+        assert PromptCache.key("prompt", Quote, _LLM()) == PromptCache.key(
+            "prompt", Quote, _LLM()
+        )
+
+    @pytest.mark.parametrize(
+        ("prompt", "pydantic_object", "llm"),
+        [
+            ("other prompt", Quote, _LLM()),
+            ("prompt", Hashtag, _LLM()),
+            ("prompt", Quote, _LLM(model="other")),
+            ("prompt", Quote, _LLM(temperature=0.7)),
+        ],
+    )
+    def test_key_changes(self, prompt, pydantic_object, llm):
+        assert PromptCache.key(prompt, pydantic_object, llm) != PromptCache.key(
+            "prompt", Quote, _LLM()
+        )
+
+    def test_zero_temperature_is_kept(self):
+        assert PromptCache.key("prompt", Quote, _LLM(temperature=0.0)) != (
+            PromptCache.key("prompt", Quote, _LLM(temperature=None, temp=0.7))
+        )
+
+
+class TestPromptCache:
+    def test_set_and_get(self, cache):
+        key = PromptCache.key("prompt", Quote, _LLM())
+        assert cache.get(key, Quote) is None
+        cache.set(key, Quote(text="Stay hungry."))
+        assert cache.get(key, Quote) == Quote(text="Stay hungry.")
+
+    def test_off_mode(self, cache, monkeypatch):
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "off")
+        cache.set("key", Quote(text="Stay hungry."))
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "on")
+        assert cache.get("key", Quote) is None
+
+    def test_refresh_mode_writes_only(self, cache, monkeypatch):
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "refresh")
+        cache.set("key", Quote(text="Stay hungry."))
+        assert cache.get("key", Quote) is None
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "on")
+        assert cache.get("key", Quote) == Quote(text="Stay hungry.")
+
+    def test_replay_mode_fails_on_miss(self, cache, monkeypatch):
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "replay")
+        with pytest.raises(KeyError):
+            cache.get("key", Quote)
+
+    def test_invalid_mode(self, cache, monkeypatch):
+        monkeypatch.setenv("AUTO_INSTA_LLM_CACHE", "sometimes")
+        with pytest.raises(ValueError, match="AUTO_INSTA_LLM_CACHE"):
+            cache.get("key", Quote)
+
+    def test_expired_entry(self, cache, tmp_path):
+        cache.set("key", Quote(text="Stay hungry."))
+        _touch(tmp_path / "llm_cache", "key", time.time() - 31 * 24 * 3600)
+        assert cache.get("key", Quote) is None
+
+    def test_evict_oldest_entries(self, cache, tmp_path):
+        for position, key in enumerate(["a1", "b2", "c3"]):
+            cache.set(key, Quote(text=key))
+            _touch(tmp_path / "llm_cache", key, time.time() - 10 + position)
+        assert cache.evict() == 1
+        assert cache.get("a1", Quote) is None
+        assert cache.get("c3", Quote) == Quote(text="c3")
+
+
+class TestReadCache:
+    @pytest.fixture(autouse=True)
+    def prompt_cache(self, cache, monkeypatch):
+        monkeypatch.setattr(functions, "PROMPT_CACHE", cache)
+        return cache
+
+    @staticmethod
+    def _read_cache(past_texts, refresh_cache=False, use_cache=True):
+        inputs = {"topic": "love", "past_texts": past_texts}
+        output_parser = functions.PydanticOutputParser(pydantic_object=Quote)
+        return functions._read_cache(
+            prompt=functions._build_prompt(
+                template="{topic} {past_texts}",
+                inputs=inputs,
+                output_parser=output_parser,
+            ),
+            inputs=inputs,
+            output_parser=output_parser,
+            pooled_llm=PooledLLM(key=(), llm=_LLM(), load_seconds=0.0, local=False),
+            use_cache=use_cache,
+            refresh_cache=refresh_cache,
+        )
+
+    def test_key_is_the_rendered_prompt(self, prompt_cache):
+        key, _ = self._read_cache(["Stay hungry."])
+        assert key == PromptCache.key("love ['Stay hungry.']", Quote, _LLM())
+
+    def test_past_texts_are_part_of_the_key(self):
+        assert self._read_cache(["Stay hungry."])[0] == (
+            self._read_cache(["Stay hungry."])[0]
+        )
+        assert self._read_cache(["Stay hungry."])[0] != (
+            self._read_cache(["Stay hungry.", "Stay foolish."])[0]
+        )
+
+    def test_cached_response_is_returned(self, prompt_cache):
+        key, _ = self._read_cache(["Stay hungry."])
+        prompt_cache.set(key, Quote(text="Stay foolish."))
+        assert self._read_cache(["Stay hungry."]) == (key, Quote(text="Stay foolish."))
+
+    def test_refresh_ignores_the_cached_response(self, prompt_cache):
+        key, _ = self._read_cache(["Stay hungry."])
+        prompt_cache.set(key, Quote(text="Stay foolish."))
+        assert self._read_cache(["Stay hungry."], refresh_cache=True) == (key, None)
+
+    def test_disabled_cache(self):
+        assert self._read_cache(["Stay hungry."], use_cache=False) == (None, None)
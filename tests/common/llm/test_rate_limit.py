@@ -0,0 +1,72 @@
+"""Tests for the token bucket limiting the calls to the LLM."""
+
+import asyncio
+
+import pytest
+
+from common.llm.rate_limit import TokenBucket
+from common.llm.rate_limit import rate_limit
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def asleep(self, seconds):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", clock.asleep)
+    return clock
+
+
+class TestTokenBucket:
+    def test_burst_is_not_delayed(self, clock):
+        bucket = TokenBucket(requests_per_minute=60, burst=3)
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.sleeps == []
+
+    def test_requests_beyond_the_burst_wait_for_the_rate(self, clock):
+        bucket = TokenBucket(requests_per_minute=30, burst=1)
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.sleeps == pytest.approx([2.0, 2.0])
+        assert clock.now == pytest.approx(4.0)
+
+    def test_tokens_refill_up_to_the_burst(self, clock):
+        bucket = TokenBucket(requests_per_minute=60, burst=2)
+        bucket.acquire()
+        bucket.acquire()
+        clock.now += 60
+        for _ in range(3):
+            bucket.acquire()
+        assert clock.sleeps == pytest.approx([1.0])
+
+    def test_async_acquire_waits_without_blocking(self, clock):
+        bucket = TokenBucket(requests_per_minute=60, burst=1)
+
+        async def acquire_twice():
+            await bucket.aacquire()
+            await bucket.aacquire()
+
+        asyncio.run(acquire_twice())
+        assert clock.sleeps == pytest.approx([1.0])
+
+    def test_reset_changes_the_rate_and_refills(self, clock):
+        bucket = TokenBucket(requests_per_minute=60, burst=1)
+        bucket.acquire()
+        bucket.reset(requests_per_minute=120, burst=1)
+        bucket.acquire()
+        bucket.acquire()
+        assert clock.sleeps == pytest.approx([0.5])
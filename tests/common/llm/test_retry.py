@@ -0,0 +1,193 @@
+"""Tests for the error classification, backoff and retry budget of LLM calls."""
+
+import asyncio
+
+import httpx
+import openai
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models.fake import FakeListLLM
+
+from common.llm.flow_modules.generate_query import Quote, TextBatch
+from common.llm.model_pool import PooledLLM
+from common.llm.prompt_engineering import functions
+from common.llm.rate_limit import TokenBucket
+from common.llm.retry import (
+    RETRY_BUDGET,
+    RetryBudget,
+    RetryBudgetExhaustedError,
+    backoff_delay,
+    classify_error,
+)
+from common.llm.retry.retry import FATAL, OTHER, PARSE, RATE_LIMIT, TIMEOUT
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+class _FlakyLLM(FakeListLLM):
+    """Fake LLM raising an error instead of the responses ``fail`` and ``fatal``."""
+
+    def _call(self, *args, **kwargs):
+        response = super()._call(*args, **kwargs)
+        if response == "fail":
+            raise openai.APIConnectionError(request=_REQUEST)
+        if response == "fatal":
+            raise _status_error(openai.AuthenticationError, 401)
+        return response
+
+    async def _acall(self, *args, **kwargs):
+        return self._call(*args, **kwargs)
+
+
+def _retry(llm, pydantic_object=Quote, retrying=functions._retrying_after_failure):
+    output_parser = functions.PydanticOutputParser(pydantic_object=pydantic_object)
+    return retrying(
+        pooled_llm=PooledLLM(key=(), llm=llm, load_seconds=0.0, local=False),
+        prompt=functions._build_prompt(
+            template="{topic}", inputs={"topic": "love"}, output_parser=output_parser
+        ),
+        output_parser=output_parser,
+        inputs={"topic": "love"},
+    )
+
+
+def _status_error(error_type, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers, request=_REQUEST)
+    return error_type("error", response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter(monkeypatch):
+    rate_limiter = TokenBucket(requests_per_minute=60_000, burst=100)
+    monkeypatch.setattr(functions, "LLM_RATE_LIMITER", rate_limiter)
+    return rate_limiter
+
+
+@pytest.fixture
+def retry_budget():
+    max_retries = RETRY_BUDGET._max_retries
+    yield RETRY_BUDGET
+    RETRY_BUDGET.reset(max_retries=max_retries)
+
+
+class TestClassifyError:
+    @pytest.mark.parametrize(
+        ("error", "error_class"),
+        [
+            (_status_error(openai.RateLimitError, 429), RATE_LIMIT),
+            (openai.APITimeoutError(request=_REQUEST), TIMEOUT),
+            (openai.APIConnectionError(request=_REQUEST), TIMEOUT),
+            (httpx.ReadTimeout("timeout"), TIMEOUT),
+            (OutputParserException("broken"), PARSE),
+            (ValueError("broken"), PARSE),
+            (_status_error(openai.AuthenticationError, 401), FATAL),
+            (_status_error(openai.BadRequestError, 400), FATAL),
+            (_status_error(openai.NotFoundError, 404), FATAL),
+            (KeyError("other"), OTHER),
+        ],
+    )
+    def test_error_class(self, error, error_class):
+        assert classify_error(error) == error_class
+
+
+class TestBackoffDelay:
+    @pytest.mark.parametrize(
+        ("attempt", "upper_bound"), [(1, 1.0), (3, 4.0), (8, 60.0)]
+    )
+    def test_delay_is_jittered_below_the_exponential_bound(
+        self, monkeypatch, attempt, upper_bound
+    ):
+        monkeypatch.setattr("random.uniform", lambda low, high: (low, high))
+        assert backoff_delay(attempt, KeyError("other")) == (0, upper_bound)
+
+    def test_delays_vary(self):
+        delays = {backoff_delay(4, KeyError("other")) for _ in range(20)}
+        assert len(delays) > 1
+        assert all(0 <= delay <= 8.0 for delay in delays)
+
+    def test_parse_errors_are_retried_right_away(self):
+        assert backoff_delay(5, ValueError("broken")) == 0
+
+    def test_retry_after_header_is_respected(self):
+        error = _status_error(openai.RateLimitError, 429, {"retry-after": "120"})
+        assert backoff_delay(1, error) == 120.0
+
+
+class TestRetryBudget:
+    def test_exhausted_budget_raises(self):
+        budget = RetryBudget(max_retries=2)
+        budget.consume()
+        budget.consume()
+        with pytest.raises(RetryBudgetExhaustedError):
+            budget.consume()
+        assert budget.used == 2
+
+    def test_reset_restores_the_budget(self):
+        budget = RetryBudget(max_retries=1)
+        budget.consume()
+        budget.reset(max_retries=3)
+        assert budget.used == 0
+        for _ in range(3):
+            budget.consume()
+        with pytest.raises(RetryBudgetExhaustedError):
+            budget.consume()
+
+
+class TestRetryingAfterFailure:
+    def test_exhausted_budget_is_not_retried(self, retry_budget):
+        retry_budget.reset(max_retries=0)
+        with pytest.raises(RetryBudgetExhaustedError):
+            functions._prepare_retry(
+                RetryBudgetExhaustedError("exhausted"), attempt=1, max_attempts=10
+            )
+        assert retry_budget.used == 0
+
+    def test_exhausted_budget_of_an_output_fix_propagates(self, retry_budget):
+        retry_budget.reset(max_retries=0)
+        with pytest.raises(RetryBudgetExhaustedError):
+            _retry(FakeListLLM(responses=["Stay hungry."]), pydantic_object=TextBatch)
+        assert retry_budget.used == 0
+
+    def test_failed_attempts_are_retried(self, monkeypatch, retry_budget):
+        retry_budget.reset(max_retries=5)
+        monkeypatch.setattr(functions.time, "sleep", lambda _: None)
+        desired_object = _retry(
+            _FlakyLLM(responses=["fail", "fail", '{"text": "Stay hungry."}'])
+        )
+        assert desired_object.text == "Stay hungry."
+        assert retry_budget.used == 2
+
+    def test_every_llm_call_is_rate_limited(self, monkeypatch, retry_budget):
+        retry_budget.reset(max_retries=5)
+        monkeypatch.setattr(functions.time, "sleep", lambda _: None)
+        acquisitions = []
+        monkeypatch.setattr(
+            functions.LLM_RATE_LIMITER, "acquire", lambda: acquisitions.append(1)
+        )
+        _retry(
+            _FlakyLLM(responses=["fail", "Stay hungry.", '{"texts": []}']),
+            pydantic_object=TextBatch,
+        )
+        assert len(acquisitions) == 3
+
+    def test_failed_async_attempts_are_retried(self, monkeypatch, retry_budget):
+        retry_budget.reset(max_retries=5)
+
+        async def sleep(_):
+            pass
+
+        monkeypatch.setattr(functions.asyncio, "sleep", sleep)
+        desired_object = asyncio.run(
+            _retry(
+                _FlakyLLM(responses=["fail", '{"text": "Stay hungry."}']),
+                retrying=functions._aretrying_after_failure,
+            )
+        )
+        assert desired_object.text == "Stay hungry."
+        assert retry_budget.used == 1
+
+    def test_fatal_errors_are_not_retried(self, retry_budget):
+        retry_budget.reset(max_retries=5)
+        with pytest.raises(RuntimeError, match="fatal"):
+            _retry(_FlakyLLM(responses=["fatal", '{"text": "Stay hungry."}']))
+        assert retry_budget.used == 0
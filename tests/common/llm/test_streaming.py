@@ -0,0 +1,124 @@
+"""Tests for the streaming generation with early termination."""
+
+import asyncio
+import json
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import LLM
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.outputs import GenerationChunk
+from langchain_core.prompts import PromptTemplate
+
+from common.llm.streaming import (
+    TextFieldWatcher,
+    astream_text_field,
+    stream_text_field,
+)
+from common.llm.streaming.streaming import CLOSED, TOO_LONG
+
+
+def _feed(watcher, output, chunk_size=3):
+    statuses = [
+        watcher.feed(output[start : start + chunk_size])
+        for start in range(0, len(output), chunk_size)
+    ]
+    return [status for status in statuses if status is not None]
+
+
+class _StreamingLLM(LLM):
+    """Fake LLM streaming its response in chunks of three characters."""
+
+    response: str
+
+    @property
+    def _llm_type(self):
+        return "streaming"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        return self.response
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        for start in range(0, len(self.response), 3):
+            chunk = GenerationChunk(text=self.response[start : start + 3])
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def _chain(response):
+    return (
+        PromptTemplate.from_template("{topic}")
+        | _StreamingLLM(response=response)
+        | StrOutputParser()
+    )
+
+
+class TestTextFieldWatcher:
+    def test_closed_field(self):
+        watcher = TextFieldWatcher(max_length=100)
+        assert _feed(watcher, '{"text": "Love is patient."}')[0] == CLOSED
+        assert watcher.value == "Love is patient."
+
+    def test_escaped_quotes_do_not_close_the_field(self):
+        watcher = TextFieldWatcher()
+        output = json.dumps({"text": 'He said "stay hungry" \\ twice.'})
+        assert _feed(watcher, output, chunk_size=1)[0] == CLOSED
+        assert watcher.value == 'He said "stay hungry" \\ twice.'
+
+    def test_other_fields_are_skipped(self):
+        watcher = TextFieldWatcher()
+        _feed(watcher, '{"author": "Seneca", "text": "Luck is preparation."}')
+        assert watcher.value == "Luck is preparation."
+
+    def test_too_long(self):
+        watcher = TextFieldWatcher(max_length=10)
+        statuses = _feed(watcher, '{"text": "Stay hungry, stay foolish."}')
+        assert statuses[0] == TOO_LONG
+        assert watcher.value is None
+
+    def test_limit_counts_decoded_characters(self):
+        watcher = TextFieldWatcher(max_length=5)
+        _feed(watcher, '{"text": "\\"ab\\""}')
+        assert watcher.status == CLOSED
+        assert watcher.value == '"ab"'
+
+    def test_missing_field(self):
+        watcher = TextFieldWatcher(max_length=5)
+        assert _feed(watcher, '{"quote": "Stay hungry, stay foolish."}') == []
+        assert watcher.status is None
+        assert watcher.value is None
+
+
+class TestStreamTextField:
+    def test_closed_field_is_returned_as_text_object(self):
+        output = stream_text_field(
+            chain=_chain('{"text": "Love is patient."} and some trailing chatter'),
+            inputs={"topic": "love"},
+            max_length=100,
+        )
+        assert json.loads(output) == {"text": "Love is patient."}
+
+    def test_too_long_raises(self):
+        with pytest.raises(OutputParserException):
+            stream_text_field(
+                chain=_chain('{"text": "Stay hungry, stay foolish."}'),
+                inputs={"topic": "love"},
+                max_length=10,
+            )
+
+    def test_output_without_text_field_is_returned_as_is(self):
+        output = stream_text_field(
+            chain=_chain("Stay hungry, stay foolish."), inputs={"topic": "love"}, max_length=100
+        )
+        assert output == "Stay hungry, stay foolish."
+
+    def test_async_closed_field(self):
+        output = asyncio.run(
+            astream_text_field(
+                chain=_chain('{"text": "Love is patient."} and some trailing chatter'),
+                inputs={"topic": "love"},
+                max_length=100,
+            )
+        )
+        assert json.loads(output) == {"text": "Love is patient."}
@@ -0,0 +1,85 @@
+"""Tests for the callback counting the tokens of the LLM calls."""
+
+import uuid
+
+import pytest
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.outputs import Generation, LLMResult
+
+from common.llm.metrics import LLM_METRICS, TokenUsageCallback
+from common.utilities.tokens import estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    LLM_METRICS.reset()
+    yield
+    LLM_METRICS.reset()
+
+
+def _tokens():
+    snapshot = LLM_METRICS.snapshot()
+    return (
+        snapshot.get("llm_calls"),
+        snapshot.get("prompt_tokens"),
+        snapshot.get("completion_tokens"),
+    )
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcd") == 2
+    assert estimate_tokens("abcde") == 3
+
+
+class TestTokenUsageCallback:
+    def test_estimates_tokens_without_reported_usage(self):
+        callback = TokenUsageCallback()
+        run_id = uuid.uuid4()
+        callback.on_llm_start({}, ["a" * 16], run_id=run_id)
+        callback.on_llm_end(
+            LLMResult(generations=[[Generation(text="a" * 8)]]), run_id=run_id
+        )
+        assert _tokens() == (1, 5, 3)
+
+    def test_prefers_reported_usage(self):
+        callback = TokenUsageCallback()
+        run_id = uuid.uuid4()
+        callback.on_llm_start({}, ["a" * 16], run_id=run_id)
+        callback.on_llm_end(
+            LLMResult(
+                generations=[[Generation(text="a" * 8)]],
+                llm_output={
+                    "token_usage": {"prompt_tokens": 20, "completion_tokens": 7}
+                },
+            ),
+            run_id=run_id,
+        )
+        assert _tokens() == (1, 20, 7)
+
+    def test_counts_streamed_tokens(self):
+        callback = TokenUsageCallback()
+        run_id = uuid.uuid4()
+        callback.on_llm_start({}, ["prompt"], run_id=run_id)
+        for token in ("Love", " is", " patient"):
+            callback.on_llm_new_token(token, run_id=run_id)
+        callback.on_llm_end(
+            LLMResult(generations=[[Generation(text="Love is patient")]]),
+            run_id=run_id,
+        )
+        assert _tokens()[2] == 3
+
+    def test_records_tokens_of_stopped_call(self):
+        callback = TokenUsageCallback()
+        run_id = uuid.uuid4()
+        callback.on_llm_start({}, ["a" * 16], run_id=run_id)
+        callback.on_llm_new_token("Love", run_id=run_id)
+        callback.on_llm_error(RuntimeError("stopped"), run_id=run_id)
+        assert _tokens() == (1, 5, 1)
+
+    def test_calls_are_counted_separately(self):
+        llm = FakeListLLM(responses=["a" * 8, "a" * 4])
+        config = {"callbacks": [TokenUsageCallback()]}
+        llm.invoke("a" * 16, config=config)
+        llm.invoke("a" * 4, config=config)
+        assert _tokens() == (2, 7, 5)
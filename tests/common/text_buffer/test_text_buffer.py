@@ -0,0 +1,59 @@
+"""Tests for the buffers of pre-generated texts."""
+
+import pytest
+
+from common.text_buffer import TextBuffer
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    return TextBuffer(filepath=str(tmp_path / "text_buffer.db"))
+
+
+class TestTextBuffer:
+    def test_take_is_first_in_first_out(self, buffer):
+        buffer.push("quote.love", ["first", "second"])
+        assert buffer.take("quote.love") == "first"
+        assert buffer.take("quote.love") == "second"
+        assert buffer.take("quote.love") is None
+
+    def test_topics_are_separate(self, buffer):
+        buffer.push("quote.love", ["love"])
+        buffer.push("quote.life", ["life"])
+        assert buffer.take("quote.life") == "life"
+        assert buffer.take("quote.life") is None
+
+    def test_commit_removes_taken_texts(self, buffer):
+        buffer.push("quote.love", ["first", "second"])
+        buffer.take("quote.love")
+        assert buffer.commit() == 1
+        assert buffer.texts("quote") == ["second"]
+        assert buffer.commit() == 0
+
+    def test_release_puts_taken_texts_back(self, buffer):
+        buffer.push("quote.love", ["first", "second"])
+        buffer.take("quote.love")
+        assert buffer.counts("quote") == {"quote.love": 1}
+        assert buffer.release() == 1
+        assert buffer.counts("quote") == {"quote.love": 2}
+        assert buffer.take("quote.love") == "first"
+
+    def test_expired_lease_is_taken_again(self, tmp_path):
+        filepath = str(tmp_path / "text_buffer.db")
+        crashed = TextBuffer(filepath=filepath, lease=0.0)
+        crashed.push("quote.love", ["first"])
+        assert crashed.take("quote.love") == "first"
+        assert TextBuffer(filepath=filepath, lease=0.0).take("quote.love") == "first"
+
+    def test_leased_text_is_not_taken_twice(self, tmp_path):
+        filepath = str(tmp_path / "text_buffer.db")
+        TextBuffer(filepath=filepath).push("quote.love", ["first"])
+        assert TextBuffer(filepath=filepath).take("quote.love") == "first"
+        assert TextBuffer(filepath=filepath).take("quote.love") is None
+
+    def test_texts_and_counts_of_subtopics(self, buffer):
+        buffer.push("quote.love", ["love"])
+        buffer.push("quote.life", ["life", "more life"])
+        buffer.push("fact.space", ["space"])
+        assert buffer.texts("quote") == ["love", "life", "more life"]
+        assert buffer.counts("quote") == {"quote.love": 1, "quote.life": 2}
@@ -0,0 +1,88 @@
+"""Tests for the memoised base canvases."""
+
+import pytest
+from PIL import Image
+
+from common.utilities.canvas import canvas as canvas_module
+from common.utilities.canvas import clear_canvas_cache, get_canvas
+
+
+@pytest.fixture(autouse=True)
+def _clear_canvas_cache():
+    clear_canvas_cache()
+    yield
+    clear_canvas_cache()
+
+
+def _settings(**settings):
+    return {
+        "image_width": 40,
+        "image_length": 30,
+        "background_color": 255,
+        **settings,
+    }
+
+
+class TestGetCanvas:
+    def test_non_square_canvas_size(self):
+        canvas = get_canvas(_settings())
+        assert canvas.size == (40, 30)
+        assert canvas.mode == "RGB"
+        assert canvas.getpixel((39, 29)) == (255, 255, 255)
+
+    def test_background_color_string(self):
+        canvas = get_canvas(_settings(background_color="(10, 20, 30)"))
+        assert canvas.getpixel((0, 0)) == (10, 20, 30)
+
+    def test_base_canvas_is_copied_not_mutated(self, monkeypatch):
+        created = []
+        create_base_canvas = canvas_module._create_base_canvas
+        monkeypatch.setattr(
+            canvas_module,
+            "_create_base_canvas",
+            lambda settings: created.append(settings) or create_base_canvas(settings),
+        )
+
+        first = get_canvas(_settings())
+        first.paste((0, 0, 0), (0, 0, 40, 30))
+        second = get_canvas(_settings())
+
+        assert second is not first
+        assert second.getpixel((0, 0)) == (255, 255, 255)
+        assert len(created) == 1
+
+    def test_settings_are_cached_separately(self):
+        white = get_canvas(_settings())
+        black = get_canvas(_settings(background_color=0))
+        assert (white.getpixel((0, 0)), black.getpixel((0, 0))) == (
+            (255, 255, 255),
+            (0, 0, 0),
+        )
+
+    @pytest.mark.parametrize(
+        ("direction", "end_pixel"), [("vertical", (0, 29)), ("horizontal", (39, 0))]
+    )
+    def test_gradient(self, direction, end_pixel):
+        gradient = {
+            "start_color": [0, 0, 0],
+            "end_color": "(255, 128, 0)",
+            "direction": direction,
+        }
+        canvas = get_canvas(_settings(gradient=gradient))
+        assert canvas.size == (40, 30)
+        assert canvas.getpixel((0, 0)) == (0, 0, 0)
+        assert canvas.getpixel(end_pixel) == (255, 128, 0)
+
+    def test_unknown_gradient_direction(self):
+        gradient = {"start_color": 0, "end_color": 255, "direction": "diagonal"}
+        with pytest.raises(ValueError, match="diagonal"):
+            get_canvas(_settings(gradient=gradient))
+
+    def test_background_image_is_fitted(self, tmp_path):
+        filepath = tmp_path / "background.png"
+        Image.new("RGB", (80, 80), (200, 0, 0)).save(filepath)
+        canvas = get_canvas(
+            _settings(background_image=str(filepath), gradient={"start_color": 0})
+        )
+        assert canvas.size == (40, 30)
+        assert canvas.getpixel((20, 15)) == (200, 0, 0)
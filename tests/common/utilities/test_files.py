@@ -0,0 +1,29 @@
+"""Tests for the atomic and temporary files."""
+
+import pytest
+
+from common.utilities.files import open_atomically, temporary_file, write_atomically
+
+
+class TestOpenAtomically:
+    def test_creates_parent_directories(self, tmp_path):
+        filepath = tmp_path / "nested" / "pool.json"
+        write_atomically(filepath, "{}")
+        assert filepath.read_text() == "{}"
+        assert list(filepath.parent.iterdir()) == [filepath]
+
+    def test_failed_write_keeps_the_previous_file(self, tmp_path):
+        filepath = tmp_path / "outputs.pkl"
+        filepath.write_bytes(b"previous")
+        with pytest.raises(RuntimeError), open_atomically(filepath, mode="wb") as file:
+            file.write(b"partial")
+            raise RuntimeError
+        assert filepath.read_bytes() == b"previous"
+        assert list(tmp_path.iterdir()) == [filepath]
+
+
+def test_temporary_file_is_removed_afterwards():
+    with temporary_file(b"image", suffix=".png") as path:
+        assert path.suffix == ".png"
+        assert path.read_bytes() == b"image"
+    assert not path.exists()
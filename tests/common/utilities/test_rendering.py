@@ -0,0 +1,70 @@
+"""Tests for drawing texts on canvases in batches."""
+
+import pytest
+from PIL import ImageFont
+
+from common.utilities.rendering import rendering
+from common.utilities.rendering import render_images, render_images_to_files
+
+CANVAS_SETTINGS = {"image_width": 200, "image_length": 100, "background_color": 255}
+
+
+@pytest.fixture(scope="module")
+def font():
+    return ImageFont.load_default(size=20)
+
+
+def _text_dictionaries(font, count):
+    return [{f"Post {position} ": font, " ": font} for position in range(count)]
+
+
+class TestRenderImages:
+    def test_renders_in_order(self, font):
+        images = list(
+            render_images(
+                _text_dictionaries(font, 3),
+                canvas_settings=CANVAS_SETTINGS,
+                font_color=(0, 0, 0),
+                max_workers=1,
+            )
+        )
+        assert [image.size for image in images] == [(200, 100)] * 3
+        assert images[0].tobytes() != images[1].tobytes()
+        assert images[0].getextrema() != ((255, 255), (255, 255), (255, 255))
+
+    def test_in_process_does_not_touch_worker_fonts(self, font, monkeypatch):
+        monkeypatch.setattr(rendering, "_WORKER_FONTS", [])
+        list(
+            render_images(
+                _text_dictionaries(font, 2),
+                canvas_settings=CANVAS_SETTINGS,
+                font_color=(0, 0, 0),
+                max_workers=1,
+            )
+        )
+        assert rendering._WORKER_FONTS == []
+
+
+class TestRenderImagesToFiles:
+    def test_saves_images(self, font, tmp_path):
+        filepaths = [str(tmp_path / "images" / f"{i}.png") for i in range(2)]
+        written = list(
+            render_images_to_files(
+                _text_dictionaries(font, 2),
+                filepaths=filepaths,
+                canvas_settings=CANVAS_SETTINGS,
+                font_color=(0, 0, 0),
+                max_workers=1,
+            )
+        )
+        assert written == filepaths
+        assert all((tmp_path / "images" / f"{i}.png").exists() for i in range(2))
+
+    def test_validates_filepaths_eagerly(self, font, tmp_path):
+        with pytest.raises(ValueError, match="1 filepaths for 2 text dictionaries"):
+            render_images_to_files(
+                _text_dictionaries(font, 2),
+                filepaths=[str(tmp_path / "0.png")],
+                canvas_settings=CANVAS_SETTINGS,
+                font_color=(0, 0, 0),
+            )
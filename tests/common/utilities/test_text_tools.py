@@ -0,0 +1,80 @@
+"""Tests for breaking and fitting texts by their rendered width."""
+
+import pytest
+from PIL import ImageFont
+
+from common.utilities.text_tools.measurement import get_text_measurer
+from common.utilities.text_tools.text_tools import (
+    break_lines_by_width,
+    fit_text_to_box,
+)
+
+TEXT = "Love is patient, love is kind. It does not envy, it does not boast."
+
+
+@pytest.fixture(scope="module")
+def font():
+    return ImageFont.load_default(size=40)
+
+
+def _width(line, font):
+    return get_text_measurer(font).width(line.rstrip())
+
+
+class TestBreakLinesByWidth:
+    @pytest.mark.parametrize("balanced", [False, True])
+    def test_lines_fit_and_keep_the_words(self, font, balanced):
+        lines = break_lines_by_width(TEXT, font, max_width=300, balanced=balanced)
+        assert len(lines) > 1
+        assert all(line.endswith(" ") for line in lines)
+        assert all(_width(line, font) <= 300 for line in lines)
+        assert " ".join(line.strip() for line in lines) == TEXT
+
+    def test_greedy_fills_lines(self, font):
+        lines = break_lines_by_width(TEXT, font, max_width=300)
+        for line, next_line in zip(lines, lines[1:]):
+            first_word = next_line.split()[0]
+            assert _width(f"{line}{first_word}", font) > 300
+
+    def test_balanced_is_not_more_ragged(self, font):
+        greedy = break_lines_by_width(TEXT, font, max_width=300)
+        balanced = break_lines_by_width(TEXT, font, max_width=300, balanced=True)
+
+        def slack(lines):
+            return sum((300 - _width(line, font)) ** 2 for line in lines[:-1])
+
+        assert len(balanced) == len(greedy)
+        assert slack(balanced) <= slack(greedy)
+
+    def test_long_word_is_split(self, font):
+        word = "Supercalifragilisticexpialidocious"
+        lines = break_lines_by_width(f"a {word} b", font, max_width=150)
+        assert "".join(line.strip() for line in lines[1:-1]) == word
+        assert all(_width(line, font) <= 150 for line in lines)
+
+    def test_empty_text(self, font):
+        assert break_lines_by_width("  ", font, max_width=300) == [""]
+
+
+class TestFitTextToBox:
+    def test_largest_fitting_size(self, font):
+        lines, sized_font = fit_text_to_box(
+            TEXT, font, max_width=400, max_height=300, min_fontsize=10, max_fontsize=100
+        )
+        measurer = get_text_measurer(sized_font)
+        assert 10 <= sized_font.size < 100
+        assert sum(measurer.bbox(line)[1] for line in [*lines, " "]) <= 300
+
+        larger_font = font.font_variant(size=sized_font.size + 1)
+        larger_lines = break_lines_by_width(TEXT, larger_font, max_width=400)
+        larger_measurer = get_text_measurer(larger_font)
+        assert (
+            sum(larger_measurer.bbox(line)[1] for line in [*larger_lines, " "]) > 300
+            or max(larger_measurer.bbox(line)[0] for line in larger_lines) > 400
+        )
+
+    def test_falls_back_to_min_fontsize(self, font):
+        _, sized_font = fit_text_to_box(
+            TEXT, font, max_width=50, max_height=10, min_fontsize=12, max_fontsize=40
+        )
+        assert sized_font.size == 12
@@ -0,0 +1,64 @@
+"""Tests for the SQLite history of generated texts."""
+
+import pandas as pd
+import pytest
+
+from datasets.history_dataset import HistoryDataset, migrate_excel_history
+
+
+def _texts(*rows):
+    return pd.DataFrame(
+        {
+            "topic": [topic for topic, _ in rows],
+            "text": [text for _, text in rows],
+            "timestamp": pd.Timestamp("2024-01-01"),
+        }
+    )
+
+
+@pytest.fixture
+def filepath(tmp_path):
+    return str(tmp_path / "past_generations.db")
+
+
+class TestHistoryDataset:
+    def test_appends_in_order(self, filepath):
+        dataset = HistoryDataset(filepath=filepath)
+        dataset.save(_texts(("quote.love", "first")))
+        dataset.save(_texts(("quote.life", "second")))
+
+        history = dataset.load()
+        assert history.loc[:, "text"].tolist() == ["first", "second"]
+        assert history.index.tolist() == [1, 2]
+        assert history.loc[:, "timestamp"].dtype.kind == "M"
+
+    def test_ignores_stored_texts(self, filepath):
+        dataset = HistoryDataset(filepath=filepath)
+        dataset.save(_texts(("quote.love", "first")))
+        dataset.save(_texts(("quote.love", "first"), ("quote.love", "second")))
+        assert dataset.load().loc[:, "text"].tolist() == ["first", "second"]
+
+    def test_filters_topic_and_subtopics(self, filepath):
+        HistoryDataset(filepath=filepath).save(
+            _texts(("quote", "a"), ("quote.love", "b"), ("quotes", "c"), ("fact", "d"))
+        )
+        history = HistoryDataset(filepath=filepath, topic="quote").load()
+        assert history.loc[:, "text"].tolist() == ["a", "b"]
+
+    def test_exists(self, filepath):
+        dataset = HistoryDataset(filepath=filepath)
+        assert not dataset.exists()
+        dataset.save(_texts(("quote", "a")))
+        assert dataset.exists()
+
+
+def test_migrate_excel_history(tmp_path, filepath):
+    pytest.importorskip("openpyxl")
+    excel_filepath = tmp_path / "past_generations.xlsx"
+    pd.DataFrame({"text": ["first", None, "second"]}).to_excel(excel_filepath)
+
+    assert migrate_excel_history(str(excel_filepath), filepath) == 2
+    assert migrate_excel_history(str(excel_filepath), filepath) == 2
+    assert HistoryDataset(filepath=filepath).load().loc[:, "topic"].unique() == [
+        "unknown"
+    ]
@@ -0,0 +1,46 @@
+"""Tests for the image dataset."""
+
+import logging
+
+import pytest
+from PIL import Image
+
+from datasets.image_dataset import ImageDataset, wait_for_background_writes
+
+
+@pytest.fixture
+def image():
+    return Image.new("RGB", (20, 10), (255, 255, 255))
+
+
+class TestImageDataset:
+    @pytest.mark.parametrize("background", [False, True])
+    def test_save_and_load(self, tmp_path, image, background):
+        filepath = tmp_path / "images" / "post.png"
+        dataset = ImageDataset(filepath=str(filepath), background=background)
+        dataset.save(image)
+        wait_for_background_writes()
+
+        loaded = dataset.load()
+        assert loaded.size == (20, 10)
+        assert loaded.info["encoded_bytes"] == filepath.read_bytes()
+        assert loaded.info["filepath"] == str(filepath)
+
+    def test_quantize(self, tmp_path, image):
+        dataset = ImageDataset(filepath=str(tmp_path / "post.png"), quantize=4)
+        dataset.save(image)
+        assert dataset.load().mode == "P"
+
+    def test_failed_background_write_is_logged_and_raised(
+        self, tmp_path, image, caplog
+    ):
+        (tmp_path / "file").write_text("not a directory")
+        dataset = ImageDataset(
+            filepath=str(tmp_path / "file" / "post.png"), background=True
+        )
+        with caplog.at_level(logging.ERROR, logger="datasets.image_dataset"):
+            dataset.save(image)
+            with pytest.raises(OSError):
+                wait_for_background_writes()
+        assert "post.png" in caplog.text
+        wait_for_background_writes()
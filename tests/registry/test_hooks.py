@@ -0,0 +1,74 @@
+"""Tests for the hooks skipping unchanged nodes in incremental runs."""
+
+import pytest
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.pipeline import node, pipeline
+from kedro.runner import SequentialRunner
+
+from common.incremental import IncrementalFunction
+from registry.hooks import IncrementalHooks
+
+
+def _create_text(topic):
+    return f"Text about {topic}."
+
+
+def _render(text):
+    return text.upper()
+
+
+@pytest.fixture
+def nodes():
+    return pipeline(
+        [
+            node(_create_text, "topic", "text", name="create_text", tags=["llm"]),
+            node(_render, "text", "image", name="render", tags=["render"]),
+        ]
+    )
+
+
+@pytest.fixture
+def hooks(tmp_path):
+    return IncrementalHooks(directory=str(tmp_path))
+
+
+def _functions(nodes):
+    return {node.name: node.func for node in nodes.nodes}
+
+
+class TestIncrementalHooks:
+    def test_regular_run_is_not_wrapped(self, hooks, nodes):
+        hooks.before_pipeline_run(run_params={"extra_params": None}, pipeline=nodes)
+        assert _functions(nodes) == {"create_text": _create_text, "render": _render}
+
+    @pytest.mark.parametrize("end_of_run", ["after_pipeline_run", "on_pipeline_error"])
+    def test_functions_are_restored(self, hooks, nodes, end_of_run):
+        run_params = {"extra_params": {"incremental": True}}
+        hooks.before_pipeline_run(run_params=run_params, pipeline=nodes)
+        functions = _functions(nodes)
+        assert isinstance(functions["create_text"], IncrementalFunction)
+        assert functions["render"] is _render
+        assert functions["create_text"]("love") == "Text about love."
+
+        getattr(hooks, end_of_run)()
+        assert _functions(nodes) == {"create_text": _create_text, "render": _render}
+
+    def test_nodes_are_wrapped_once(self, hooks, nodes):
+        run_params = {"extra_params": {"incremental": True}}
+        hooks.before_pipeline_run(run_params=run_params, pipeline=nodes)
+        hooks.before_pipeline_run(run_params=run_params, pipeline=nodes)
+        hooks.after_pipeline_run()
+        assert _functions(nodes)["create_text"] is _create_text
+
+    def test_run_reuses_the_outputs(self, hooks, nodes, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            nodes.nodes[0], "func", lambda topic: calls.append(topic) or topic
+        )
+        run_params = {"extra_params": {"incremental": True}}
+        for _ in range(2):
+            hooks.before_pipeline_run(run_params=run_params, pipeline=nodes)
+            catalog = DataCatalog({"topic": MemoryDataset("love")})
+            assert SequentialRunner().run(nodes, catalog) == {"image": "LOVE"}
+            hooks.after_pipeline_run()
+        assert calls == ["love"]
@@ -0,0 +1,55 @@
+"""Tests for the runner scheduling nodes on pools by their tags."""
+
+import pytest
+from kedro.io import DataCatalog, MemoryDataset
+from kedro.pipeline import node, pipeline
+
+from common.llm.rate_limit import LLM_RATE_LIMITER
+from runners.scheduled_runner import ScheduledRunner
+
+
+def _identity(value):
+    return value
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    yield LLM_RATE_LIMITER
+    LLM_RATE_LIMITER.reset(requests_per_minute=60, burst=4)
+
+
+class TestGetLane:
+    @pytest.mark.parametrize(
+        ("tags", "lane"),
+        [
+            (["llm"], "llm"),
+            (["render"], "render"),
+            (["history"], "history"),
+            (["history", "llm"], "history"),
+            (["llm", "render"], "llm"),
+            (["quote"], None),
+            ([], None),
+        ],
+    )
+    def test_lane_of_tags(self, tags, lane):
+        assert ScheduledRunner._get_lane(node(_identity, "a", "b", tags=tags)) == lane
+
+
+class TestScheduledRunner:
+    def test_runs_nodes_of_all_lanes(self):
+        nodes = pipeline(
+            [
+                node(_identity, "text", "hashtags", tags=["llm"]),
+                node(_identity, "hashtags", "image", tags=["render"]),
+                node(_identity, "image", "history", tags=["history"]),
+                node(_identity, "history", "post"),
+            ]
+        )
+        catalog = DataCatalog({"text": MemoryDataset("Stay hungry.")})
+        runner = ScheduledRunner(llm_concurrency=2, render_workers=2)
+        assert runner.run(nodes, catalog) == {"post": "Stay hungry."}
+
+    def test_configures_the_shared_rate_limiter(self, rate_limiter):
+        ScheduledRunner(llm_concurrency=3, llm_requests_per_minute=120)
+        assert rate_limiter._rate == 2
+        assert rate_limiter._capacity == 3
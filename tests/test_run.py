@@ -11,22 +11,23 @@ To run the tests, run ``kedro test`` from the project root directory.
 from pathlib import Path
 
 import pytest
-from kedro.config import ConfigLoader
+from kedro.config import OmegaConfigLoader
 from kedro.framework.context import KedroContext
 from kedro.framework.hooks import _create_hook_manager
 
 
 @pytest.fixture
 def config_loader():
-    return ConfigLoader(conf_source=str(Path.cwd()))
+    return OmegaConfigLoader(conf_source=str(Path.cwd() / "conf"))
 
 
 @pytest.fixture
 def project_context(config_loader):
     return KedroContext(
-        package_name="auto_insta",
+        package_name="registry",
         project_path=Path.cwd(),
         config_loader=config_loader,
+        env=None,
         hook_manager=_create_hook_manager(),
     )
 